@@ -0,0 +1,265 @@
+# bench/dataset.py
+"""
+Генератор синтетических данных для нагрузочных тестов.
+
+Заполняет users / bookings / reviews в SQLite пачками и пишет venues.json
+с десятками тысяч заведений. Распределения «как в жизни»:
+популярность заведений — степенной закон (Zipf), время брони — вечерний пик,
+тексты и имена — кириллица.
+
+    python -m bench.dataset --db /tmp/big.db --venues-file /tmp/venues.json \\
+        --venues 50000 --users 1000000 --bookings 10000000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import db
+
+CATEGORIES = [
+    "Ресторан", "Кафе", "Кофейня", "Бар", "Лаундж-Бар", "Ресто-бар", "Караоке",
+    "Боулинг", "Бильярд", "Play station клуб", "Компьютерный клуб", "Кальянная",
+    "Пиццерия", "Суши-бар", "Стейк-хаус", "Чайхана", "Пекарня", "Паб",
+    "Банкетный зал", "Квест-комната", "Антикафе", "Гриль-бар", "Винный бар",
+    "Ночной клуб", "Семейное кафе", "Фастфуд", "Шашлычная", "Бургерная",
+    "Вегетарианское кафе", "Кондитерская",
+]
+DISTRICTS = [
+    "Центр", "Левый берег", "Правый берег", "Есиль", "Алматы", "Сарыарка",
+    "Байконур", "Нура", "Старый город", "Новый город", "Экспо", "Highvill",
+    "Северное сияние", "Железнодорожный", "Юго-Восток", "Мичурино",
+    "Пригородный", "Тельман", "Кирпичный", "Промзона", "Ботанический сад",
+    "Набережная", "Аэропорт", "Коктал", "Ильинка", "Комсомольский",
+    "Акмол", "Заречный", "Интернациональный", "Целинный",
+    "Дачный", "Солнечный", "Университетский", "Караоткель", "Шубар",
+    "Жагалау", "Подстепное", "Каражар", "Микрорайон 1", "Микрорайон 2",
+]
+NAME_WORDS = [
+    "Облако", "Пингвин", "Небо", "Ласточка", "Гранат", "Самса", "Тюльпан",
+    "Дастархан", "Шелковый путь", "Степь", "Байтерек", "Мята", "Лофт",
+    "Пятница", "Перец", "Маслина", "Жемчуг", "Орда", "Номад", "Сказка",
+    "Луна", "Вишня", "Кедр", "Аура", "Кочевник", "Эхо", "Пастила", "Барс",
+]
+STREETS = [
+    "Достык", "Кунаева", "Сыганак", "Туран", "Мангилик Ел", "Кабанбай батыра",
+    "Сейфуллина", "Абая", "Республики", "Бейбитшилик", "Кенесары", "Иманова",
+    "Акмешит", "Сарайшык", "Ханов Керея и Жанибека", "Бектурова",
+]
+FIRST_NAMES = [
+    "Айгерим", "Данияр", "Алия", "Ерлан", "Мадина", "Нурлан", "Асель", "Тимур",
+    "Дина", "Арман", "Жанна", "Руслан", "Камила", "Азамат", "Сауле", "Ильяс",
+    "Анна", "Дмитрий", "Екатерина", "Сергей", "Мария", "Алексей", None,
+]
+COMMENTS = [
+    "", "", "", "День рождения", "Столик у окна, пожалуйста", "Бюджет до 20 000 ₸",
+    "Свидание 🙂", "Корпоратив, нужен большой стол", "С детьми", "Будем с собакой",
+    "Нужна отдельная комната", "Хотим караоке до утра", "Тихое место для встречи",
+]
+REVIEW_TEXTS = [
+    "", "Всё понравилось!", "Отличная кухня и сервис", "Долго ждали заказ",
+    "Атмосфера супер, придём ещё", "Громкая музыка, но вкусно", "Дороговато",
+    "Лучшее караоке в городе 🎤", "Персонал вежливый", "Не понравилось",
+]
+# вечерний пик: 19–21 часов — самые популярные слоты
+TIMES = ["12:00", "13:00", "14:00", "15:00", "16:00", "17:00", "18:00",
+         "19:00", "20:00", "21:00", "22:00", "23:00"]
+TIME_WEIGHTS = [1, 2, 2, 2, 4, 6, 10, 16, 18, 14, 8, 3]
+PEOPLE_WEIGHTS = [8, 30, 14, 18, 8, 12]   # 1..6 человек
+# часы работы (формат — venues.parse_hours): обычные и «допоздна»
+HOURS = [
+    "10:00-22:00",
+    "12:00-23:00",
+    "11:00-00:00",
+    dict.fromkeys(("tue", "wed", "thu", "fri", "sat", "sun"), "12:00-23:00"),  # пн — выходной
+]
+LATE_HOURS = [
+    "18:00-04:00",
+    "12:00-02:00",
+    {**dict.fromkeys(("mon", "tue", "wed", "thu", "sun"), "16:00-00:00"), "fri": "16:00-05:00", "sat": "16:00-05:00"},
+]
+CAPACITIES = [20, 30, 40, 60, 80, 120]   # мест на слот
+RATING_WEIGHTS = [4, 4, 10, 30, 52]       # 1..5 звёзд
+
+
+def generate_venues(n: int, rnd: random.Random) -> list[dict]:
+    venues: list[dict] = []
+    for i in range(1, n + 1):
+        cats = rnd.sample(CATEGORIES, rnd.choices([1, 2, 3], weights=[60, 30, 10])[0])
+        open_late = rnd.random() < 0.3
+        venues.append(
+            {
+                "id": i,
+                "name": f"{rnd.choice(NAME_WORDS)} {rnd.choice(NAME_WORDS)} #{i}",
+                "category": ", ".join(cats),
+                "district": rnd.choice(DISTRICTS),
+                "address": f"ул. {rnd.choice(STREETS)} {rnd.randint(1, 250)}",
+                "phone": f"+77{rnd.randint(0, 99):02d}{rnd.randint(0, 9_999_999):07d}",
+                "instagram": f"https://www.instagram.com/venue_{i}" if rnd.random() < 0.7 else "",
+                "price_level": rnd.choices([1, 2, 3, 4], weights=[25, 40, 25, 10])[0],
+                "open_late": open_late,
+                "hours": rnd.choice(LATE_HOURS if open_late else HOURS),
+                # мест на слот (venues.FacetIndex.capacities)
+                "capacity": rnd.choice(CAPACITIES),
+            }
+        )
+    return venues
+
+
+def zipf_cum_weights(n: int, s: float = 1.1) -> list[float]:
+    """Накопленные веса для random.choices: k-е место популярнее (k+1)-го как k^-s."""
+    return list(itertools.accumulate(1 / (k ** s) for k in range(1, n + 1)))
+
+
+def _ts(d: datetime) -> str:
+    return d.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def fill_database(
+    path: str,
+    venues: list[dict],
+    users: int,
+    bookings: int,
+    reviews: int,
+    rnd: random.Random,
+    batch: int = 100_000,
+    log=print,
+) -> None:
+    """Пересоздаём базу `path` и заливаем данные пачками по `batch` строк."""
+    if os.path.exists(path):
+        os.remove(path)
+    old_path = db.DB_PATH
+    db.DB_PATH = path
+    try:
+        asyncio.run(db.init_db())
+    finally:
+        db.DB_PATH = old_path
+
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode = OFF")
+    con.execute("PRAGMA synchronous = OFF")
+    con.execute("PRAGMA cache_size = -200000")
+
+    now = datetime.now().replace(microsecond=0)
+    year_seconds = 365 * 24 * 3600
+    started = time.perf_counter()
+
+    # ---------- users ----------
+    for offset in range(0, users, batch):
+        size = min(batch, users - offset)
+        con.executemany(
+            "INSERT INTO users (tg_id, username, first_name, phone, created_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    100_000 + offset + i,
+                    f"user{offset + i}" if rnd.random() < 0.8 else None,
+                    rnd.choice(FIRST_NAMES),
+                    f"+7701{(offset + i) % 10_000_000:07d}" if rnd.random() < 0.9 else None,
+                    _ts(now - timedelta(seconds=rnd.randrange(year_seconds))),
+                )
+                for i in range(size)
+            ),
+        )
+    con.commit()
+    log(f"users: {users} за {time.perf_counter() - started:.1f} с")
+
+    # ---------- bookings ----------
+    # популярные заведения — случайные, а не первые по id
+    popularity = list(range(len(venues)))
+    rnd.shuffle(popularity)
+    venue_cum = zipf_cum_weights(len(venues))
+    time_cum = list(itertools.accumulate(TIME_WEIGHTS))
+    people_cum = list(itertools.accumulate(PEOPLE_WEIGHTS))
+
+    for offset in range(0, bookings, batch):
+        size = min(batch, bookings - offset)
+        venue_idx = rnd.choices(popularity, cum_weights=venue_cum, k=size)
+        slots = rnd.choices(TIMES, cum_weights=time_cum, k=size)
+        people = rnd.choices(range(1, 7), cum_weights=people_cum, k=size)
+        rows = []
+        for i in range(size):
+            v = venues[venue_idx[i]]
+            created = now - timedelta(seconds=rnd.randrange(year_seconds))
+            booked_for = created.date() + timedelta(days=rnd.randrange(14))
+            rows.append(
+                (
+                    100_000 + rnd.randrange(users),
+                    v["id"],
+                    v["category"].split(",", 1)[0],
+                    booked_for.isoformat(),
+                    slots[i],
+                    people[i],
+                    rnd.choice(COMMENTS),
+                    _ts(created),
+                )
+            )
+        con.executemany(
+            """
+            INSERT INTO bookings (
+                tg_id, venue_id, category, date, time, people_count, comment, created_at, status
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'confirmed')
+            """,
+            rows,
+        )
+        con.commit()
+        log(f"bookings: {offset + size}/{bookings} за {time.perf_counter() - started:.1f} с")
+
+    # ---------- reviews ----------
+    rating_cum = list(itertools.accumulate(RATING_WEIGHTS))
+    for offset in range(0, reviews, batch):
+        size = min(batch, reviews - offset)
+        venue_idx = rnd.choices(popularity, cum_weights=venue_cum, k=size)
+        ratings = rnd.choices(range(1, 6), cum_weights=rating_cum, k=size)
+        con.executemany(
+            "INSERT INTO reviews (tg_id, venue_id, rating, text, created_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    100_000 + rnd.randrange(users),
+                    venues[venue_idx[i]]["id"],
+                    ratings[i],
+                    rnd.choice(REVIEW_TEXTS),
+                    _ts(now - timedelta(seconds=rnd.randrange(year_seconds))),
+                )
+                for i in range(size)
+            ),
+        )
+        con.commit()
+    log(f"reviews: {reviews} за {time.perf_counter() - started:.1f} с")
+
+    con.close()
+
+
+def write_venues_file(path: str, venues: list[dict]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(venues, f, ensure_ascii=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Синтетические данные RezMe")
+    parser.add_argument("--db", required=True, help="путь к создаваемой базе (будет перезаписана)")
+    parser.add_argument("--venues-file", required=True, help="куда писать venues.json")
+    parser.add_argument("--venues", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--bookings", type=int, default=1_000_000)
+    parser.add_argument("--reviews", type=int, default=None, help="по умолчанию 5%% от броней")
+    parser.add_argument("--batch", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    venues = generate_venues(args.venues, rnd)
+    write_venues_file(args.venues_file, venues)
+    print(f"venues: {len(venues)} → {args.venues_file}")
+
+    reviews = args.reviews if args.reviews is not None else args.bookings // 20
+    fill_database(args.db, venues, args.users, args.bookings, reviews, rnd, batch=args.batch)
+
+
+if __name__ == "__main__":
+    main()
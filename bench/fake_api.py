@@ -0,0 +1,335 @@
+# bench/fake_api.py
+"""
+Локальная «заглушка» Telegram Bot API для end-to-end бенчмарков.
+
+Реализует getMe, getUpdates (long polling), sendMessage, editMessageText,
+answerCallbackQuery (остальные методы просто отвечают ok) и умеет по расписанию
+добавлять задержку, 429 с retry_after и 5xx-ошибки. Бот подключается
+к ней через API_BASE_URL, т.е. работает настоящий путь aiohttp → JSON → retry.
+
+    # только сервер (бот запускается отдельно с API_BASE_URL=http://127.0.0.1:8081)
+    python -m bench.fake_api --serve --port 8081
+
+    # сервер + бот + синтетические пользователи в одном процессе
+    python -m bench.fake_api --users 200 --concurrency 50 --latency 0.03 --retry-after-every 40
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from aiohttp import web
+from aiogram.types import InlineKeyboardMarkup
+
+from bench.harness import (
+    BOT_USER,
+    is_booking_notification,
+    percentile,
+    prepare_storage,
+    run_users,
+)
+from jobs import worker as job_worker
+
+
+@dataclass
+class FaultSchedule:
+    """Что и как часто ломать. *_every = N — каждый N-й запрос (кроме getUpdates)."""
+
+    latency: float = 0.0
+    retry_after_every: int = 0
+    retry_after: int = 1
+    error_every: int = 0
+    error_code: int = 500
+
+
+@dataclass
+class ServerStats:
+    requests: Counter = field(default_factory=Counter)
+    retry_after_sent: int = 0
+    errors_sent: int = 0
+
+
+class FakeTelegramAPI:
+    def __init__(self, faults: FaultSchedule | None = None):
+        self.faults = faults or FaultSchedule()
+        self.stats = ServerStats()
+        self.updates: asyncio.Queue[dict] = asyncio.Queue()
+        # chat_id -> (message_id, клавиатура) — как в bench.harness.FakeSession
+        self.markups: dict[int, tuple[int, InlineKeyboardMarkup | None]] = {}
+        # chat_id -> ожидающий ответа бота future (см. E2EHarness.feed)
+        self.waiters: dict[int, asyncio.Future] = {}
+        self.callback_chats: dict[str, int] = {}
+        self._message_ids = itertools.count(1)
+        self._counter = 0
+
+    # ---------- HTTP ----------
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        return app
+
+    async def _params(self, request: web.Request) -> dict:
+        if request.content_type == "application/json":
+            return await request.json()
+        params = dict(await request.post())
+        for key, value in params.items():
+            if isinstance(value, str) and value[:1] in "[{":
+                try:
+                    params[key] = json.loads(value)
+                except ValueError:
+                    pass
+        return params
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.stats.requests[method] += 1
+
+        if method == "getUpdates":
+            return _ok(await self._get_updates(params))
+
+        self._counter += 1
+        if self.faults.latency:
+            await asyncio.sleep(self.faults.latency)
+        if self.faults.retry_after_every and self._counter % self.faults.retry_after_every == 0:
+            self.stats.retry_after_sent += 1
+            return _error(
+                429,
+                f"Too Many Requests: retry after {self.faults.retry_after}",
+                parameters={"retry_after": self.faults.retry_after},
+            )
+        if self.faults.error_every and self._counter % self.faults.error_every == 0:
+            self.stats.errors_sent += 1
+            return _error(self.faults.error_code, "Internal Server Error")
+
+        return _ok(self._dispatch(method, params))
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        result: list[dict] = []
+        try:
+            result.append(await asyncio.wait_for(self.updates.get(), timeout or 0.001))
+        except asyncio.TimeoutError:
+            return []
+        while len(result) < limit and not self.updates.empty():
+            result.append(self.updates.get_nowait())
+        return result
+
+    # ---------- методы ----------
+
+    def _dispatch(self, method: str, params: dict):
+        if method == "getMe":
+            return BOT_USER.model_dump(exclude_none=True)
+
+        if method == "answerCallbackQuery":
+            chat_id = self.callback_chats.pop(str(params.get("callback_query_id")), None)
+            self._responded(chat_id)
+            return True
+
+        if method in ("sendMessage", "editMessageText", "sendDocument"):
+            chat_id = int(params["chat_id"])
+            message_id = int(params.get("message_id") or next(self._message_ids))
+            markup = params.get("reply_markup")
+            if isinstance(markup, dict) and "inline_keyboard" in markup:
+                markup = InlineKeyboardMarkup.model_validate(markup)
+                # уведомления с кнопками по брони (админам — подтвердить / отклонить,
+                # пользователю — отменить) сценарий не нажимает: клавиатуру шага не трогаем
+                if method != "sendMessage" or not is_booking_notification(markup):
+                    self.markups[chat_id] = (message_id, markup)
+            elif method == "editMessageText":
+                self.markups[chat_id] = (message_id, None)
+            self._responded(chat_id)
+            return {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER.model_dump(exclude_none=True),
+                "text": params.get("text") or "",
+            }
+
+        return True
+
+    def _responded(self, chat_id: int | None) -> None:
+        waiter = self.waiters.get(chat_id)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(time.perf_counter())
+
+
+def _ok(result) -> web.Response:
+    return web.json_response({"ok": True, "result": result})
+
+
+def _error(code: int, description: str, **extra) -> web.Response:
+    return web.json_response(
+        {"ok": False, "error_code": code, "description": description, **extra},
+        status=code,
+    )
+
+
+class E2EHarness:
+    """
+    Тот же интерфейс, что у bench.harness.Harness, но апдейты уходят
+    в очередь фейкового сервера, а бот забирает их через настоящий getUpdates.
+    Латентность шага — время до первого ответа бота в этот чат;
+    дальше ждём `settle` секунд тишины, чтобы клавиатура успела обновиться.
+    """
+
+    def __init__(self, api: FakeTelegramAPI, admin_id: int, settle: float = 0.05, timeout: float = 10.0):
+        self.api = api
+        self.admin_id = admin_id
+        self.settle = settle
+        self.timeout = timeout
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter[str] = Counter()
+        self.completed: Counter[str] = Counter()
+        self._ids = itertools.count(1)
+
+    @property
+    def markups(self):
+        return self.api.markups
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    async def feed(self, step: str, payload: dict) -> None:
+        payload["update_id"] = self.next_id()
+        if "callback_query" in payload:
+            chat_id = payload["callback_query"]["from"]["id"]
+            self.api.callback_chats[payload["callback_query"]["id"]] = chat_id
+        else:
+            chat_id = payload["message"]["chat"]["id"]
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.api.waiters[chat_id] = waiter
+        started = time.perf_counter()
+        await self.api.updates.put(payload)
+        try:
+            answered = await asyncio.wait_for(waiter, self.timeout)
+            self.latencies[step].append(answered - started)
+        except asyncio.TimeoutError:
+            self.errors[f"{step}: бот не ответил за {self.timeout} с"] += 1
+        finally:
+            self.api.waiters.pop(chat_id, None)
+
+        # ждём, пока бот допишет все сообщения по этому шагу
+        seen = sum(self.api.stats.requests.values())
+        while True:
+            await asyncio.sleep(self.settle)
+            now = sum(self.api.stats.requests.values()) - self.api.stats.requests["getUpdates"]
+            if now == seen:
+                break
+            seen = now
+
+    def report(self, wall: float) -> dict:
+        all_lat = [x for values in self.latencies.values() for x in values]
+        stats = self.api.stats
+        return {
+            "updates": len(all_lat),
+            "wall_seconds": round(wall, 3),
+            "updates_per_sec": round(len(all_lat) / wall, 1) if wall else 0.0,
+            "p50_ms": round(percentile(all_lat, 50) * 1000, 3),
+            "p95_ms": round(percentile(all_lat, 95) * 1000, 3),
+            "p99_ms": round(percentile(all_lat, 99) * 1000, 3),
+            "completed": dict(self.completed),
+            "server_requests": dict(stats.requests),
+            "retry_after_sent": stats.retry_after_sent,
+            "errors_sent": stats.errors_sent,
+            "errors": dict(self.errors),
+        }
+
+
+async def serve(api: FakeTelegramAPI, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def run_e2e(args: argparse.Namespace) -> dict:
+    from config import get_settings
+    from main import create_bot, create_dispatcher
+
+    api = FakeTelegramAPI(
+        FaultSchedule(
+            latency=args.latency,
+            retry_after_every=args.retry_after_every,
+            retry_after=args.retry_after,
+            error_every=args.error_every,
+        )
+    )
+    runner = await serve(api, args.host, args.port)
+    await prepare_storage(venues_file=args.venues_file)
+
+    settings = get_settings()
+    settings.api_base_url = f"http://{args.host}:{args.port}"
+    settings.admin_id = settings.admin_id or 1_000_000
+    settings.throttle_rate = settings.throttle_burst = 1e9
+
+    bot = create_bot(settings)
+    dp = create_dispatcher(settings)
+    polling = asyncio.create_task(dp.start_polling(bot, polling_timeout=1, handle_signals=False))
+
+    harness = E2EHarness(api, settings.admin_id, settle=args.settle)
+    try:
+        wall = await run_users(
+            harness,
+            users=args.users,
+            concurrency=args.concurrency,
+            review_share=args.review_share,
+            admin_runs=args.admin_runs,
+            seed=args.seed,
+        )
+    finally:
+        await job_worker.close()
+        await dp.stop_polling()
+        await polling
+        await runner.cleanup()
+    return harness.report(wall)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Фейковый Telegram Bot API для e2e-бенчмарков")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--serve", action="store_true", help="только поднять сервер")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--retry-after-every", type=int, default=0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--error-every", type=int, default=0)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--review-share", type=float, default=0.3)
+    parser.add_argument("--admin-runs", type=int, default=2)
+    parser.add_argument("--settle", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--venues-file")
+    args = parser.parse_args()
+
+    if args.serve:
+        async def serve_forever() -> None:
+            api = FakeTelegramAPI(
+                FaultSchedule(
+                    latency=args.latency,
+                    retry_after_every=args.retry_after_every,
+                    retry_after=args.retry_after,
+                    error_every=args.error_every,
+                )
+            )
+            await serve(api, args.host, args.port)
+            print(f"Fake Bot API: http://{args.host}:{args.port}")
+            await asyncio.Event().wait()
+
+        asyncio.run(serve_forever())
+        return
+
+    report = asyncio.run(run_e2e(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,531 @@
+# bench/harness.py
+"""
+Нагрузочный прогон всей воронки бронирования внутри одного процесса.
+
+Собираем настоящий Dispatcher из main.py, подменяем HTTP-сессию бота
+на FakeSession (запоминает исходящие вызовы, в Telegram ничего не уходит)
+и гоняем синтетических пользователей по шагам:
+start → телефон → режим → категория/район/подбор по параметрам → дата → время → люди → комментарий → заведение,
+плюс «🔁 Повторить», отзывы и админка. В конце — p50/p95/p99 по шагам и апдейты в секунду.
+
+    python -m bench.harness --users 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+import typing
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Callable
+
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, SendMessage, TelegramMethod
+from aiogram.types import (
+    Chat,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+    Update,
+    User,
+)
+
+import db
+import venues
+from callbacks import BookingStatusCB
+from config import get_settings
+from main import create_bot, create_dispatcher
+from jobs import worker as job_worker
+
+BOT_USER = User(id=42, is_bot=True, first_name="RezMe", username="rezme_bench_bot")
+ADMIN_ID = 1_000_000
+
+COMMENTS = ["нет", "День рождения, нужен столик у окна", "Бюджет до 20 000 ₸", "нет", "Свидание 🙂"]
+
+
+# шаги воронки брони (для подсчёта вызовов API на одну бронь)
+BOOKING_STEPS = (
+    "start", "booking_start", "phone", "mode", "facet", "filter",
+    "date", "time", "people", "comment", "venue",
+)
+
+# шаг сценария, в котором сейчас обрабатывается апдейт (вызовы API считаем по шагам)
+_current_step: contextvars.ContextVar[str] = contextvars.ContextVar("bench_step", default="other")
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def is_booking_notification(markup: InlineKeyboardMarkup) -> bool:
+    """
+    Кнопки уведомления по брони (админам — подтвердить / отклонить, пользователю — отменить):
+    все кнопки — BookingStatusCB не из очереди заявок (q=0).
+    """
+    buttons = [b for row in markup.inline_keyboard for b in row]
+    for button in buttons:
+        if not (button.callback_data or "").startswith(f"{BookingStatusCB.__prefix__}:"):
+            return False
+        if BookingStatusCB.unpack(button.callback_data).q:
+            return False
+    return bool(buttons)
+
+
+def is_booking_accepted(markup: InlineKeyboardMarkup | None) -> bool:
+    """Итог мастера брони — «заявка принята» с кнопкой отмены."""
+    return markup is not None and is_booking_notification(markup)
+
+
+class FakeSession(BaseSession):
+    """
+    Сессия бота без сети: считает вызовы API, запоминает последнюю
+    inline-клавиатуру в каждом чате и отвечает правдоподобными объектами.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self.calls_by_step: Counter[str] = Counter()
+        # куда уходят уведомления админам (их шлёт фоновый воркер, а не шаг сценария)
+        self.notify_chats: set[int] = set()
+        # chat_id -> (message_id, клавиатура) последнего сообщения с inline-кнопками
+        self.markups: dict[int, tuple[int, InlineKeyboardMarkup | None]] = {}
+        self._message_ids = itertools.count(1)
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        """Файлов в сценарии нет — скачивание отдаёт пустой поток."""
+        return
+        yield
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: int | None = None):
+        self.calls[type(method).__name__] += 1
+        step = _current_step.get()
+        if getattr(method, "chat_id", None) in self.notify_chats and not step.startswith("admin"):
+            step = "admin_notify"
+        self.calls_by_step[step] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if isinstance(method, GetMe):
+            return BOT_USER
+
+        returning = method.__returning__
+        if returning is not Message and Message not in typing.get_args(returning):
+            return True
+
+        chat_id = getattr(method, "chat_id", None)
+        message_id = getattr(method, "message_id", None) or next(self._message_ids)
+        markup = getattr(method, "reply_markup", None)
+        # кнопки в уведомлениях по брони (админам — подтвердить / отклонить,
+        # пользователю — отменить) сценарий не нажимает — они не должны подменять
+        # клавиатуру текущего шага в том же чате
+        pushed = step == "admin_notify" or (
+            isinstance(method, SendMessage)
+            and isinstance(markup, InlineKeyboardMarkup)
+            and is_booking_notification(markup)
+        )
+        if isinstance(chat_id, int) and not pushed:
+            if isinstance(markup, InlineKeyboardMarkup):
+                self.markups[chat_id] = (message_id, markup)
+            elif type(method).__name__.startswith("Edit"):
+                self.markups[chat_id] = (message_id, None)
+
+        return Message(
+            message_id=message_id,
+            date=datetime.now(),
+            chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+            from_user=BOT_USER,
+            text=getattr(method, "text", None),
+        ).as_(bot)
+
+
+class Harness:
+    def __init__(self, latency: float = 0.0, throttle: bool = False):
+        settings = get_settings()
+        settings.admin_id = settings.admin_id or ADMIN_ID
+        if not throttle:
+            settings.throttle_rate = 1e9
+            settings.throttle_burst = 1e9
+        self.admin_id = settings.admin_id
+
+        self.session = FakeSession(latency=latency)
+        self.session.notify_chats = set(settings.admin_chat_ids)
+        self.bot = create_bot(settings, session=self.session)
+        self.dp = create_dispatcher(settings)
+
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter[str] = Counter()
+        self.completed: Counter[str] = Counter()
+        self._update_ids = itertools.count(1)
+
+    @property
+    def markups(self) -> dict[int, tuple[int, InlineKeyboardMarkup | None]]:
+        return self.session.markups
+
+    def next_id(self) -> int:
+        return next(self._update_ids)
+
+    async def feed(self, step: str, payload: dict) -> None:
+        payload["update_id"] = self.next_id()
+        update = Update.model_validate(payload, context={"bot": self.bot})
+
+        started = time.perf_counter()
+        token = _current_step.set(step)
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            self.errors[f"{step}: {type(e).__name__}: {e}"] += 1
+        finally:
+            _current_step.reset(token)
+            self.latencies[step].append(time.perf_counter() - started)
+
+    def report(self, wall: float) -> dict:
+        all_lat = [x for values in self.latencies.values() for x in values]
+        bookings = self.completed["booking"]
+        funnel_calls = sum(self.session.calls_by_step[step] for step in BOOKING_STEPS)
+        return {
+            "updates": len(all_lat),
+            "wall_seconds": round(wall, 3),
+            "updates_per_sec": round(len(all_lat) / wall, 1) if wall else 0.0,
+            "p50_ms": round(percentile(all_lat, 50) * 1000, 3),
+            "p95_ms": round(percentile(all_lat, 95) * 1000, 3),
+            "p99_ms": round(percentile(all_lat, 99) * 1000, 3),
+            "completed": dict(self.completed),
+            "api_calls": dict(self.session.calls),
+            "api_calls_per_booking": (
+                round(sum(self.session.calls.values()) / bookings, 2) if bookings else None
+            ),
+            # только воронка брони: без отзывов, админки, повторов и уведомлений админам
+            "funnel_calls_per_booking": round(funnel_calls / bookings, 2) if bookings else None,
+            "api_calls_by_step": dict(self.session.calls_by_step),
+            "errors": dict(self.errors),
+            "steps": {
+                step: {
+                    "n": len(values),
+                    "p50_ms": round(percentile(values, 50) * 1000, 3),
+                    "p95_ms": round(percentile(values, 95) * 1000, 3),
+                    "p99_ms": round(percentile(values, 99) * 1000, 3),
+                }
+                for step, values in self.latencies.items()
+            },
+        }
+
+
+class SyntheticUser:
+    """
+    Пользователь-робот. Работает с любым «харнессом», у которого есть
+    feed(step, payload), markups, next_id(), errors и completed.
+    """
+
+    def __init__(self, harness: Harness, tg_id: int, rnd: random.Random):
+        self.h = harness
+        self.tg_id = tg_id
+        self.rnd = rnd
+        self.user = {
+            "id": tg_id,
+            "is_bot": False,
+            "first_name": f"Гость {tg_id}",
+            "username": f"guest{tg_id}",
+        }
+        self.chat = {"id": tg_id, "type": "private", "first_name": self.user["first_name"]}
+
+    def _message(self, **fields) -> dict:
+        return {
+            "message_id": self.h.next_id(),
+            "date": int(time.time()),
+            "chat": self.chat,
+            "from": self.user,
+            **fields,
+        }
+
+    async def text(self, step: str, text: str) -> None:
+        await self.h.feed(step, {"message": self._message(text=text)})
+
+    async def contact(self, step: str) -> None:
+        contact = {
+            "phone_number": f"+7701{self.tg_id % 10_000_000:07d}",
+            "first_name": self.user["first_name"],
+            "user_id": self.tg_id,
+        }
+        await self.h.feed(step, {"message": self._message(contact=contact)})
+
+    def buttons(self) -> list[InlineKeyboardButton]:
+        _, markup = self.h.markups.get(self.tg_id, (0, None))
+        if markup is None:
+            return []
+        return [b for row in markup.inline_keyboard for b in row if b.callback_data]
+
+    async def press(self, step: str, pick: Callable[[list[InlineKeyboardButton]], InlineKeyboardButton | None]) -> bool:
+        """Нажимаем кнопку последней inline-клавиатуры; False — нажимать нечего."""
+        buttons = self.buttons()
+        button = pick(buttons) if buttons else None
+        if button is None:
+            self.h.errors[f"{step}: нет подходящей кнопки"] += 1
+            return False
+
+        message_id, _ = self.h.markups[self.tg_id]
+        callback = {
+            "id": str(self.h.next_id()),
+            "from": self.user,
+            "chat_instance": str(self.tg_id),
+            "data": button.callback_data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": self.chat,
+                "from": BOT_USER.model_dump(exclude_none=True),
+                "text": "…",
+            },
+        }
+        await self.h.feed(step, {"callback_query": callback})
+        return True
+
+    # ---------- выбор кнопок ----------
+
+    def any_of(self, buttons):
+        # навигацию («⬅️ Назад») сценарий нажимает отдельно, занятое время (✖️) не выбирает
+        choices = [b for b in buttons if b.text != "⬅️ Назад" and not b.text.startswith("✖️")]
+        return self.rnd.choice(choices) if choices else None
+
+    @staticmethod
+    def by_text(text: str):
+        return lambda buttons: next((b for b in buttons if b.text == text), None)
+
+    @staticmethod
+    def by_prefix(prefix: str):
+        return lambda buttons: next((b for b in buttons if b.text.startswith(prefix)), None)
+
+    def any_facet(self, buttons):
+        # быстрые фильтры (цена, караоке, допоздна), под которые что-то есть
+        facets = [
+            b for b in buttons
+            if b.text.endswith(")") and not b.text.endswith("(0)") and not b.text.startswith("➡️")
+        ]
+        return self.rnd.choice(facets) if facets else self.by_prefix("➡️ Дальше")(buttons)
+
+    def future_day(self, buttons):
+        today = date.today()
+        days = [b for b in buttons if b.text.isdigit() and int(b.text) >= today.day]
+        return self.rnd.choice(days) if days else None
+
+    # ---------- сценарии ----------
+
+    async def booking_flow(self) -> bool:
+        """True — заявка принята (False — сценарий не дошёл или на это время не осталось мест)."""
+        await self.text("start", "/start")
+        await self.text("booking_start", "🔔 Забронировать")
+        await self.contact("phone")
+
+        roll = self.rnd.random()
+        if roll < 0.2:
+            # подбор по параметрам: включаем пару фильтров с ненулевым результатом
+            if not await self.press("mode", self.by_text("Подобрать по нескольким параметрам")):
+                return False
+            for _ in range(2):
+                if not await self.press("facet", self.any_facet):
+                    return False
+            steps = [("filter", self.by_prefix("➡️ Дальше"))]
+        else:
+            if roll < 0.6:
+                mode_text = "Выбрать категорию / вид заведения"
+            else:
+                mode_text = "Выбрать заведение по району"
+            steps = [
+                ("mode", self.by_text(mode_text)),
+                ("filter", self.any_of),
+            ]
+        steps += [
+            ("date", self.future_day),
+            ("time", self.any_of),
+            ("people", self.any_of),
+        ]
+        for step, pick in steps:
+            if not await self.press(step, pick):
+                return False
+
+        await self.text("comment", self.rnd.choice(COMMENTS))
+        if not await self.press("venue", self.any_of):
+            return False
+        _, markup = self.h.markups.get(self.tg_id, (0, None))
+        if not is_booking_accepted(markup):
+            # места разобрали, пока выбирали (venues.json с capacity) — мастер вернулся к времени
+            self.h.completed["booking_slot_full"] += 1
+            return False
+        self.h.completed["booking"] += 1
+        return True
+
+    async def repeat_flow(self) -> None:
+        # «🔁 Повторить»: прошлая бронь в один тап, спрашиваются только дата и время
+        await self.text("repeat_start", "🔁 Повторить")
+        for step, pick in (
+            ("repeat_pick", self.any_of),
+            ("repeat_date", self.future_day),
+            ("repeat_time", self.any_of),
+        ):
+            if not await self.press(step, pick):
+                return
+        self.h.completed["repeat"] += 1
+
+    async def review_flow(self) -> None:
+        await self.text("review_start", "✍️ Оставить отзыв")
+        if not await self.press("review_venue", self.any_of):
+            return
+        if not await self.press("review_rating", self.any_of):
+            return
+        await self.text("review_text", "Всё понравилось, спасибо!")
+        self.h.completed["review"] += 1
+
+    async def admin_flow(self) -> None:
+        await self.text("admin", "/admin")
+        for text in ("📊 Статистика", "📅 Брони", "⭐️ Отзывы", "🏬 Заведения", "🕓 Заявки"):
+            if not await self.press("admin_section", self.by_text(text)):
+                return
+        # очередь может быть и пустой (админ пришёл раньше пользователей)
+        if any(b.text.startswith("✅ Подтвердить") for b in self.buttons()):
+            await self.press("admin_confirm", self.by_prefix("✅ Подтвердить"))
+        self.h.completed["admin"] += 1
+
+
+async def prepare_storage(workdir: str | None = None, venues_file: str | None = None) -> str:
+    """Переключаем db.py и venues.py на временную папку, чтобы не трогать боевые данные."""
+    workdir = workdir or tempfile.mkdtemp(prefix="rezme-bench-")
+    db.DB_PATH = os.path.join(workdir, "rezme.db")
+    db.reset_caches()
+    venues.VENUES_FILE = venues_file or os.path.join(workdir, "venues.json")
+    await db.init_db()
+    return workdir
+
+
+async def run_users(
+    harness,
+    users: int,
+    concurrency: int,
+    review_share: float,
+    admin_runs: int,
+    seed: int,
+    repeat_share: float = 0.0,
+) -> float:
+    """Гоняем пользователей через любой харнесс; возвращаем время прогона."""
+    rnd = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_user(tg_id: int) -> None:
+        async with semaphore:
+            user = SyntheticUser(harness, tg_id, random.Random(rnd.random()))
+            booked = await user.booking_flow()
+            # повторять нечего, если своей брони нет
+            if booked and user.rnd.random() < repeat_share:
+                await user.repeat_flow()
+            if user.rnd.random() < review_share:
+                await user.review_flow()
+
+    # админ один (один чат) — прогоны админки по очереди, как у живого оператора
+    admin_lock = asyncio.Lock()
+
+    async def one_admin() -> None:
+        async with admin_lock, semaphore:
+            await SyntheticUser(harness, harness.admin_id, random.Random(seed)).admin_flow()
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(one_user(100_000 + i) for i in range(users)),
+        *(one_admin() for _ in range(admin_runs)),
+    )
+    return time.perf_counter() - started
+
+
+async def run(
+    users: int = 100,
+    concurrency: int = 20,
+    latency: float = 0.0,
+    review_share: float = 0.3,
+    repeat_share: float = 0.2,
+    admin_runs: int = 5,
+    seed: int = 1,
+    throttle: bool = False,
+    workdir: str | None = None,
+    venues_file: str | None = None,
+) -> dict:
+    """Прогон на временной базе; возвращаем отчёт (см. Harness.report)."""
+    await prepare_storage(workdir, venues_file)
+
+    harness = Harness(latency=latency, throttle=throttle)
+    wall = await run_users(
+        harness, users, concurrency, review_share, admin_runs, seed, repeat_share
+    )
+    # уведомления админам уходят в фоне — досылаем, чтобы они попали в счётчик вызовов
+    await job_worker.close()
+    await harness.dp.emit_shutdown()
+    return harness.report(wall)
+
+
+def _print_report(report: dict) -> None:
+    print(
+        f"updates: {report['updates']}  wall: {report['wall_seconds']} s  "
+        f"→ {report['updates_per_sec']} upd/s"
+    )
+    print(f"latency p50/p95/p99: {report['p50_ms']} / {report['p95_ms']} / {report['p99_ms']} ms")
+    print(f"completed: {report['completed']}")
+    print(f"API calls: {report['api_calls']}  (на одну бронь: {report['api_calls_per_booking']})")
+    print(f"API calls в воронке брони на одну бронь: {report['funnel_calls_per_booking']}")
+    print()
+    print(f"{'step':<16}{'n':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step, s in report["steps"].items():
+        print(f"{step:<16}{s['n']:>8}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}")
+    if report["errors"]:
+        print("\nerrors:")
+        for error, count in report["errors"].items():
+            print(f"  {count} × {error}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон воронки бронирования")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка фейкового API, сек")
+    parser.add_argument("--review-share", type=float, default=0.3)
+    parser.add_argument("--repeat-share", type=float, default=0.2)
+    parser.add_argument("--admin-runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--throttle", action="store_true", help="не отключать антиспам")
+    parser.add_argument("--venues-file", help="каталог заведений (по умолчанию — DEFAULT_VENUES)")
+    parser.add_argument("--json", action="store_true", help="вывести отчёт в JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        run(
+            users=args.users,
+            concurrency=args.concurrency,
+            latency=args.latency,
+            review_share=args.review_share,
+            repeat_share=args.repeat_share,
+            admin_runs=args.admin_runs,
+            seed=args.seed,
+            throttle=args.throttle,
+            venues_file=args.venues_file,
+        )
+    )
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# bench/micro.py
+"""
+Микробенчмарки горячих путей: venues.py, клавиатуры из handlers/ и все функции db.py.
+
+Каждая функция гоняется на нескольких размерах данных, результат — JSON,
+который удобно сравнивать между коммитами:
+
+    python -m bench.micro --out before.json
+    python -m bench.micro --out after.json --compare before.json
+    python -m bench.micro --venues 10,1000,100000 --bookings 1000,1000000,10000000
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable
+
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+
+import db
+import venues
+from bench.dataset import fill_database, generate_venues
+from bench.harness import percentile
+
+def measure(func: Callable[[], Any], min_time: float = 0.2, max_runs: int = 1000) -> dict:
+    """Гоняем func, пока не наберём min_time секунд (или max_runs запусков)."""
+    loop = asyncio.new_event_loop()
+    timings: list[float] = []
+    total_started = time.perf_counter()
+    try:
+        while len(timings) < max_runs and (time.perf_counter() - total_started < min_time or not timings):
+            started = time.perf_counter()
+            result = func()
+            if inspect.isawaitable(result):
+                loop.run_until_complete(result)
+            timings.append(time.perf_counter() - started)
+    finally:
+        loop.close()
+    return {
+        "runs": len(timings),
+        "mean_us": round(sum(timings) / len(timings) * 1e6, 2),
+        "p50_us": round(percentile(timings, 50) * 1e6, 2),
+        "min_us": round(min(timings) * 1e6, 2),
+    }
+
+
+def venue_cases(n: int) -> list[tuple[str, Callable[[], Any]]]:
+    from handlers.booking import (
+        _build_month_calendar,
+        categories_keyboard,
+        districts_keyboard,
+        venue_listing,
+    )
+
+    mid_id = max(n // 2, 1)
+    today = date.today()
+    index = venues.get_facet_index()
+    categories = venues.get_categories()
+    facets = venues.Facets(district="Центр", karaoke=True)
+    return [
+        ("venues._load_venues", venues._load_venues),
+        ("venues.get_venue_by_id", lambda: venues.get_venue_by_id(mid_id)),
+        ("venues.get_venues_by_subcategory", lambda: venues.get_venues_by_subcategory("Караоке")),
+        ("venues.get_venues_by_district", lambda: venues.get_venues_by_district("Центр")),
+        ("venues.find_venues", lambda: venues.find_venues("category", "Караоке")),
+        ("venues.FacetIndex.count", lambda: index.count(facets)),
+        ("venues.FacetIndex.counts(category)", lambda: index.counts(facets, "category", categories)),
+        ("venues.FacetIndex.open_slots", lambda: index.open_slots(index.mask(facets), 4)),
+        ("handlers.booking.venue_listing", lambda: venue_listing("district", "Центр")),
+        ("handlers.booking.categories_keyboard", categories_keyboard),
+        ("handlers.booking.districts_keyboard", districts_keyboard),
+        ("handlers.booking._build_month_calendar", lambda: _build_month_calendar(today.year, today.month, today)),
+    ]
+
+
+def locked_jobs(path: str, n: int) -> list[int]:
+    """Задачи, уже «забранные» воркером, для complete_jobs / fail_jobs (подготовка вне замеров)."""
+    locked_until = time.time() + 3600
+    con = sqlite3.connect(path)
+    try:
+        with con:
+            con.executemany(
+                """
+                INSERT INTO jobs (kind, payload, attempts, run_at, locked_until)
+                VALUES ('bench', '{}', 1, 0, ?)
+                """,
+                [(locked_until,)] * n,
+            )
+        return [row[0] for row in con.execute("SELECT id FROM jobs WHERE kind = 'bench' ORDER BY id")]
+    finally:
+        con.close()
+
+
+def db_cases(users: int, bookings: int, jobs: list[int]) -> list[tuple[str, Callable[[], Any]]]:
+    rnd = random.Random(7)
+    today = date.today()
+    # complete_jobs и fail_jobs берут разные задачи из jobs (каждую — один раз)
+    to_complete = jobs[: len(jobs) // 2]
+    to_fail = jobs[len(jobs) // 2:]
+
+    def some_user() -> int:
+        return 100_000 + rnd.randrange(users)
+
+    def some_booking() -> int:
+        return 1 + rnd.randrange(bookings)
+
+    def some_day() -> str:
+        return (today + timedelta(days=rnd.randrange(30))).isoformat()
+
+    def activity() -> list[tuple[str, int, int]]:
+        now = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        return [(now, 1, some_user()) for _ in range(100)]
+
+    return [
+        ("db.init_db", db.init_db),
+        ("db.upsert_user", lambda: db.upsert_user(some_user(), "user", "Гость")),
+        ("db.get_user_profile", lambda: db.get_user_profile(some_user())),
+        ("db.get_user_phone", lambda: db.get_user_phone(some_user())),
+        ("db.update_user_phone", lambda: db.update_user_phone(some_user(), "+77010000000")),
+        ("db.save_user_phone", lambda: db.save_user_phone(some_user(), "user", "Гость", "+77010000000")),
+        ("db.get_users_count", db.get_users_count),
+        ("db.save_activity(100)", lambda: db.save_activity(activity())),
+        ("db.get_active_users_count", lambda: db.get_active_users_count(7)),
+        ("db.get_all_users", db.get_all_users),
+        (
+            "db.create_booking",
+            lambda: db.create_booking(some_user(), 1, "Ресторан", "2025-01-01", "19:00", 2, ""),
+        ),
+        (
+            # в bench-базе брони подтверждены: переводим в тот же статус, места не меняются
+            "db.set_booking_status",
+            lambda: db.set_booking_status(
+                some_booking(), db.BOOKING_CONFIRMED, expected=(db.BOOKING_CONFIRMED,)
+            ),
+        ),
+        ("db.get_booking", lambda: db.get_booking(some_booking())),
+        ("db.get_pending_bookings", db.get_pending_bookings),
+        ("db.get_slot_loads", lambda: db.get_slot_loads(some_day())),
+        ("db.get_bookings_count", db.get_bookings_count),
+        ("db.get_last_bookings", db.get_last_bookings),
+        ("db.get_recent_bookings", lambda: db.get_recent_bookings(some_user())),
+        ("db.get_user_venue_ids", lambda: db.get_user_venue_ids(some_user())),
+        ("db.user_has_booking_for_venue", lambda: db.user_has_booking_for_venue(some_user(), 1)),
+        ("db.add_review", lambda: db.add_review(some_user(), 1, 5, "Отлично")),
+        ("db.get_reviews_count", db.get_reviews_count),
+        ("db.get_last_reviews", db.get_last_reviews),
+        ("db.enqueue_job", lambda: db.enqueue_job("bench", {"n": 0})),
+        ("db.claim_jobs", lambda: db.claim_jobs(50, 0.0)),
+        ("db.complete_jobs", lambda: db.complete_jobs([to_complete.pop()])),
+        ("db.fail_jobs", lambda: db.fail_jobs([to_fail.pop()], "bench", retry_in=3600.0)),
+        ("db.get_jobs_stats", db.get_jobs_stats),
+    ]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(venue_sizes: list[int], booking_sizes: list[int], min_time: float, only: str | None) -> dict:
+    rnd = random.Random(1)
+    workdir = tempfile.mkdtemp(prefix="rezme-micro-")
+    results: list[dict] = []
+
+    def record(name: str, size: dict, func: Callable[[], Any]) -> None:
+        if only and only not in name:
+            return
+        stats = measure(func, min_time=min_time)
+        results.append({"name": name, **size, **stats})
+        print(f"{name:<45} {json.dumps(size):<40} p50 {stats['p50_us']:>12} µs", flush=True)
+
+    venues.VENUES_FILE = os.path.join(workdir, "venues.json")
+    for n in venue_sizes:
+        venues._save_venues(generate_venues(n, rnd))
+        for name, func in venue_cases(n):
+            record(name, {"venues": n}, func)
+
+    for n in booking_sizes:
+        users = max(n // 10, 100)
+        path = os.path.join(workdir, f"bookings_{n}.db")
+        started = time.perf_counter()
+        fill_database(
+            path,
+            generate_venues(1000, rnd),
+            users=users,
+            bookings=n,
+            reviews=max(n // 20, 10),
+            rnd=rnd,
+            log=lambda _: None,
+        )
+        print(f"-- база на {n} броней готова за {time.perf_counter() - started:.1f} с", flush=True)
+        db.DB_PATH = path
+        db.reset_caches()
+        # как при старте бота: init_db прогревает кэш известных пользователей
+        asyncio.run(db.init_db())
+        # measure() делает не больше 1000 запусков на кейс
+        jobs = locked_jobs(path, 2000)
+        for name, func in db_cases(users, n, jobs):
+            record(name, {"bookings": n, "users": users}, func)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict) -> None:
+    def key(r: dict) -> tuple:
+        return (r["name"], r.get("venues"), r.get("bookings"))
+
+    old = {key(r): r for r in baseline["results"]}
+    print(f"\nсравнение с {baseline['meta'].get('commit')}:")
+    for r in current["results"]:
+        prev = old.get(key(r))
+        if prev and prev["p50_us"]:
+            ratio = r["p50_us"] / prev["p50_us"]
+            size = r.get("venues") or r.get("bookings")
+            print(f"{r['name']:<45} {size:>10}  {prev['p50_us']:>12} → {r['p50_us']:>12} µs  ×{ratio:.2f}")
+
+
+def _sizes(value: str) -> list[int]:
+    return [int(x) for x in value.split(",") if x.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Микробенчмарки RezMe")
+    parser.add_argument("--venues", default="10,1000,100000", help="размеры каталога через запятую")
+    parser.add_argument("--bookings", default="1000,100000", help="размеры таблицы броней через запятую")
+    parser.add_argument("--min-time", type=float, default=0.2, help="секунд на один кейс")
+    parser.add_argument("--only", help="гонять только кейсы, в имени которых есть подстрока")
+    parser.add_argument("--out", help="куда сохранить JSON")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    report = run(_sizes(args.venues), _sizes(args.bookings), args.min_time, args.only)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# bench/replay.py
+"""
+Реплей записанного потока апдейтов (см. middlewares/recorder.py, RECORD_UPDATES_PATH)
+в свежий Dispatcher с фейковой сессией бота.
+
+    python -m bench.replay recordings/updates-20250101.jsonl.gz               # с исходной скоростью
+    python -m bench.replay rec.jsonl.gz --speed 10                            # в 10 раз быстрее
+    python -m bench.replay rec.jsonl.gz --speed max --venues-file venues.json # как можно быстрее
+
+Апдейты одного пользователя идут строго по порядку, разные пользователи — параллельно.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+from bench.harness import Harness, _print_report, percentile, prepare_storage
+from middlewares.recorder import read_recording
+from jobs import worker as job_worker
+
+
+def _step_name(update: dict) -> str:
+    """Шаг для статистики: тип апдейта + префикс callback_data / команда."""
+    if "callback_query" in update:
+        data = update["callback_query"].get("data") or ""
+        return "callback:" + data.split(":", 1)[0]
+    if "message" in update:
+        message = update["message"]
+        text = message.get("text") or ""
+        if text.startswith("/"):
+            return "command:" + text.split()[0]
+        if "contact" in message:
+            return "message:contact"
+        return "message"
+    return next((k for k in update if k != "update_id"), "unknown")
+
+
+def _user_id(update: dict) -> int:
+    for key in ("message", "callback_query", "inline_query", "edited_message"):
+        if key in update:
+            user = update[key].get("from") or update[key].get("chat") or {}
+            return user.get("id", 0)
+    return 0
+
+
+async def replay(path: str, speed: float | None, venues_file: str | None = None) -> dict:
+    """speed=None — без пауз; иначе паузы между апдейтами делятся на speed."""
+    await prepare_storage(venues_file=venues_file)
+    harness = Harness()
+
+    records = list(read_recording(path))
+    if not records:
+        return harness.report(0.0)
+
+    locks: dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+    lags: list[float] = []
+    first_t = records[0]["t"]
+    started = time.perf_counter()
+
+    async def one(record: dict) -> None:
+        update = record["update"]
+        if speed:
+            due = started + (record["t"] - first_t) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        async with locks[_user_id(update)]:
+            if speed:
+                lags.append(max(time.perf_counter() - due, 0.0))
+            await harness.feed(_step_name(update), dict(update))
+
+    await asyncio.gather(*(one(r) for r in records))
+    wall = time.perf_counter() - started
+    await job_worker.close()
+    await harness.dp.emit_shutdown()
+    report = harness.report(wall)
+    report["recorded_seconds"] = round(records[-1]["t"] - first_t, 3)
+    if lags:
+        report["schedule_lag_p99_ms"] = round(percentile(lags, 99) * 1000, 3)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Реплей записанных апдейтов")
+    parser.add_argument("recording", help="файл .jsonl.gz из UpdateRecorder")
+    parser.add_argument("--speed", default="1", help="множитель скорости или «max»")
+    parser.add_argument("--venues-file", help="каталог, с которым делалась запись")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    speed = None if args.speed == "max" else float(args.speed)
+    report = asyncio.run(replay(args.recording, speed, args.venues_file))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+        print(f"\nзаписано: {report.get('recorded_seconds', 0)} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# callbacks.py
+"""
+Компактные типизированные callback_data для всех inline-клавиатур.
+
+Telegram ограничивает callback_data 64 байтами, поэтому вместо названий
+категорий/районов (кириллица — 2 байта на букву) передаём короткие id
+из реестра в venues.py плюс версию реестра: если каталог успел измениться,
+старая кнопка не промахнётся мимо нужной категории, а попросит выбрать заново.
+"""
+from aiogram.filters.callback_data import CallbackData
+
+
+# ---------- бронирование ----------
+
+class ModeCB(CallbackData, prefix="m"):
+    mode: str            # category / district / facets
+
+
+class FacetCB(CallbackData, prefix="f"):
+    # menu_category / menu_district / back — навигация,
+    # category / district / price / karaoke / late / reset — изменить фильтр, done — дальше
+    action: str
+    v: int = 0           # версия реестра (для category / district)
+    value: int = 0       # id категории/района (0 — любой) или уровень цен
+
+
+class CategoryCB(CallbackData, prefix="c"):
+    v: int               # версия реестра категорий
+    id: int              # 0 — «Все заведения»
+
+
+class DistrictCB(CallbackData, prefix="d"):
+    v: int
+    id: int
+
+
+class CalendarCB(CallbackData, prefix="cl"):
+    action: str          # prev / next / day / ignore
+    value: int = 0       # prev/next: year * 12 + month - 1, day: date.toordinal()
+
+
+class TimeCB(CallbackData, prefix="t"):
+    minutes: int         # минуты от полуночи дня брони: 19:00 -> 1140, 01:00 ночью -> 1500
+
+    @property
+    def text(self) -> str:
+        minutes = self.minutes % (24 * 60)
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class PeopleCB(CallbackData, prefix="p"):
+    n: int
+
+
+class VenueCB(CallbackData, prefix="v"):
+    id: int
+
+
+class RepeatCB(CallbackData, prefix="rp"):
+    id: int              # id брони, которую повторяем
+
+
+class WizardCB(CallbackData, prefix="w"):
+    action: str          # back — шаг назад, no_comment — без комментария
+
+
+class BookingStatusCB(CallbackData, prefix="bs"):
+    id: int              # id брони
+    action: str          # confirm / decline — админ, cancel — пользователь
+    q: int = 0           # 1 — кнопка из очереди заявок в админке (перерисовать очередь)
+
+
+# ---------- отзывы ----------
+
+class ReviewVenueCB(CallbackData, prefix="rv"):
+    id: int
+
+
+class RatingCB(CallbackData, prefix="rr"):
+    rating: int
+
+
+# ---------- админка ----------
+
+class AdminCB(CallbackData, prefix="a"):
+    section: str
+
+
+class AdminDeleteVenueCB(CallbackData, prefix="ad"):
+    id: int
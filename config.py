@@ -1,9 +1,53 @@
-from pydantic_settings import BaseSettings
+from typing import Annotated
+
+from pydantic import field_validator
+from pydantic_settings import BaseSettings, NoDecode
 
 
 class Settings(BaseSettings):
     bot_token: str
     admin_id: int | None = None   # <-- ВАЖНО: int, а не str
+    # дополнительные админы / чаты для уведомлений: ADMIN_IDS=111,222,-100333
+    admin_ids: Annotated[list[int], NoDecode] = []
+
+    # свой адрес Bot API (локальный сервер / bench.fake_api), по умолчанию — api.telegram.org
+    api_base_url: str | None = None
+    # сколько раз повторять запрос после 429 retry_after
+    api_max_retries: int = 2
+
+    # антиспам: токенов в секунду, размер «ведра», бан за частые превышения
+    throttle_rate: float = 1.0
+    throttle_burst: float = 5.0
+    throttle_ban_after: int = 20
+    throttle_ban_seconds: float = 0   # 0 — без временных банов
+    throttle_ban_window: float = 60.0   # за сколько секунд считаем превышения для бана
+
+    # локальный HTTP /metrics (порт 0 — не поднимать)
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+
+    # запись входящих апдейтов для реплея (gzip JSONL, в пути можно strftime: %Y%m%d)
+    record_updates_path: str | None = None
+    record_salt: str | None = None   # соль анонимизации; без неё — случайная на каждый запуск
+
+    # как часто сбрасывать активность пользователей (last_seen_at) в базу, секунд
+    activity_flush_interval: float = 60.0
+
+    # порог блокировки event loop, после которого пишем предупреждение (0 — выкл.)
+    loop_block_threshold: float = 0.25
+
+    @field_validator("admin_ids", mode="before")
+    @classmethod
+    def _split_admin_ids(cls, value):
+        if isinstance(value, str):
+            return [int(x) for x in value.replace(";", ",").split(",") if x.strip()]
+        return value
+
+    @property
+    def admin_chat_ids(self) -> list[int]:
+        """ADMIN_ID + ADMIN_IDS без повторов."""
+        ids = [self.admin_id] if self.admin_id else []
+        return ids + [i for i in self.admin_ids if i not in ids]
 
     class Config:
         env_file = ".env"
@@ -1,8 +1,85 @@
 # db.py
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
 import aiosqlite
 
+from cache import LRUCache
+from metrics import db_timed
+
 DB_PATH = "rezme.db"
 
+# профили пользователей (tg_id -> dict или None, если такого нет) — чтобы повторные
+# брони не ходили в базу за телефоном. Обновляются функциями записи ниже (write-through),
+# TTL ограничивает расхождение, если users меняет кто-то ещё (другой процесс, ручной SQL)
+PROFILE_CACHE_TTL = 600
+_profiles = LRUCache(maxsize=50_000, ttl=PROFILE_CACHE_TTL)
+_MISSING = object()
+
+# tg_id всех, кто уже есть в users (загружаем в init_db): /start от знакомого
+# пользователя в базу не пишет. Новые пользователи копятся в _new_users и пишутся
+# одной транзакцией, пока предыдущая пачка на диске (group commit)
+_known_users: set[int] = set()
+_new_users: dict[int, tuple] = {}
+_new_users_done: asyncio.Future | None = None
+_users_writer: asyncio.Task | None = None
+
+
+# занятость слотов (date -> {time: {venue_id: людей}}) для клавиатуры времени;
+# обновляется в create_booking (write-through), TTL — на случай записи из другого процесса.
+# Это только подсказка для интерфейса: переполнение не пропускает сам create_booking
+SLOT_LOAD_CACHE_TTL = 30
+_slot_loads = LRUCache(maxsize=512, ttl=SLOT_LOAD_CACHE_TTL)
+
+# запись в базу — по одной за раз на процесс (см. _write_connection);
+# замок привязан к event loop, в котором создан (bench запускает несколько подряд)
+_write_lock: tuple[asyncio.AbstractEventLoop, asyncio.Lock] | None = None
+
+
+def reset_caches() -> None:
+    """Сбросить кэши (после смены DB_PATH — в bench/)."""
+    _profiles.clear()
+    _known_users.clear()
+    _slot_loads.clear()
+
+
+class SlotFullError(Exception):
+    """На это время в заведении не хватает мест (см. create_booking)."""
+
+
+# статусы брони: новая заявка ждёт админа, дальше — подтверждена / отклонена
+# админом или отменена пользователем; отклонённые и отменённые места не занимают
+BOOKING_PENDING = "pending"
+BOOKING_CONFIRMED = "confirmed"
+BOOKING_DECLINED = "declined"
+BOOKING_CANCELLED = "cancelled"
+BOOKING_STATUSES = (BOOKING_PENDING, BOOKING_CONFIRMED, BOOKING_DECLINED, BOOKING_CANCELLED)
+
+
+@asynccontextmanager
+async def _write_connection():
+    """
+    Соединение для пишущей транзакции.
+
+    SQLite пускает только одного писателя; остальные ждут в busy handler'е
+    с растущими паузами и через 5 с падают с "database is locked". Пока
+    транзакция ждёт своей очереди в event loop (execute → commit), блокировка
+    занята, поэтому при сотне одновременных записей часть из них не дожидается.
+    Писатели внутри процесса встают в очередь (asyncio.Lock, по порядку),
+    читатели не ждут никого (WAL, см. init_db).
+    """
+    global _write_lock
+    loop = asyncio.get_running_loop()
+    if _write_lock is None or _write_lock[0] is not loop:
+        _write_lock = (loop, asyncio.Lock())
+    # соединение открываем заранее — в очереди стоит только сама транзакция
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with _write_lock[1]:
+            yield db
+
+
 CREATE_USERS_TABLE = """
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -39,13 +116,52 @@ CREATE TABLE IF NOT EXISTS reviews (
 );
 """
 
+# фоновые задачи (jobs.py): run_at / locked_until — unix time,
+# dedup_key уникален, чтобы одна и та же задача не попала в очередь дважды
+CREATE_JOBS_TABLE = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedup_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_at REAL NOT NULL,
+    locked_until REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+CREATE_JOBS_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (status, run_at);
+"""
+
+# сколько людей уже забронировано на слот (venue_id, date, time) — агрегат по bookings,
+# обновляется в create_booking в той же транзакции; ключ начинается с даты,
+# чтобы одним диапазоном читать всю занятость на день
+CREATE_SLOT_LOAD_TABLE = """
+CREATE TABLE IF NOT EXISTS slot_load (
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    venue_id INTEGER NOT NULL,
+    people INTEGER NOT NULL,
+    PRIMARY KEY (date, time, venue_id)
+) WITHOUT ROWID;
+"""
+
 
+@db_timed
 async def init_db():
     """Создаём таблицы и добавляем недостающие колонки, если нужно."""
     async with aiosqlite.connect(DB_PATH) as db:
+        # WAL: чтения не ждут записи (и наоборот); режим сохраняется в файле базы
+        await db.execute("PRAGMA journal_mode=WAL;")
         await db.execute(CREATE_USERS_TABLE)
         await db.execute(CREATE_BOOKINGS_TABLE)
         await db.execute(CREATE_REVIEWS_TABLE)
+        await db.execute(CREATE_JOBS_TABLE)
+        await db.execute(CREATE_JOBS_INDEX)
 
         # добавляем phone в users, если его нет
         try:
@@ -59,49 +175,191 @@ async def init_db():
         except Exception:
             pass
 
+        # активность пользователей (middlewares/activity.py), время — UTC как у created_at
+        try:
+            await db.execute("ALTER TABLE users ADD COLUMN last_seen_at TEXT;")
+        except Exception:
+            pass
+        try:
+            await db.execute(
+                "ALTER TABLE users ADD COLUMN activity_count INTEGER NOT NULL DEFAULT 0;"
+            )
+        except Exception:
+            pass
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_users_last_seen ON users (last_seen_at);"
+        )
+        # история броней пользователя («🔁 Повторить»)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_bookings_user_created ON bookings (tg_id, created_at);"
+        )
+
+        # статус брони (BOOKING_STATUSES); очередь заявок в админке — по индексу,
+        # ближайшие визиты первыми
+        try:
+            await db.execute(
+                "ALTER TABLE bookings ADD COLUMN status TEXT NOT NULL DEFAULT 'pending';"
+            )
+        except Exception:
+            pass
+        else:
+            # брони до появления статусов уже обработаны вручную — не в очередь заявок
+            await db.execute("UPDATE bookings SET status = 'confirmed';")
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings (status, date, time);"
+        )
+
+        # занятость слотов: если агрегат пустой (новая таблица, залитый bench/dataset),
+        # собираем его из будущих броней
+        await db.execute(CREATE_SLOT_LOAD_TABLE)
+        await db.execute(
+            """
+            INSERT INTO slot_load (date, time, venue_id, people)
+            SELECT date, time, venue_id, SUM(people_count)
+            FROM bookings
+            WHERE venue_id IS NOT NULL AND date >= date('now', 'localtime')
+              AND status IN ('pending', 'confirmed')
+              AND NOT EXISTS (SELECT 1 FROM slot_load)
+            GROUP BY date, time, venue_id
+            """
+        )
+
         await db.commit()
 
+        async with db.execute("SELECT tg_id FROM users") as cursor:
+            _known_users.update(row[0] for row in await cursor.fetchall())
+
 
 # ---------- USERS ----------
 
+def _profile(tg_id: int, username: str | None, first_name: str | None, phone: str | None) -> dict:
+    return {"tg_id": tg_id, "username": username, "first_name": first_name, "phone": phone}
+
+
 async def upsert_user(
     tg_id: int,
     username: str | None,
     first_name: str | None,
     phone: str | None = None,
 ):
-    """Сохраняем пользователя (если уже есть — не трогаем)."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
+    """
+    Сохраняем пользователя (если уже есть — не трогаем).
+    Знакомых пропускаем без обращения к базе, новых пишем пачкой;
+    возвращаемся, когда пачка закоммичена.
+    """
+    global _new_users_done, _users_writer
+    if tg_id in _known_users:
+        return
+
+    loop = asyncio.get_running_loop()
+    _new_users[tg_id] = (tg_id, username, first_name, phone)
+    if _new_users_done is None:
+        _new_users_done = loop.create_future()
+    done = _new_users_done
+    if _users_writer is None:
+        _users_writer = loop.create_task(_write_new_users())
+    # shield: отмена одного хендлера не должна отменять запись всей пачки
+    await asyncio.shield(done)
+
+
+async def _write_new_users() -> None:
+    global _new_users_done, _users_writer
+    try:
+        while _new_users:
+            rows = list(_new_users.values())
+            _new_users.clear()
+            done, _new_users_done = _new_users_done, None
+            try:
+                await _insert_users(rows)
+            except Exception as e:
+                done.set_exception(e)
+                continue
+
+            for tg_id, *_ in rows:
+                _known_users.add(tg_id)
+                # строка могла уже быть (другой процесс) — перечитаем при надобности
+                _profiles.pop(tg_id)
+            done.set_result(None)
+    finally:
+        _users_writer = None
+
+
+@db_timed
+async def _insert_users(rows: list[tuple]):
+    async with _write_connection() as db:
+        await db.executemany(
             """
             INSERT OR IGNORE INTO users (tg_id, username, first_name, phone)
             VALUES (?, ?, ?, ?)
             """,
-            (tg_id, username, first_name, phone),
+            rows,
         )
         await db.commit()
 
 
-async def get_user_phone(tg_id: int) -> str | None:
+@db_timed
+async def save_user_phone(
+    tg_id: int,
+    username: str | None,
+    first_name: str | None,
+    phone: str,
+):
+    """Пользователь поделился контактом: создаём его или обновляем телефон одним запросом."""
+    async with _write_connection() as db:
+        async with db.execute(
+            """
+            INSERT INTO users (tg_id, username, first_name, phone)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (tg_id) DO UPDATE SET phone = excluded.phone
+            RETURNING username, first_name, phone
+            """,
+            (tg_id, username, first_name, phone),
+        ) as cursor:
+            row = await cursor.fetchone()
+        await db.commit()
+
+    _known_users.add(tg_id)
+    _profiles.set(tg_id, _profile(tg_id, *row))
+
+
+@db_timed
+async def get_user_profile(tg_id: int) -> dict | None:
+    """{"tg_id", "username", "first_name", "phone"} или None; из кэша, если он свежий."""
+    profile = _profiles.get(tg_id, _MISSING)
+    if profile is not _MISSING:
+        return profile
+
     async with aiosqlite.connect(DB_PATH) as db:
         async with db.execute(
-            "SELECT phone FROM users WHERE tg_id = ?", (tg_id,)
+            "SELECT username, first_name, phone FROM users WHERE tg_id = ?", (tg_id,)
         ) as cursor:
             row = await cursor.fetchone()
-            if row:
-                return row[0]
-    return None
+
+    profile = _profile(tg_id, *row) if row else None
+    _profiles.set(tg_id, profile)
+    return profile
+
+
+async def get_user_phone(tg_id: int) -> str | None:
+    profile = await get_user_profile(tg_id)
+    return profile["phone"] if profile else None
 
 
+@db_timed
 async def update_user_phone(tg_id: int, phone: str):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _write_connection() as db:
         await db.execute(
             "UPDATE users SET phone = ? WHERE tg_id = ?",
             (phone, tg_id),
         )
         await db.commit()
 
+    profile = _profiles.get(tg_id)
+    if profile is not None:
+        _profiles.set(tg_id, {**profile, "phone": phone})
+
 
+@db_timed
 async def get_users_count() -> int:
     async with aiosqlite.connect(DB_PATH) as db:
         async with db.execute("SELECT COUNT(*) FROM users") as cursor:
@@ -109,6 +367,35 @@ async def get_users_count() -> int:
             return row[0] if row else 0
 
 
+@db_timed
+async def save_activity(rows: list[tuple[str, int, int]]):
+    """Пачка (last_seen_at, сколько апдейтов, tg_id) от ActivityTracker."""
+    async with _write_connection() as db:
+        await db.executemany(
+            """
+            UPDATE users
+            SET last_seen_at = MAX(COALESCE(last_seen_at, ''), ?),
+                activity_count = activity_count + ?
+            WHERE tg_id = ?
+            """,
+            rows,
+        )
+        await db.commit()
+
+
+@db_timed
+async def get_active_users_count(days: int) -> int:
+    """Сколько пользователей было активно за последние `days` дней (по индексу last_seen_at)."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute(
+            "SELECT COUNT(*) FROM users WHERE last_seen_at >= datetime('now', ?)",
+            (f"-{days} days",),
+        ) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else 0
+
+
+@db_timed
 async def get_all_users() -> list[dict]:
     async with aiosqlite.connect(DB_PATH) as db:
         async with db.execute(
@@ -136,6 +423,7 @@ async def get_all_users() -> list[dict]:
 
 # ---------- BOOKINGS ----------
 
+@db_timed
 async def create_booking(
     tg_id: int,
     venue_id: int | None,
@@ -144,19 +432,208 @@ async def create_booking(
     time: str,
     people_count: int,
     comment: str,
-):
-    """Создаём запись о брони."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
+    jobs: list[tuple[str, dict] | tuple[str, dict, float]] | None = None,
+    capacity: int | None = None,
+) -> int:
+    """
+    Создаём запись о брони и возвращаем её id.
+    jobs — фоновые задачи (kind, payload[, delay]), которые попадут в очередь
+    в той же транзакции: либо бронь и задачи сохранятся вместе, либо ничего;
+    delay — через сколько секунд задачу можно выполнять.
+    capacity — мест в заведении на слот: если с этой бронью их не хватит,
+    ничего не сохраняем и бросаем SlotFullError (None — без ограничения).
+    """
+    if capacity is not None and people_count > capacity:
+        raise SlotFullError(venue_id, date, time)
+
+    async with _write_connection() as db:
+        load = None
+        if venue_id is not None:
+            # проверка и увеличение занятости — один запрос по первичному ключу,
+            # под блокировкой записи: параллельные брони не проскочат лимит
+            async with db.execute(
+                """
+                INSERT INTO slot_load (date, time, venue_id, people)
+                VALUES (:date, :time, :venue_id, :people)
+                ON CONFLICT (date, time, venue_id) DO UPDATE
+                SET people = slot_load.people + excluded.people
+                WHERE :capacity IS NULL OR slot_load.people + excluded.people <= :capacity
+                RETURNING people
+                """,
+                {
+                    "date": date,
+                    "time": time,
+                    "venue_id": venue_id,
+                    "people": people_count,
+                    "capacity": capacity,
+                },
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                await db.rollback()
+                # кэш мог отстать (бронь из другого процесса) — перечитаем при следующем показе
+                _slot_loads.pop(date)
+                raise SlotFullError(venue_id, date, time)
+            load = row[0]
+
+        cursor = await db.execute(
             """
             INSERT INTO bookings (tg_id, venue_id, category, date, time, people_count, comment)
             VALUES (?, ?, ?, ?, ?, ?, ?)
             """,
             (tg_id, venue_id, category, date, time, people_count, comment),
         )
+        booking_id = cursor.lastrowid
+        for kind, payload, *delay in jobs or ():
+            await _insert_job(
+                db,
+                kind,
+                {**payload, "booking_id": booking_id},
+                f"{kind}:booking:{booking_id}",
+                *delay,
+            )
         await db.commit()
 
+    if load is not None:
+        loads = _slot_loads.get(date)
+        if loads is not None:
+            loads.setdefault(time, {})[venue_id] = load
+    return booking_id
+
+
+@db_timed
+async def set_booking_status(
+    booking_id: int,
+    status: str,
+    expected: tuple[str, ...] = (BOOKING_PENDING,),
+    tg_id: int | None = None,
+    jobs: list[tuple[str, dict] | tuple[str, dict, float]] | None = None,
+) -> dict | None:
+    """
+    Переводим бронь в status, только если сейчас она в одном из expected
+    (два админа не обработают одну заявку дважды); tg_id — только бронь этого пользователя.
+    Отклонённая / отменённая бронь освобождает места в slot_load.
+    jobs — как в create_booking, в той же транзакции.
+    Возвращаем бронь или None, если переводить нечего.
+    """
+    async with _write_connection() as db:
+        async with db.execute(
+            f"""
+            UPDATE bookings SET status = ?
+            WHERE id = ? AND status IN ({", ".join("?" * len(expected))})
+              AND (? IS NULL OR tg_id = ?)
+            RETURNING tg_id, venue_id, date, time, people_count
+            """,
+            (status, booking_id, *expected, tg_id, tg_id),
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        booking = dict(
+            zip(("tg_id", "venue_id", "date", "time", "people_count"), row),
+            id=booking_id,
+            status=status,
+        )
+
+        load = None
+        if status in (BOOKING_DECLINED, BOOKING_CANCELLED) and booking["venue_id"] is not None:
+            async with db.execute(
+                """
+                UPDATE slot_load SET people = MAX(people - ?, 0)
+                WHERE date = ? AND time = ? AND venue_id = ?
+                RETURNING people
+                """,
+                (booking["people_count"], booking["date"], booking["time"], booking["venue_id"]),
+            ) as cursor:
+                row = await cursor.fetchone()
+            load = row[0] if row else None
+
+        for kind, payload, *delay in jobs or ():
+            await _insert_job(
+                db,
+                kind,
+                {**payload, "booking_id": booking_id},
+                f"{kind}:booking:{booking_id}:{status}",
+                *delay,
+            )
+        await db.commit()
+
+    if load is not None:
+        loads = _slot_loads.get(booking["date"])
+        if loads is not None:
+            loads.setdefault(booking["time"], {})[booking["venue_id"]] = load
+    return booking
+
+
+@db_timed
+async def get_booking(booking_id: int) -> dict | None:
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute(
+            """
+            SELECT tg_id, venue_id, category, date, time, people_count, comment, status, created_at
+            FROM bookings WHERE id = ?
+            """,
+            (booking_id,),
+        ) as cursor:
+            row = await cursor.fetchone()
+    if row is None:
+        return None
+    keys = (
+        "tg_id", "venue_id", "category", "date", "time",
+        "people_count", "comment", "status", "created_at",
+    )
+    return dict(zip(keys, row), id=booking_id)
+
+
+@db_timed
+async def get_pending_bookings(limit: int = 10) -> tuple[int, list[dict]]:
+    """
+    Очередь заявок для админов: (сколько всего ждёт, первые limit),
+    только на сегодня и позже, ближайшие визиты первыми (по idx_bookings_status).
+    """
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute(
+            """
+            SELECT COUNT(*) FROM bookings
+            WHERE status = 'pending' AND date >= date('now', 'localtime')
+            """
+        ) as cursor:
+            total = (await cursor.fetchone())[0]
+        async with db.execute(
+            """
+            SELECT id, tg_id, venue_id, category, date, time, people_count, comment
+            FROM bookings
+            WHERE status = 'pending' AND date >= date('now', 'localtime')
+            ORDER BY date, time
+            LIMIT ?
+            """,
+            (limit,),
+        ) as cursor:
+            rows = await cursor.fetchall()
+
+    keys = ("id", "tg_id", "venue_id", "category", "date", "time", "people_count", "comment")
+    return total, [dict(zip(keys, row)) for row in rows]
 
+
+@db_timed
+async def get_slot_loads(date: str) -> dict[str, dict[int, int]]:
+    """Занятость на дату: {time: {venue_id: людей}} (из кэша, если он свежий). Не изменять."""
+    loads = _slot_loads.get(date)
+    if loads is not None:
+        return loads
+
+    loads: dict[str, dict[int, int]] = {}
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute(
+            "SELECT time, venue_id, people FROM slot_load WHERE date = ?", (date,)
+        ) as cursor:
+            async for time_, venue_id, people in cursor:
+                loads.setdefault(time_, {})[venue_id] = people
+    _slot_loads.set(date, loads)
+    return loads
+
+
+@db_timed
 async def get_bookings_count() -> int:
     async with aiosqlite.connect(DB_PATH) as db:
         async with db.execute("SELECT COUNT(*) FROM bookings") as cursor:
@@ -164,11 +641,12 @@ async def get_bookings_count() -> int:
             return row[0] if row else 0
 
 
+@db_timed
 async def get_last_bookings(limit: int = 20) -> list[dict]:
     async with aiosqlite.connect(DB_PATH) as db:
         async with db.execute(
             """
-            SELECT tg_id, venue_id, category, date, time, people_count, comment, created_at
+            SELECT tg_id, venue_id, category, date, time, people_count, comment, status, created_at
             FROM bookings
             ORDER BY created_at DESC
             LIMIT ?
@@ -178,7 +656,7 @@ async def get_last_bookings(limit: int = 20) -> list[dict]:
             rows = await cursor.fetchall()
 
     result: list[dict] = []
-    for tg_id, venue_id, category, date_, time_, people_count, comment, created_at in rows:
+    for tg_id, venue_id, category, date_, time_, people_count, comment, status, created_at in rows:
         result.append(
             {
                 "tg_id": tg_id,
@@ -188,14 +666,56 @@ async def get_last_bookings(limit: int = 20) -> list[dict]:
                 "time": time_,
                 "people_count": people_count,
                 "comment": comment,
+                "status": status,
                 "created_at": created_at,
             }
         )
     return result
 
 
+@db_timed
+async def get_recent_bookings(tg_id: int, limit: int = 5) -> list[dict]:
+    """
+    Последние брони пользователя, без повторов одного и того же
+    заведения с тем же числом людей (по индексу bookings(tg_id, created_at)).
+    """
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute(
+            """
+            SELECT id, venue_id, category, time, people_count, comment
+            FROM bookings
+            WHERE tg_id = ? AND venue_id IS NOT NULL
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+            """,
+            (tg_id, limit * 4),
+        ) as cursor:
+            rows = await cursor.fetchall()
+
+    result: list[dict] = []
+    seen: set[tuple] = set()
+    for booking_id, venue_id, category, time_, people_count, comment in rows:
+        if (venue_id, people_count) in seen:
+            continue
+        seen.add((venue_id, people_count))
+        result.append(
+            {
+                "id": booking_id,
+                "venue_id": venue_id,
+                "category": category,
+                "time": time_,
+                "people_count": people_count,
+                "comment": comment,
+            }
+        )
+        if len(result) == limit:
+            break
+    return result
+
+
 # ---------- REVIEWS ----------
 
+@db_timed
 async def get_user_venue_ids(tg_id: int) -> list[int]:
     """Все заведения, которые этот пользователь когда-либо бронировал."""
     async with aiosqlite.connect(DB_PATH) as db:
@@ -211,6 +731,7 @@ async def get_user_venue_ids(tg_id: int) -> list[int]:
             return [row[0] for row in rows if row[0] is not None]
 
 
+@db_timed
 async def user_has_booking_for_venue(tg_id: int, venue_id: int) -> bool:
     """Есть ли у пользователя хоть одна бронь по этому заведению."""
     async with aiosqlite.connect(DB_PATH) as db:
@@ -226,6 +747,7 @@ async def user_has_booking_for_venue(tg_id: int, venue_id: int) -> bool:
             return row is not None
 
 
+@db_timed
 async def add_review(
     tg_id: int,
     venue_id: int,
@@ -233,7 +755,7 @@ async def add_review(
     text: str,
 ):
     """Добавляем отзыв."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _write_connection() as db:
         await db.execute(
             """
             INSERT INTO reviews (tg_id, venue_id, rating, text)
@@ -244,6 +766,7 @@ async def add_review(
         await db.commit()
 
 
+@db_timed
 async def get_reviews_count() -> int:
     async with aiosqlite.connect(DB_PATH) as db:
         async with db.execute("SELECT COUNT(*) FROM reviews") as cursor:
@@ -251,6 +774,7 @@ async def get_reviews_count() -> int:
             return row[0] if row else 0
 
 
+@db_timed
 async def get_last_reviews(limit: int = 20) -> list[dict]:
     async with aiosqlite.connect(DB_PATH) as db:
         async with db.execute(
@@ -276,3 +800,113 @@ async def get_last_reviews(limit: int = 20) -> list[dict]:
             }
         )
     return result
+
+
+# ---------- JOBS ----------
+
+async def _insert_job(
+    db: aiosqlite.Connection,
+    kind: str,
+    payload: dict,
+    dedup_key: str | None = None,
+    delay: float = 0.0,
+) -> None:
+    await db.execute(
+        """
+        INSERT OR IGNORE INTO jobs (kind, payload, dedup_key, run_at)
+        VALUES (?, ?, ?, ?)
+        """,
+        (kind, json.dumps(payload, ensure_ascii=False), dedup_key, time.time() + delay),
+    )
+
+
+@db_timed
+async def enqueue_job(
+    kind: str,
+    payload: dict,
+    dedup_key: str | None = None,
+    delay: float = 0.0,
+):
+    """Ставим задачу в очередь (повтор с тем же dedup_key игнорируется)."""
+    async with _write_connection() as db:
+        await _insert_job(db, kind, payload, dedup_key, delay)
+        await db.commit()
+
+
+@db_timed
+async def claim_jobs(limit: int, visibility: float) -> list[dict]:
+    """
+    Забираем до `limit` готовых задач и прячем их от других воркеров
+    на `visibility` секунд: если воркер упадёт, задача снова станет видна.
+    """
+    now = time.time()
+    async with _write_connection() as db:
+        async with db.execute(
+            """
+            UPDATE jobs
+            SET locked_until = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM jobs
+                WHERE status = 'pending' AND run_at <= ? AND locked_until <= ?
+                ORDER BY run_at
+                LIMIT ?
+            )
+            RETURNING id, kind, payload, attempts
+            """,
+            (now + visibility, now, now, limit),
+        ) as cursor:
+            rows = await cursor.fetchall()
+        await db.commit()
+
+    return [
+        {"id": job_id, "kind": kind, "payload": json.loads(payload), "attempts": attempts}
+        for job_id, kind, payload, attempts in rows
+    ]
+
+
+@db_timed
+async def complete_jobs(job_ids: list[int]):
+    async with _write_connection() as db:
+        await db.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in job_ids])
+        await db.commit()
+
+
+@db_timed
+async def fail_jobs(
+    job_ids: list[int],
+    error: str,
+    retry_in: float | None,
+    payloads: dict[int, dict] | None = None,
+):
+    """
+    Ошибка: перепланируем через retry_in секунд или (None) помечаем задачу dead.
+    payloads — новые payload по id задачи (что уже сделано, повторять не нужно).
+    """
+    async with _write_connection() as db:
+        if payloads:
+            await db.executemany(
+                "UPDATE jobs SET payload = ? WHERE id = ?",
+                [(json.dumps(payload, ensure_ascii=False), i) for i, payload in payloads.items()],
+            )
+        if retry_in is None:
+            await db.executemany(
+                "UPDATE jobs SET status = 'dead', locked_until = 0, last_error = ? WHERE id = ?",
+                [(error, i) for i in job_ids],
+            )
+        else:
+            await db.executemany(
+                "UPDATE jobs SET run_at = ?, locked_until = 0, last_error = ? WHERE id = ?",
+                [(time.time() + retry_in, error, i) for i in job_ids],
+            )
+        await db.commit()
+
+
+@db_timed
+async def get_jobs_stats() -> dict[str, int]:
+    """Сколько задач в очереди по статусам."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute(
+            "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+        ) as cursor:
+            rows = await cursor.fetchall()
+    return {status: count for status, count in rows}
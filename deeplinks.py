@@ -0,0 +1,65 @@
+# deeplinks.py
+"""
+Deep-link для брони в один тап: t.me/<бот>?start=<payload>.
+
+payload — части через "_" (Telegram разрешает только A-Z a-z 0-9 _ - и до 64 символов):
+    v12               — заведение id=12 (обязательно)
+    d20261020         — дата
+    t1930             — время
+    p4                — количество человек (6 = «6+»)
+Например: v12_d20261020_t1930_p4. Всё, чего нет в ссылке, бот спросит сам.
+"""
+import re
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+
+_PART = re.compile(r"^([vdtp])(\d+)$")
+
+
+class BookingLink(NamedTuple):
+    venue_id: int
+    date: Optional[date] = None
+    time: Optional[str] = None      # "19:30"
+    people: Optional[int] = None
+
+
+def parse_booking_link(payload: str) -> Optional[BookingLink]:
+    """None — это не ссылка на бронь (или она битая)."""
+    fields = {}
+    for part in payload.split("_"):
+        match = _PART.match(part)
+        if not match or match.group(1) in fields:
+            return None
+        fields[match.group(1)] = match.group(2)
+
+    if "v" not in fields:
+        return None
+
+    try:
+        link_date = datetime.strptime(fields["d"], "%Y%m%d").date() if "d" in fields else None
+        link_time = None
+        if "t" in fields:
+            link_time = datetime.strptime(fields["t"], "%H%M").strftime("%H:%M")
+    except ValueError:
+        return None
+
+    people = int(fields["p"]) if "p" in fields else None
+    if people is not None and not 1 <= people <= 6:
+        people = None
+
+    return BookingLink(int(fields["v"]), link_date, link_time, people)
+
+
+def booking_payload(link: BookingLink) -> str:
+    parts = [f"v{link.venue_id}"]
+    if link.date:
+        parts.append(f"d{link.date:%Y%m%d}")
+    if link.time:
+        parts.append(f"t{link.time.replace(':', '')}")
+    if link.people:
+        parts.append(f"p{link.people}")
+    return "_".join(parts)
+
+
+def booking_url(bot_username: str, link: BookingLink) -> str:
+    return f"https://t.me/{bot_username}?start={booking_payload(link)}"
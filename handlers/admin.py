@@ -1,68 +1,99 @@
 # handlers/admin.py
+from datetime import date
+from functools import cache
+from html import escape
+
 from aiogram import Router, F, types
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 
+import metrics
+from profiler import profiler
+from callbacks import AdminCB, AdminDeleteVenueCB, BookingStatusCB
 from config import get_settings
-from keyboards import main_menu_kb
+from keyboards import main_menu_kb, booking_actions_kb, BOOKING_STATUS_TEXT
 from db import (
     get_users_count,
+    get_active_users_count,
     get_bookings_count,
     get_reviews_count,
     get_all_users,
     get_last_bookings,
     get_last_reviews,
+    get_jobs_stats,
+    get_booking,
+    get_pending_bookings,
+    set_booking_status,
+    BOOKING_CONFIRMED,
+    BOOKING_DECLINED,
 )
+from jobs import worker as job_worker
 from venues import (
     get_all_venues,
     add_venue,
     delete_venue,
     get_venue_by_id,
+    catalog_cached,
 )
 
 router = Router()
 
 
 def _is_admin(user_id: int) -> bool:
-    """Проверяем, что user_id совпадает с ADMIN_ID из .env"""
-    settings = get_settings()
-    admin_env = settings.admin_id
-
-    if admin_env is None:
-        return False
-
-    try:
-        admin_id = int(admin_env)
-    except (TypeError, ValueError):
-        return False
-
-    return user_id == admin_id
+    """Проверяем, что user_id есть среди ADMIN_ID / ADMIN_IDS из .env"""
+    return user_id in get_settings().admin_chat_ids
 
 
 # ---------- клавиатуры ----------
 
+@cache
 def admin_menu_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="📊 Статистика", callback_data="admin:stats")],
-            [InlineKeyboardButton(text="👥 Пользователи", callback_data="admin:users")],
-            [InlineKeyboardButton(text="📅 Брони", callback_data="admin:bookings")],
-            [InlineKeyboardButton(text="⭐️ Отзывы", callback_data="admin:reviews")],
-            [InlineKeyboardButton(text="🏬 Заведения", callback_data="admin:venues")],
             [
                 InlineKeyboardButton(
-                    text="➕ Добавить заведение", callback_data="admin:add_venue"
+                    text="📊 Статистика", callback_data=AdminCB(section="stats").pack()
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="👥 Пользователи", callback_data=AdminCB(section="users").pack()
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="🕓 Заявки", callback_data=AdminCB(section="pending").pack()
+                ),
+                InlineKeyboardButton(
+                    text="📅 Брони", callback_data=AdminCB(section="bookings").pack()
+                ),
+            ],
+            [
+                InlineKeyboardButton(
+                    text="⭐️ Отзывы", callback_data=AdminCB(section="reviews").pack()
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="🏬 Заведения", callback_data=AdminCB(section="venues").pack()
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="➕ Добавить заведение", callback_data=AdminCB(section="add_venue").pack()
                 ),
                 InlineKeyboardButton(
-                    text="🗑 Удалить заведение", callback_data="admin:del_venue"
+                    text="🗑 Удалить заведение", callback_data=AdminCB(section="del_venue").pack()
                 ),
             ],
         ]
     )
 
 
+@catalog_cached
 def delete_venues_kb() -> InlineKeyboardMarkup:
     venues = get_all_venues()
     buttons: list[list[InlineKeyboardButton]] = []
@@ -72,7 +103,7 @@ def delete_venues_kb() -> InlineKeyboardMarkup:
             [
                 InlineKeyboardButton(
                     text=text,
-                    callback_data=f"admin_del_venue:{v.get('id')}",
+                    callback_data=AdminDeleteVenueCB(id=v.get("id")).pack(),
                 )
             ]
         )
@@ -94,14 +125,20 @@ class AddVenueStates(StatesGroup):
 
 async def _send_stats(message: types.Message):
     users = await get_users_count()
+    dau = await get_active_users_count(1)
+    wau = await get_active_users_count(7)
     bookings = await get_bookings_count()
     reviews = await get_reviews_count()
+    jobs = await get_jobs_stats()
 
     text = (
         "📊 <b>Статистика</b>\n\n"
         f"👥 Пользователи: <b>{users}</b>\n"
+        f"🟢 Активны за сутки / неделю: <b>{dau}</b> / <b>{wau}</b>\n"
         f"📅 Брони: <b>{bookings}</b>\n"
         f"⭐️ Отзывы: <b>{reviews}</b>\n"
+        f"📬 Очередь задач: <b>{jobs.get('pending', 0)}</b>"
+        f" (не выполнено: {jobs.get('dead', 0)})\n"
     )
     await message.answer(text, reply_markup=admin_menu_kb())
 
@@ -143,6 +180,7 @@ async def _send_bookings(message: types.Message):
             f"  Дата/время: {b['date']} {b['time']}\n"
             f"  Людей: {b['people_count']}\n"
             f"  Комментарий: {b['comment'] or '—'}\n"
+            f"  Статус: {BOOKING_STATUS_TEXT.get(b['status'], b['status'])}\n"
             f"  Создано: {b['created_at']}"
         )
         lines.append(line)
@@ -151,6 +189,54 @@ async def _send_bookings(message: types.Message):
     await message.answer(text)
 
 
+# заявок на одной странице очереди (и кнопок под ней)
+PENDING_PAGE = 10
+
+
+async def _pending_view() -> tuple[str, InlineKeyboardMarkup | None]:
+    total, bookings = await get_pending_bookings(limit=PENDING_PAGE)
+    if not bookings:
+        return "🕓 <b>Заявки</b>\n\nНовых заявок нет 🎉", None
+
+    lines = []
+    for b in bookings:
+        venue = get_venue_by_id(b["venue_id"]) if b["venue_id"] else None
+        people = b["people_count"]
+        line = (
+            f"<b>№{b['id']}</b> · {date.fromisoformat(b['date']).strftime('%d.%m')} {b['time']}"
+            f" · {venue['name'] if venue else '—'} · {people if people < 6 else '6+'} чел.\n"
+            f"  Пользователь id={b['tg_id']}"
+        )
+        if b["comment"]:
+            line += f"\n  Комментарий: {escape(b['comment'])}"
+        lines.append(line)
+
+    text = (
+        f"🕓 <b>Заявки</b>: ждут ответа {total}, ближайшие первыми\n\n"
+        + "\n\n".join(lines)
+    )
+    markup = booking_actions_kb([b["id"] for b in bookings], queue=True)
+    refresh = AdminCB(section="pending_refresh")
+    markup.inline_keyboard.append(
+        [InlineKeyboardButton(text="🔄 Обновить", callback_data=refresh.pack())]
+    )
+    return text, markup
+
+
+async def _send_pending(message: types.Message):
+    text, markup = await _pending_view()
+    await message.answer(text, reply_markup=markup)
+
+
+async def _edit_pending(message: types.Message):
+    text, markup = await _pending_view()
+    try:
+        await message.edit_text(text, reply_markup=markup)
+    except TelegramBadRequest as e:
+        if "not modified" not in str(e):
+            raise
+
+
 async def _send_reviews(message: types.Message):
     reviews = await get_last_reviews(limit=30)
     if not reviews:
@@ -215,12 +301,13 @@ async def admin_panel(message: types.Message):
 
     users = await get_users_count()
     bookings = await get_bookings_count()
+    pending, _ = await get_pending_bookings(limit=0)
     reviews = await get_reviews_count()
 
     text = (
         "🛠 <b>Админ-панель</b>\n\n"
         f"👥 Пользователи: <b>{users}</b>\n"
-        f"📅 Брони: <b>{bookings}</b>\n"
+        f"📅 Брони: <b>{bookings}</b> (ждут ответа: {pending})\n"
         f"⭐️ Отзывы: <b>{reviews}</b>\n\n"
         "Выберите раздел 👇"
     )
@@ -230,7 +317,7 @@ async def admin_panel(message: types.Message):
 
 # ---------- коллбек «Статистика» ----------
 
-@router.callback_query(F.data == "admin:stats")
+@router.callback_query(AdminCB.filter(F.section == "stats"))
 async def admin_stats_cb(callback: types.CallbackQuery):
     if not _is_admin(callback.from_user.id):
         await callback.answer("⛔ Нет доступа.", show_alert=True)
@@ -251,7 +338,7 @@ async def admin_users(message: types.Message):
     await _send_users(message)
 
 
-@router.callback_query(F.data == "admin:users")
+@router.callback_query(AdminCB.filter(F.section == "users"))
 async def admin_users_cb(callback: types.CallbackQuery):
     if not _is_admin(callback.from_user.id):
         await callback.answer("⛔ Нет доступа.", show_alert=True)
@@ -270,7 +357,7 @@ async def admin_bookings(message: types.Message):
     await _send_bookings(message)
 
 
-@router.callback_query(F.data == "admin:bookings")
+@router.callback_query(AdminCB.filter(F.section == "bookings"))
 async def admin_bookings_cb(callback: types.CallbackQuery):
     if not _is_admin(callback.from_user.id):
         await callback.answer("⛔ Нет доступа.", show_alert=True)
@@ -279,6 +366,87 @@ async def admin_bookings_cb(callback: types.CallbackQuery):
     await callback.answer()
 
 
+# ---------- заявки: подтвердить / отклонить ----------
+
+@router.message(Command("admin_pending"))
+async def admin_pending(message: types.Message):
+    if not _is_admin(message.from_user.id):
+        await message.answer("⛔ Нет доступа.")
+        return
+    await _send_pending(message)
+
+
+@router.callback_query(AdminCB.filter(F.section == "pending"))
+async def admin_pending_cb(callback: types.CallbackQuery):
+    if not _is_admin(callback.from_user.id):
+        await callback.answer("⛔ Нет доступа.", show_alert=True)
+        return
+    await _send_pending(callback.message)
+    await callback.answer()
+
+
+@router.callback_query(AdminCB.filter(F.section == "pending_refresh"))
+async def admin_pending_refresh_cb(callback: types.CallbackQuery):
+    if not _is_admin(callback.from_user.id):
+        await callback.answer("⛔ Нет доступа.", show_alert=True)
+        return
+    await callback.answer()
+    await _edit_pending(callback.message)
+
+
+def _status_row_booking(row: list[InlineKeyboardButton]) -> int | None:
+    """id заявки, если это строка «подтвердить / отклонить»; другие кнопки (навигация, ссылки) — None."""
+    data = row[0].callback_data if row else None
+    if not data or not data.startswith(f"{BookingStatusCB.__prefix__}{BookingStatusCB.__separator__}"):
+        return None
+    return BookingStatusCB.unpack(data).id
+
+
+@router.callback_query(BookingStatusCB.filter(F.action.in_({"confirm", "decline"})))
+async def admin_booking_status_cb(callback: types.CallbackQuery, callback_data: BookingStatusCB):
+    if not _is_admin(callback.from_user.id):
+        await callback.answer("⛔ Нет доступа.", show_alert=True)
+        return
+
+    # отвечаем на нажатие сразу, итог — в самом сообщении
+    await callback.answer()
+    status = BOOKING_CONFIRMED if callback_data.action == "confirm" else BOOKING_DECLINED
+    # переход только из «ждёт ответа»: второй админ увидит, чем заявка уже закончилась;
+    # ответ пользователю — задачей в той же транзакции (jobs.booking_status)
+    booking = await set_booking_status(
+        callback_data.id, status, jobs=[("booking_status", {"status": status})]
+    )
+    if booking is None:
+        current = await get_booking(callback_data.id)
+        status = current["status"] if current else None
+    else:
+        job_worker.wake(callback.bot)
+
+    if callback_data.q:
+        await _edit_pending(callback.message)
+        return
+
+    # уведомление о заявке: убираем её кнопки и дописываем, чем закончилось
+    keyboard = callback.message.reply_markup
+    rows = [
+        row
+        for row in (keyboard.inline_keyboard if keyboard else [])
+        if _status_row_booking(row) != callback_data.id
+    ]
+    result = BOOKING_STATUS_TEXT.get(status, "не найдена")
+    admin = callback.from_user
+    by = f"@{admin.username}" if admin.username else f"id={admin.id}"
+    markup = InlineKeyboardMarkup(inline_keyboard=rows) if rows else None
+    try:
+        await callback.message.edit_text(
+            f"{callback.message.html_text}\n\nЗаявка №{callback_data.id}: <b>{result}</b> ({by})",
+            reply_markup=markup,
+        )
+    except TelegramBadRequest:
+        # сводка уже на пределе длины сообщения — хотя бы уберём кнопки
+        await callback.message.edit_reply_markup(reply_markup=markup)
+
+
 # ---------- отзывы ----------
 
 @router.message(Command("admin_reviews"))
@@ -289,7 +457,7 @@ async def admin_reviews(message: types.Message):
     await _send_reviews(message)
 
 
-@router.callback_query(F.data == "admin:reviews")
+@router.callback_query(AdminCB.filter(F.section == "reviews"))
 async def admin_reviews_cb(callback: types.CallbackQuery):
     if not _is_admin(callback.from_user.id):
         await callback.answer("⛔ Нет доступа.", show_alert=True)
@@ -308,7 +476,7 @@ async def admin_venues(message: types.Message):
     await _send_venues(message)
 
 
-@router.callback_query(F.data == "admin:venues")
+@router.callback_query(AdminCB.filter(F.section == "venues"))
 async def admin_venues_cb(callback: types.CallbackQuery):
     if not _is_admin(callback.from_user.id):
         await callback.answer("⛔ Нет доступа.", show_alert=True)
@@ -317,6 +485,54 @@ async def admin_venues_cb(callback: types.CallbackQuery):
     await callback.answer()
 
 
+# ---------- метрики ----------
+
+@router.message(Command("metrics"))
+async def admin_metrics(message: types.Message):
+    if not _is_admin(message.from_user.id):
+        await message.answer("⛔ Нет доступа.")
+        return
+
+    text = metrics.render()
+    await message.answer_document(
+        BufferedInputFile(text.encode("utf-8"), filename="metrics.txt"),
+        caption="📈 Метрики бота (формат Prometheus)",
+    )
+
+
+# ---------- профайлер ----------
+
+@router.message(Command("profile"))
+async def admin_profile(message: types.Message):
+    """/profile [секунды] — снять сэмплирующий профиль живого бота."""
+    if not _is_admin(message.from_user.id):
+        await message.answer("⛔ Нет доступа.")
+        return
+
+    if profiler.active:
+        await message.answer("Профайлер уже запущен, дождитесь результата ⏳")
+        return
+
+    parts = (message.text or "").split()
+    try:
+        seconds = int(parts[1]) if len(parts) > 1 else 30
+    except ValueError:
+        seconds = 30
+    seconds = max(1, min(seconds, 300))
+
+    await message.answer(f"🔬 Профилирую {seconds} сек…")
+    collapsed = await profiler.run(seconds)
+
+    top = "\n".join(f"• {name}: {count}" for name, count in profiler.top_handlers())
+    await message.answer_document(
+        BufferedInputFile(collapsed.encode("utf-8"), filename="profile.collapsed"),
+        caption=(
+            f"Сэмплов: {profiler.samples} (простой цикла: {profiler.idle_samples})\n"
+            f"{top or 'Хендлеры не попали в сэмплы'}"
+        )[:1024],
+    )
+
+
 # ---------- добавление заведения (FSM) ----------
 
 @router.message(Command("add_venue"))
@@ -329,7 +545,7 @@ async def add_venue_start(message: types.Message, state: FSMContext):
     await _start_add_venue(message, state)
 
 
-@router.callback_query(F.data == "admin:add_venue")
+@router.callback_query(AdminCB.filter(F.section == "add_venue"))
 async def add_venue_from_menu(callback: types.CallbackQuery, state: FSMContext):
     if not _is_admin(callback.from_user.id):
         await callback.answer("⛔ Нет доступа.", show_alert=True)
@@ -410,7 +626,7 @@ async def add_venue_instagram(message: types.Message, state: FSMContext):
 
 # ---------- удаление заведения (по названию / списку) ----------
 
-@router.callback_query(F.data == "admin:del_venue")
+@router.callback_query(AdminCB.filter(F.section == "del_venue"))
 async def admin_del_venue_menu(callback: types.CallbackQuery):
     if not _is_admin(callback.from_user.id):
         await callback.answer("⛔ Нет доступа.", show_alert=True)
@@ -429,13 +645,15 @@ async def admin_del_venue_menu(callback: types.CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin_del_venue:"))
-async def admin_delete_venue_cb(callback: types.CallbackQuery):
+@router.callback_query(AdminDeleteVenueCB.filter())
+async def admin_delete_venue_cb(
+    callback: types.CallbackQuery, callback_data: AdminDeleteVenueCB
+):
     if not _is_admin(callback.from_user.id):
         await callback.answer("⛔ Нет доступа.", show_alert=True)
         return
 
-    venue_id = int(callback.data.split(":", 1)[1])
+    venue_id = callback_data.id
     venue = get_venue_by_id(venue_id)
     ok = delete_venue(venue_id)
     if not ok:
@@ -1,27 +1,66 @@
 # handlers/booking.py
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from functools import cache, lru_cache
+from html import escape
 import calendar as cal
 
 from aiogram import Router, F, types
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import StateFilter
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 
-from keyboards import main_menu_kb, phone_request_kb
+from callbacks import (
+    ModeCB,
+    FacetCB,
+    CategoryCB,
+    DistrictCB,
+    CalendarCB,
+    TimeCB,
+    PeopleCB,
+    VenueCB,
+    RepeatCB,
+    WizardCB,
+    BookingStatusCB,
+)
+from keyboards import main_menu_kb, phone_request_kb, booking_cancel_kb
 from db import (
     create_booking,
     get_user_phone,
-    update_user_phone,
-    upsert_user,
+    save_user_phone,
+    get_recent_bookings,
+    get_slot_loads,
+    set_booking_status,
+    SlotFullError,
+    BOOKING_PENDING,
+    BOOKING_CONFIRMED,
+    BOOKING_CANCELLED,
 )
 from venues import (
-    get_venues_by_category,  # можно оставить, даже если сейчас не используем
-    get_venues_by_district,
+    find_venues,
+    get_facet_index,
+    Facets,
+    PRICE_LEVELS,
     get_all_venues,
     get_districts,
+    get_categories,
+    get_categories_version,
+    get_districts_version,
+    category_by_id,
+    district_by_id,
     get_venue_by_id,
+    get_slots,
+    get_open_weekdays,
+    filter_mask,
+    slot_text,
+    ALL_WEEKDAYS,
+    DAY_MINUTES,
+    catalog_cached,
 )
 from config import get_settings
+from deeplinks import BookingLink
+from jobs import admin_notify_job, worker as job_worker
 
 router = Router()
 
@@ -31,85 +70,91 @@ class BookingStates(StatesGroup):
     choosing_mode = State()
     choosing_category = State()
     choosing_district = State()
+    choosing_facets = State()
     choosing_date = State()
     choosing_time = State()
     choosing_people = State()
     typing_comment = State()
     choosing_venue = State()
+    choosing_repeat = State()
 
 
 # ====== ВСПОМОГАТЕЛЬНЫЕ КЛАВИАТУРЫ ======
 
+# статичные клавиатуры собираем один раз (@cache),
+# клавиатуры из каталога — заново только после add_venue / delete_venue (@catalog_cached)
+
+def _back_button() -> InlineKeyboardButton:
+    return InlineKeyboardButton(text="⬅️ Назад", callback_data=WizardCB(action="back").pack())
+
+
+@cache
 def booking_mode_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(
                     text="Выбрать категорию / вид заведения",
-                    callback_data="mode:category",
+                    callback_data=ModeCB(mode="category").pack(),
                 )
             ],
             [
                 InlineKeyboardButton(
                     text="Выбрать заведение по району",
-                    callback_data="mode:district",
+                    callback_data=ModeCB(mode="district").pack(),
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="Подобрать по нескольким параметрам",
+                    callback_data=ModeCB(mode="facets").pack(),
                 )
             ],
         ]
     )
 
 
+@catalog_cached
 def categories_keyboard() -> InlineKeyboardMarkup:
-    """
-    Формируем клавиатуру категорий динамически из venues.json.
-    Убираем дубли типа 'Караоке' и 'караоке' (сравниваем без регистра),
-    но отображаем в том виде, как встретилось первым.
-    """
-    venues = get_all_venues()
-
-    # key = нижний регистр, value = "красивое" название
-    cat_map: dict[str, str] = {}
-
-    for v in venues:
-        cats_raw = v.get("category", "")
-        if not cats_raw:
-            continue
-
-        for c in cats_raw.split(","):
-            c_clean = c.strip()
-            if not c_clean:
-                continue
-
-            key = c_clean.lower()
-            if key not in cat_map:
-                cat_map[key] = c_clean   # запоминаем первую нормальную версию
-
+    """Клавиатура категорий из venues.json (см. venues.get_categories)."""
+    version = get_categories_version()
     buttons: list[list[InlineKeyboardButton]] = []
 
-    # сортируем по алфавиту без учёта регистра
-    for cat in sorted(cat_map.values(), key=str.lower):
+    for cat_id, cat in enumerate(get_categories(), start=1):
         buttons.append(
-            [InlineKeyboardButton(text=cat, callback_data=f"cat:{cat}")]
+            [
+                InlineKeyboardButton(
+                    text=cat,
+                    callback_data=CategoryCB(v=version, id=cat_id).pack(),
+                )
+            ]
         )
 
     # в конце — отдельная кнопка "Все заведения"
     buttons.append(
-        [InlineKeyboardButton(text="Все заведения", callback_data="cat:all")]
+        [
+            InlineKeyboardButton(
+                text="Все заведения",
+                callback_data=CategoryCB(v=version, id=0).pack(),
+            )
+        ]
     )
+    buttons.append([_back_button()])
 
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@catalog_cached
 def districts_keyboard() -> InlineKeyboardMarkup:
-    districts = get_districts()
+    version = get_districts_version()
     rows: list[list[InlineKeyboardButton]] = []
     row: list[InlineKeyboardButton] = []
 
-    for d in districts:
+    for district_id, d in enumerate(get_districts(), start=1):
         row.append(
             InlineKeyboardButton(
                 text=d,
-                callback_data=f"district:{d}",
+                callback_data=DistrictCB(v=version, id=district_id).pack(),
             )
         )
         if len(row) == 2:
@@ -118,73 +163,276 @@ def districts_keyboard() -> InlineKeyboardMarkup:
 
     if row:
         rows.append(row)
+    rows.append([_back_button()])
 
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def venues_keyboard(venues: list[dict]) -> InlineKeyboardMarkup:
+def venues_keyboard(venues: list[dict] | tuple[dict, ...]) -> InlineKeyboardMarkup:
     rows: list[list[InlineKeyboardButton]] = []
     for v in venues:
         rows.append(
             [
                 InlineKeyboardButton(
                     text=v["name"],
-                    callback_data=f"venue:{v['id']}",
+                    callback_data=VenueCB(id=v["id"]).pack(),
                 )
             ]
         )
+    rows.append([_back_button()])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+@catalog_cached(maxsize=1024)
+def venue_listing(
+    mode: str,
+    value: str | Facets,
+    weekday: int | None = None,
+    minutes: int | None = None,
+    full: frozenset[int] = frozenset(),
+) -> tuple[str, InlineKeyboardMarkup] | None:
+    """
+    Текст со списком заведений и клавиатура выбора для фильтра (None — пусто);
+    с weekday / minutes — только те, что открыты в выбранный слот,
+    full — id заведений, где на этот слот мест уже не хватит.
+    """
+    venues = find_venues(mode, value, weekday, minutes)
+    if full:
+        venues = tuple(v for v in venues if v["id"] not in full)
+    if not venues:
+        return None
+
+    parts = []
+    for i, v in enumerate(venues, start=1):
+        part = (
+            f"{i}️⃣ <b>{v['name']}</b>\n"
+            f"Категория: {v['category']}\n"
+            f"Район: {v['district']}\n"
+            f"📍 {v['address']}\n"
+            f"📞 {v['phone']}"
+        )
+        if v.get("instagram"):
+            part += f"\n🔗 {v['instagram']}"
+        parts.append(part)
+
+    text = (
+        "Варианты заведений:\n\n"
+        + "\n\n".join(parts)
+        + "\n\nТеперь выберите, для какого заведения оформить бронь 👇"
+    )
+    return text, venues_keyboard(venues)
+
+
+# ====== ПОДБОР ПО НЕСКОЛЬКИМ ПАРАМЕТРАМ ======
+# клавиатуры зависят только от выбранных фильтров и каталога —
+# у разных пользователей с одинаковым выбором они общие (LRU по Facets)
+
+PRICE_TEXT = {1: "₸", 2: "₸₸", 3: "₸₸₸", 4: "₸₸₸₸"}
+
+
+def describe_facets(facets: Facets) -> str:
+    parts = []
+    if facets.category:
+        parts.append(facets.category)
+    if facets.district:
+        parts.append(f"район {facets.district}")
+    if facets.price_level:
+        parts.append(PRICE_TEXT[facets.price_level])
+    if facets.karaoke:
+        parts.append("караоке")
+    if facets.open_late:
+        parts.append("допоздна")
+    return ", ".join(parts) or "любые заведения"
+
+
+def _facet_button(text: str, **callback) -> InlineKeyboardButton:
+    return InlineKeyboardButton(text=text, callback_data=FacetCB(**callback).pack())
+
+
+def facets_text(facets: Facets) -> str:
+    return (
+        f"Подбор: <b>{describe_facets(facets)}</b>\n"
+        f"Подходит заведений: <b>{get_facet_index().count(facets)}</b>\n\n"
+        "Отметьте, что для вас важно 👇"
+    )
+
+
+@catalog_cached(maxsize=1024)
+def facets_keyboard(facets: Facets) -> InlineKeyboardMarkup:
+    index = get_facet_index()
+    rows: list[list[InlineKeyboardButton]] = [
+        [_facet_button(f"🍽 Категория: {facets.category or 'любая'}", action="menu_category")],
+        [_facet_button(f"📍 Район: {facets.district or 'любой'}", action="menu_district")],
+    ]
+
+    # цены показываем, только если они вообще заполнены в каталоге
+    if index.prices:
+        counts = index.counts(facets, "price_level", PRICE_LEVELS)
+        rows.append(
+            [
+                _facet_button(
+                    f"{'✅' if facets.price_level == level else ''}{PRICE_TEXT[level]} ({counts[level]})",
+                    action="price",
+                    value=level,
+                )
+                for level in PRICE_LEVELS
+            ]
+        )
+
+    toggles = []
+    for field, action, title in (
+        ("karaoke", "karaoke", "🎤 Караоке"),
+        ("open_late", "late", "🌙 Допоздна"),
+    ):
+        count = index.toggle_count(facets, field)
+        selected = getattr(facets, field)
+        if count or selected:
+            toggles.append(
+                _facet_button(f"{'✅ ' if selected else ''}{title} ({count})", action=action)
+            )
+    if toggles:
+        rows.append(toggles)
+
+    rows.append([_facet_button(f"➡️ Дальше ({index.count(facets)})", action="done")])
+    if facets != Facets():
+        rows.append([_facet_button("♻️ Сбросить", action="reset"), _back_button()])
+    else:
+        rows.append([_back_button()])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+@catalog_cached(maxsize=1024)
+def facet_categories_keyboard(facets: Facets) -> InlineKeyboardMarkup:
+    """Категории с числом заведений при остальных выбранных фильтрах (пустые скрываем)."""
+    index = get_facet_index()
+    version = get_categories_version()
+    categories = get_categories()
+    counts = index.counts(facets, "category", categories)
+
+    any_count = index.mask(facets, skip="category").bit_count()
+    buttons = [[_facet_button(f"Любая ({any_count})", action="category", v=version)]]
+    for cat_id, cat in enumerate(categories, start=1):
+        if counts[cat] or cat == facets.category:
+            mark = "✅ " if cat == facets.category else ""
+            buttons.append(
+                [
+                    _facet_button(
+                        f"{mark}{cat} ({counts[cat]})",
+                        action="category",
+                        v=version,
+                        value=cat_id,
+                    )
+                ]
+            )
+    buttons.append([_facet_button("⬅️ Назад", action="back")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+@catalog_cached(maxsize=1024)
+def facet_districts_keyboard(facets: Facets) -> InlineKeyboardMarkup:
+    index = get_facet_index()
+    version = get_districts_version()
+    districts = get_districts()
+    counts = index.counts(facets, "district", districts)
+
+    any_count = index.mask(facets, skip="district").bit_count()
+    rows = [[_facet_button(f"Любой ({any_count})", action="district", v=version)]]
+    row: list[InlineKeyboardButton] = []
+    for district_id, d in enumerate(districts, start=1):
+        if not counts[d] and d != facets.district:
+            continue
+        mark = "✅ " if d == facets.district else ""
+        row.append(
+            _facet_button(
+                f"{mark}{d} ({counts[d]})",
+                action="district",
+                v=version,
+                value=district_id,
+            )
+        )
+        if len(row) == 2:
+            rows.append(row)
+            row = []
+
+    if row:
+        rows.append(row)
+    rows.append([_facet_button("⬅️ Назад", action="back")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def _build_month_calendar(year: int, month: int) -> InlineKeyboardMarkup:
+# насколько вперёд можно бронировать (дней)
+BOOKING_HORIZON_DAYS = 90
+# на сегодня — только слоты не раньше чем через столько минут
+BOOKING_LEAD_MINUTES = 30
+
+COMMENT_PROMPT = (
+    "Напиши, пожалуйста, комментарий к брони "
+    "(повод, бюджет, предпочтения) или нажми «Без комментария»."
+)
+
+
+_CAL_IGNORE = CalendarCB(action="ignore").pack()
+
+
+def _ignore_button(text: str = " ") -> InlineKeyboardButton:
+    return InlineKeyboardButton(text=text, callback_data=_CAL_IGNORE)
+
+
+@lru_cache(maxsize=64)
+def _build_month_calendar(
+    year: int, month: int, today: date, back: bool = True, open_days: int = ALL_WEEKDAYS
+) -> InlineKeyboardMarkup:
+    """
+    Календарь на месяц. Кэшируется по (year, month, today): листание месяцев
+    туда-обратно — попадание в кэш, а с наступлением нового дня ключ меняется сам.
+    Прошедшие дни, дни за горизонтом бронирования и выходные (нет бита
+    дня недели в open_days, см. venues.get_open_weekdays) — неактивные кнопки (ignore).
+    back=False — дата первый шаг (deep-link, повтор брони), назад идти некуда.
+    """
     keyboard: list[list[InlineKeyboardButton]] = []
+    horizon = today + timedelta(days=BOOKING_HORIZON_DAYS)
 
     month_name = datetime(year, month, 1).strftime("%b %Y")
+    can_prev = (year, month) > (today.year, today.month)
+    can_next = _change_month(year, month, +1) <= (horizon.year, horizon.month)
     header_row = [
         InlineKeyboardButton(
             text="<",
-            callback_data=f"cal:prev:{year}-{month:02d}",
-        ),
-        InlineKeyboardButton(
-            text=month_name,
-            callback_data="cal:ignore",
-        ),
+            callback_data=CalendarCB(action="prev", value=year * 12 + month - 1).pack(),
+        ) if can_prev else _ignore_button(),
+        _ignore_button(month_name),
         InlineKeyboardButton(
             text=">",
-            callback_data=f"cal:next:{year}-{month:02d}",
-        ),
+            callback_data=CalendarCB(action="next", value=year * 12 + month - 1).pack(),
+        ) if can_next else _ignore_button(),
     ]
     keyboard.append(header_row)
 
     week_days = ["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su"]
-    keyboard.append(
-        [
-            InlineKeyboardButton(text=d, callback_data="cal:ignore")
-            for d in week_days
-        ]
-    )
+    keyboard.append([_ignore_button(d) for d in week_days])
 
     cal_obj = cal.Calendar(firstweekday=0)
     for week in cal_obj.monthdayscalendar(year, month):
         row: list[InlineKeyboardButton] = []
         for day_num in week:
             if day_num == 0:
-                row.append(
-                    InlineKeyboardButton(
-                        text=" ",
-                        callback_data="cal:ignore",
-                    )
-                )
+                row.append(_ignore_button())
+                continue
+
+            d = date(year, month, day_num)
+            if d < today or d > horizon or not open_days >> d.weekday() & 1:
+                row.append(_ignore_button("·"))
             else:
-                d = date(year, month, day_num)
                 row.append(
                     InlineKeyboardButton(
                         text=str(day_num),
-                        callback_data=f"cal:day:{d.isoformat()}",
+                        callback_data=CalendarCB(action="day", value=d.toordinal()).pack(),
                     )
                 )
         keyboard.append(row)
 
+    if back:
+        keyboard.append([_back_button()])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
@@ -199,20 +447,34 @@ def _change_month(year: int, month: int, delta: int) -> tuple[int, int]:
     return year, month
 
 
-def time_keyboard() -> InlineKeyboardMarkup:
-    times = ["16:00", "17:00", "18:00", "19:00", "20:00", "21:00", "22:00"]
+def _clamp_month(year: int, month: int, today: date) -> tuple[int, int]:
+    """Не даём уйти в прошлое и дальше горизонта бронирования."""
+    horizon = today + timedelta(days=BOOKING_HORIZON_DAYS)
+    return min(max((year, month), (today.year, today.month)), (horizon.year, horizon.month))
+
+
+@lru_cache(maxsize=256)
+def time_keyboard(slots: tuple[int, ...], full: frozenset[int] = frozenset()) -> InlineKeyboardMarkup:
+    """
+    Слоты из venues.get_slots — у многих фильтров они одинаковые, клавиатура общая;
+    full — слоты, где мест уже нет (показываем зачёркнутыми, выбрать нельзя).
+    """
     buttons = []
-    for t in times:
-        buttons.append(
-            InlineKeyboardButton(
-                text=t,
-                callback_data=f"time:{t}",
-            )
-        )
+    for minutes in slots:
+        cb = TimeCB(minutes=minutes)
+        text = cb.text
+        if minutes in full:
+            text = f"✖️ {text}"
+        elif minutes >= DAY_MINUTES:
+            # после полуночи — ночь после выбранной даты
+            text = f"🌙 {text}"
+        buttons.append(InlineKeyboardButton(text=text, callback_data=cb.pack()))
     rows = [buttons[i: i + 3] for i in range(0, len(buttons), 3)]
+    rows.append([_back_button()])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@cache
 def people_keyboard() -> InlineKeyboardMarkup:
     options = [1, 2, 3, 4, 5, 6]
     buttons = []
@@ -221,16 +483,326 @@ def people_keyboard() -> InlineKeyboardMarkup:
         buttons.append(
             InlineKeyboardButton(
                 text=text,
-                callback_data=f"people:{n}",
+                callback_data=PeopleCB(n=n).pack(),
             )
         )
     rows = [buttons[i: i + 3] for i in range(0, len(buttons), 3)]
+    rows.append([_back_button()])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@cache
+def comment_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="Без комментария",
+                    callback_data=WizardCB(action="no_comment").pack(),
+                )
+            ],
+            [_back_button()],
+        ]
+    )
+
+
+# ====== МАСТЕР БРОНИ ======
+# вся бронь — одно сообщение, которое редактируется от шага к шагу:
+# сверху сводка уже выбранного, снизу вопрос текущего шага и «⬅️ Назад».
+# Шаг определяется по данным FSM (первое незаполненное поле), поэтому
+# «Назад» — это просто удалить последнее заполненное поле и показать шаг заново.
+
+# поле выбранного фильтра для каждого режима подбора
+_FILTER_FIELDS = {"category": "category", "district": "district", "facets": "facets_done"}
+
+
+def _wizard_fields(mode: str | None) -> tuple[str, ...]:
+    """Поля брони по порядку шагов; mode="venue" — заведение уже известно (deep-link, повтор)."""
+    if mode == "venue":
+        return ("date", "time", "people", "comment")
+    return ("mode", _FILTER_FIELDS.get(mode, "category"), "date", "time", "people", "comment", "venue_id")
+
+
+def _missing_field(data: dict) -> str | None:
+    return next((f for f in _wizard_fields(data.get("mode")) if f not in data), None)
+
+
+def _step_back(data: dict) -> dict:
+    """Данные на шаг назад: убираем последнее заполненное поле перед текущим шагом."""
+    fields = _wizard_fields(data.get("mode"))
+    missing = _missing_field(data)
+    current = fields.index(missing) if missing else len(fields)
+    for field in reversed(fields[:current]):
+        if field in data:
+            data = {k: v for k, v in data.items() if k != field}
+            if field == "mode":
+                data.pop("facets", None)
+            break
+    return data
+
+
+def booking_lines(data: dict, venue: dict | None = None) -> list[str]:
+    """Строки «• Поле: значение» про всё, что уже выбрано."""
+    mode = data.get("mode")
+    lines = []
+    if mode == "category" and data.get("category"):
+        category = data["category"]
+        lines.append(f"• Тип заведения: <b>{'Любой' if category == 'all' else category}</b>")
+    elif mode == "district" and data.get("district"):
+        lines.append(f"• Район: <b>{data['district']}</b>")
+    elif mode == "facets" and data.get("facets_done"):
+        lines.append(f"• Подбор: <b>{describe_facets(Facets(**data.get('facets', {})))}</b>")
+
+    venue = venue or (get_venue_by_id(data["venue_id"]) if data.get("venue_id") else None)
+    if venue:
+        lines.append(f"• Заведение: <b>{venue['name']}</b>")
+    if data.get("date"):
+        lines.append(f"• Дата: <b>{date.fromisoformat(data['date']).strftime('%d.%m.%Y')}</b>")
+    if data.get("time"):
+        lines.append(f"• Время: <b>{data['time']}</b>")
+    if data.get("people"):
+        people = data["people"]
+        lines.append(f"• Количество человек: <b>{people if people < 6 else '6+'}</b>")
+    if "comment" in data:
+        lines.append(f"• Комментарий: <b>{escape(data['comment']) or 'без комментариев'}</b>")
+    return lines
+
+
+def booking_summary(data: dict) -> str:
+    """Шапка сообщения мастера: что уже выбрано."""
+    lines = booking_lines(data)
+    if not lines:
+        return ""
+    return "🔔 <b>Бронь</b>\n" + "\n".join(lines) + "\n\n"
+
+
+def _booking_filter(data: dict) -> tuple[str, object]:
+    """(mode, value) для venues.get_slots / find_venues по данным брони."""
+    mode = data.get("mode")
+    if mode == "venue":
+        return mode, data.get("venue_id")
+    if mode == "facets":
+        return mode, Facets(**data.get("facets", {}))
+    return mode, data.get(_FILTER_FIELDS.get(mode, "category"))
+
+
+def _day_slots(data: dict, day: date) -> tuple[int, ...]:
+    """Слоты на дату: кто-то под фильтр открыт; на сегодня — ещё не прошедшие."""
+    slots = get_slots(*_booking_filter(data), day.weekday())
+    if day == date.today():
+        now = datetime.now()
+        earliest = now.hour * 60 + now.minute + BOOKING_LEAD_MINUTES
+        slots = tuple(m for m in slots if m >= earliest)
+    return slots
+
+
+def _slot_for(data: dict, day: date, time_str: str) -> int | None:
+    """Слот (минуты) с таким временем на дату; None — в это время никто не работает."""
+    return next((m for m in _day_slots(data, day) if slot_text(m) == time_str), None)
+
+
+def _booked_out(loads: dict, time_str: str, people: int) -> set[int]:
+    """Заведения, где на это время уже не хватит мест на people человек (loads — db.get_slot_loads)."""
+    capacities = get_facet_index().capacities
+    return {
+        venue_id
+        for venue_id, taken in loads.get(time_str, {}).items()
+        if venue_id in capacities and taken + people > capacities[venue_id]
+    }
+
+
+def _full_venues(loads: dict, time_str: str, people: int) -> frozenset[int]:
+    """Заведения, куда people человек на это время уже не попадут: занято или столько не вмещают."""
+    undersized, _ = get_facet_index().undersized(people)
+    return undersized | _booked_out(loads, time_str, people)
+
+
+def _full_slots(data: dict, loads: dict, day: date, slots: tuple[int, ...]) -> frozenset[int]:
+    """Слоты, где все подходящие под фильтр открытые заведения уже заняты."""
+    index = get_facet_index()
+    people = data.get("people") or 1
+    _, undersized = index.undersized(people)
+    mask = filter_mask(*_booking_filter(data)) & ~undersized
+    full = set()
+    for minutes in slots:
+        taken = 0
+        for venue_id in _booked_out(loads, slot_text(minutes), people):
+            taken |= index.venue_mask(venue_id)
+        if not mask & index.slot_mask(day.weekday(), minutes) & ~taken:
+            full.add(minutes)
+    return frozenset(full)
+
+
+def _venue_capacity(data: dict) -> int | None:
+    """Мест на слот в выбранном заведении (None — заведение не выбрано или без лимита)."""
+    return get_facet_index().capacities.get(data.get("venue_id"))
+
+
+def _too_many_people(capacity: int) -> str:
+    return f"😔 В этом заведении помещается не больше {capacity} человек — выберите меньше."
+
+
+def _calendar(data: dict, year: int, month: int) -> InlineKeyboardMarkup:
+    return _build_month_calendar(
+        year,
+        month,
+        date.today(),
+        back=data.get("mode") != "venue",
+        open_days=get_open_weekdays(*_booking_filter(data)),
+    )
+
+
+def _wizard_step(
+    data: dict, loads: dict | None = None
+) -> tuple[State | None, str, InlineKeyboardMarkup | None]:
+    """
+    Состояние, вопрос и клавиатура текущего шага; None — спрашивать больше нечего.
+    loads — занятость на выбранную дату (db.get_slot_loads); SlotFullError —
+    все подходящие заведения на выбранное время уже заняты.
+    """
+    loads = loads or {}
+    missing = _missing_field(data)
+
+    if missing == "mode":
+        return BookingStates.choosing_mode, "Как будем подбирать заведение? 👇", booking_mode_keyboard()
+    if missing == "category":
+        return (
+            BookingStates.choosing_category,
+            "Выберите категорию / вид заведения 👇",
+            categories_keyboard(),
+        )
+    if missing == "district":
+        return BookingStates.choosing_district, "Выберите район 👇", districts_keyboard()
+    if missing == "facets_done":
+        facets = Facets(**data.get("facets", {}))
+        return BookingStates.choosing_facets, facets_text(facets), facets_keyboard(facets)
+    if missing == "date":
+        today = date.today()
+        return BookingStates.choosing_date, "Выберите дату:", _calendar(data, today.year, today.month)
+    if missing == "time":
+        day = date.fromisoformat(data["date"])
+        slots = _day_slots(data, day)
+        full = _full_slots(data, loads, day, slots)
+        if len(full) == len(slots):
+            return (
+                BookingStates.choosing_time,
+                "На эту дату свободного времени уже нет 😔 Вернитесь и выберите другую дату.",
+                time_keyboard(()),
+            )
+        return BookingStates.choosing_time, "Теперь выбери время:", time_keyboard(slots, full)
+    if missing == "people":
+        return BookingStates.choosing_people, "Сколько человек будет?", people_keyboard()
+    if missing == "comment":
+        return BookingStates.typing_comment, COMMENT_PROMPT, comment_keyboard()
+    if missing == "venue_id":
+        # подбираем заведения, открытые в выбранный слот
+        # (список, текст и клавиатура кэшируются по фильтру и слоту)
+        day = date.fromisoformat(data["date"])
+        minutes = _slot_for(data, day, data["time"])
+        listing = None
+        if minutes is not None:
+            mode, value = _booking_filter(data)
+            full = _full_venues(loads, data["time"], data["people"])
+            listing = venue_listing(mode, value, day.weekday(), minutes, full)
+            if listing is None and full and find_venues(mode, value, day.weekday(), minutes):
+                raise SlotFullError(None, data["date"], data["time"])
+        if listing is not None:
+            text, keyboard = listing
+            return BookingStates.choosing_venue, text, keyboard
+    return None, "", None
+
+
+async def show_step(
+    bot,
+    chat_id: int,
+    user: types.User,
+    state: FSMContext,
+    message_id: int | None = None,
+    notice: str = "",
+) -> None:
+    """
+    Показать текущий шаг мастера: отредактировать сообщение message_id
+    (или отправить новое). Если всё выбрано — оформить бронь.
+    notice — строка над шагом (почему выбор не принят).
+    """
+    data = await state.get_data()
+    capacity = _venue_capacity(data)
+    if capacity is not None and data.get("people", 0) > capacity:
+        # deep-link / повтор брони с компанией больше, чем вмещает заведение, —
+        # такую бронь не примут ни на какое время: спросим число людей заново
+        data = {k: v for k, v in data.items() if k != "people"}
+        await state.set_data(data)
+        notice = _too_many_people(capacity)
+    loads = await get_slot_loads(data["date"]) if data.get("date") else None
+    text = None
+    try:
+        step_state, prompt, markup = _wizard_step(data, loads)
+        if step_state is None:
+            await state.clear()
+            venue = get_venue_by_id(data.get("venue_id"))
+            if venue:
+                text, markup = await _save_booking(user, bot, data, venue)
+            elif data.get("mode") == "venue":
+                text = "Это заведение больше недоступно 😔 Выберите другое через «🔔 Забронировать»."
+            else:
+                text = (
+                    "Пока нет заведений по выбранным параметрам 😔\n"
+                    "Мы всё равно свяжемся с вами при появлении подходящих вариантов."
+                )
+    except SlotFullError:
+        # места на это время разобрали, пока пользователь выбирал, — заново к выбору времени
+        # (заведение тоже: его подбирали под это время)
+        dropped = ("time",) if data.get("mode") == "venue" else ("time", "venue_id")
+        data = {k: v for k, v in data.items() if k not in dropped}
+        await state.set_data(data)
+        loads = await get_slot_loads(data["date"])
+        notice = "😔 Пока вы выбирали, места на это время закончились — выберите другое."
+        step_state, prompt, markup = _wizard_step(data, loads)
+
+    if text is None:
+        text = f"{booking_summary(data)}{prompt}"
+        if notice:
+            text = f"{notice}\n\n{text}"
+        await state.set_state(step_state)
+
+    if message_id is not None:
+        try:
+            await bot.edit_message_text(
+                text=text, chat_id=chat_id, message_id=message_id, reply_markup=markup
+            )
+        except TelegramBadRequest as e:
+            if "not modified" in str(e):
+                return
+            # сообщение удалено / слишком старое — тогда уж новое
+            message_id = None
+
+    if message_id is None:
+        sent = await bot.send_message(chat_id, text, reply_markup=markup)
+        if step_state is not None:
+            # сюда же потом отредактируем шаг после текстового комментария
+            await state.update_data(wizard_id=sent.message_id)
+
+
+async def _show_step_from(
+    callback: types.CallbackQuery, state: FSMContext, notice: str = ""
+) -> None:
+    await show_step(
+        callback.bot,
+        callback.message.chat.id,
+        callback.from_user,
+        state,
+        message_id=callback.message.message_id,
+        notice=notice,
+    )
+
+
+async def _show_step_new(message: types.Message, state: FSMContext) -> None:
+    await show_step(message.bot, message.chat.id, message.from_user, state)
+
+
 # ====== СТАРТ БРОНИ ======
 
-@router.message(F.text == "🔔 Забронировать")
+@router.message(F.text == "🔔 Забронировать", flags={"throttling_cost": 3})
 async def booking_start(message: types.Message, state: FSMContext):
     await state.clear()
 
@@ -244,11 +816,53 @@ async def booking_start(message: types.Message, state: FSMContext):
         )
         return
 
-    await state.set_state(BookingStates.choosing_mode)
-    await message.answer(
-        "Как будем подбирать заведение? 👇",
-        reply_markup=booking_mode_keyboard(),
-    )
+    # телефон нужен в уведомлении админам — не перечитываем его из БД в конце
+    await state.update_data(phone=phone)
+    await _show_step_new(message, state)
+
+
+# ====== БРОНЬ ПО DEEP-LINK ======
+
+async def start_booking_from_link(
+    message: types.Message, state: FSMContext, link: BookingLink
+) -> None:
+    """/start с payload брони: заполняем то, что пришло в ссылке, и спрашиваем остальное."""
+    await state.clear()
+
+    venue = get_venue_by_id(link.venue_id)
+    if not venue:
+        await message.answer(
+            "Заведение из ссылки не найдено 😔 Выберите другое через «🔔 Забронировать».",
+            reply_markup=main_menu_kb,
+        )
+        return
+
+    data: dict = {"mode": "venue", "venue_id": venue["id"]}
+    today = date.today()
+    if link.date and today <= link.date <= today + timedelta(days=BOOKING_HORIZON_DAYS):
+        data["date"] = link.date.isoformat()
+    # время без даты проверим, когда дату выберут (date_chosen)
+    if link.time and ("date" not in data or _slot_for(data, link.date, link.time) is not None):
+        data["time"] = link.time
+    if link.people:
+        data["people"] = link.people
+
+    phone = await get_user_phone(message.from_user.id)
+    if phone:
+        data["phone"] = phone
+    await state.update_data(data)
+
+    if not phone:
+        await state.set_state(BookingStates.waiting_phone)
+        await message.answer(
+            f"Бронь в <b>{venue['name']}</b>.\n\n"
+            "📱 Перед бронированием отправьте, пожалуйста, номер телефона.\n\n"
+            "Нажмите кнопку «📱 Отправить номер» ниже.",
+            reply_markup=phone_request_kb,
+        )
+        return
+
+    await _show_step_new(message, state)
 
 
 # ====== ТЕЛЕФОН ======
@@ -258,24 +872,21 @@ async def phone_received(message: types.Message, state: FSMContext):
     contact = message.contact
     phone = contact.phone_number
 
-    await update_user_phone(message.from_user.id, phone)
-    await upsert_user(
+    await save_user_phone(
         tg_id=message.from_user.id,
         username=message.from_user.username,
         first_name=message.from_user.first_name,
         phone=phone,
     )
 
+    # отдельное сообщение нужно, чтобы вернуть главное меню вместо кнопки «Отправить номер»
     await message.answer(
         "Спасибо! Сохранил ваш номер телефона ✅",
         reply_markup=main_menu_kb,
     )
 
-    await state.set_state(BookingStates.choosing_mode)
-    await message.answer(
-        "Теперь выберите, как будем подбирать заведение 👇",
-        reply_markup=booking_mode_keyboard(),
-    )
+    await state.update_data(phone=phone)
+    await _show_step_new(message, state)
 
 
 @router.message(BookingStates.waiting_phone)
@@ -286,228 +897,320 @@ async def phone_waiting_wrong(message: types.Message, state: FSMContext):
     )
 
 
-# ====== РЕЖИМ: КАТЕГОРИЯ / РАЙОН ======
+# ====== НАЗАД ======
 
-@router.callback_query(BookingStates.choosing_mode, F.data == "mode:category")
-async def mode_category(callback: types.CallbackQuery, state: FSMContext):
-    await state.update_data(mode="category")
-    await state.set_state(BookingStates.choosing_category)
+@router.callback_query(StateFilter(BookingStates), WizardCB.filter(F.action == "back"))
+async def wizard_back(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
-    await callback.message.edit_text(
-        "Выберите категорию / вид заведения 👇",
-        reply_markup=categories_keyboard(),
-    )
+    await state.set_data(_step_back(await state.get_data()))
+    await _show_step_from(callback, state)
+
 
+# ====== РЕЖИМ: КАТЕГОРИЯ / РАЙОН / ПОДБОР ======
 
-@router.callback_query(BookingStates.choosing_mode, F.data == "mode:district")
-async def mode_district(callback: types.CallbackQuery, state: FSMContext):
-    await state.update_data(mode="district")
-    await state.set_state(BookingStates.choosing_district)
+@router.callback_query(BookingStates.choosing_mode, ModeCB.filter(F.mode.in_(_FILTER_FIELDS)))
+async def mode_chosen(callback: types.CallbackQuery, callback_data: ModeCB, state: FSMContext):
     await callback.answer()
-    await callback.message.edit_text(
-        "Выберите район 👇",
-        reply_markup=districts_keyboard(),
-    )
+    await state.update_data(mode=callback_data.mode)
+    await _show_step_from(callback, state)
 
 
 # ====== ВЫБОР КАТЕГОРИИ / РАЙОНА ======
 
-@router.callback_query(BookingStates.choosing_category, F.data.startswith("cat:"))
-async def category_chosen(callback: types.CallbackQuery, state: FSMContext):
-    category = callback.data.split(":", 1)[1]
-    await state.update_data(category=category)
+@router.callback_query(BookingStates.choosing_category, CategoryCB.filter())
+async def category_chosen(
+    callback: types.CallbackQuery, callback_data: CategoryCB, state: FSMContext
+):
+    if callback_data.id == 0:
+        category = "all"
+    else:
+        category = category_by_id(callback_data.v, callback_data.id)
+        if category is None:
+            await callback.answer("Список категорий обновился, выберите ещё раз 🙂")
+            await _show_step_from(callback, state)
+            return
 
-    today = date.today()
     await callback.answer()
-    await callback.message.edit_text(
-        f"Категория: <b>{category}</b>\n\nВыберите дату:",
-        reply_markup=_build_month_calendar(today.year, today.month),
-    )
-
-    await state.set_state(BookingStates.choosing_date)
+    await state.update_data(category=category)
+    await _show_step_from(callback, state)
 
 
-@router.callback_query(BookingStates.choosing_district, F.data.startswith("district:"))
-async def district_chosen(callback: types.CallbackQuery, state: FSMContext):
-    district = callback.data.split(":", 1)[1]
-    await state.update_data(district=district)
+@router.callback_query(BookingStates.choosing_district, DistrictCB.filter())
+async def district_chosen(
+    callback: types.CallbackQuery, callback_data: DistrictCB, state: FSMContext
+):
+    district = district_by_id(callback_data.v, callback_data.id)
+    if district is None:
+        await callback.answer("Список районов обновился, выберите ещё раз 🙂")
+        await _show_step_from(callback, state)
+        return
 
-    today = date.today()
     await callback.answer()
-    await callback.message.edit_text(
-        f"Район: <b>{district}</b>\n\nВыберите дату:",
-        reply_markup=_build_month_calendar(today.year, today.month),
-    )
+    await state.update_data(district=district)
+    await _show_step_from(callback, state)
 
-    await state.set_state(BookingStates.choosing_date)
 
+# ====== ПОДБОР ПО ПАРАМЕТРАМ ======
 
-# ====== КАЛЕНДАРЬ ======
+async def _get_facets(state: FSMContext) -> Facets:
+    data = await state.get_data()
+    return Facets(**data.get("facets", {}))
 
-@router.callback_query(BookingStates.choosing_date, F.data.startswith("cal:prev:"))
-async def calendar_prev(callback: types.CallbackQuery, state: FSMContext):
-    _, _, ym = callback.data.split(":", 2)
-    year, month = map(int, ym.split("-"))
-    year, month = _change_month(year, month, -1)
 
+@router.callback_query(BookingStates.choosing_facets, FacetCB.filter(F.action == "menu_category"))
+async def facets_menu_category(callback: types.CallbackQuery, state: FSMContext):
+    facets = await _get_facets(state)
     await callback.answer()
     await callback.message.edit_text(
-        "Выберите дату:",
-        reply_markup=_build_month_calendar(year, month),
+        "Выберите категорию (в скобках — сколько заведений подойдёт) 👇",
+        reply_markup=facet_categories_keyboard(facets),
     )
 
 
-@router.callback_query(BookingStates.choosing_date, F.data.startswith("cal:next:"))
-async def calendar_next(callback: types.CallbackQuery, state: FSMContext):
-    _, _, ym = callback.data.split(":", 2)
-    year, month = map(int, ym.split("-"))
-    year, month = _change_month(year, month, +1)
-
+@router.callback_query(BookingStates.choosing_facets, FacetCB.filter(F.action == "menu_district"))
+async def facets_menu_district(callback: types.CallbackQuery, state: FSMContext):
+    facets = await _get_facets(state)
     await callback.answer()
     await callback.message.edit_text(
-        "Выберите дату:",
-        reply_markup=_build_month_calendar(year, month),
+        "Выберите район (в скобках — сколько заведений подойдёт) 👇",
+        reply_markup=facet_districts_keyboard(facets),
     )
 
 
-@router.callback_query(BookingStates.choosing_date, F.data == "cal:ignore")
-async def calendar_ignore(callback: types.CallbackQuery, state: FSMContext):
+@router.callback_query(BookingStates.choosing_facets, FacetCB.filter(F.action == "back"))
+async def facets_back(callback: types.CallbackQuery, state: FSMContext):
+    facets = await _get_facets(state)
     await callback.answer()
+    await callback.message.edit_text(facets_text(facets), reply_markup=facets_keyboard(facets))
 
 
-@router.callback_query(BookingStates.choosing_date, F.data.startswith("cal:day:"))
-async def date_chosen(callback: types.CallbackQuery, state: FSMContext):
-    date_iso = callback.data.split(":", 2)[2]
-    date_obj = date.fromisoformat(date_iso)
-    today = date.today()
+@router.callback_query(
+    BookingStates.choosing_facets,
+    FacetCB.filter(F.action.in_({"category", "district", "price", "karaoke", "late", "reset"})),
+)
+async def facet_changed(
+    callback: types.CallbackQuery, callback_data: FacetCB, state: FSMContext
+):
+    facets = await _get_facets(state)
+    action, value = callback_data.action, callback_data.value
+
+    if action == "category":
+        category = category_by_id(callback_data.v, value) if value else None
+        if value and category is None:
+            await callback.answer("Список категорий обновился, выберите ещё раз 🙂")
+            await callback.message.edit_text(
+                "Выберите категорию (в скобках — сколько заведений подойдёт) 👇",
+                reply_markup=facet_categories_keyboard(facets),
+            )
+            return
+        facets = facets._replace(category=category)
+    elif action == "district":
+        district = district_by_id(callback_data.v, value) if value else None
+        if value and district is None:
+            await callback.answer("Список районов обновился, выберите ещё раз 🙂")
+            await callback.message.edit_text(
+                "Выберите район (в скобках — сколько заведений подойдёт) 👇",
+                reply_markup=facet_districts_keyboard(facets),
+            )
+            return
+        facets = facets._replace(district=district)
+    elif action == "price":
+        # повторное нажатие снимает фильтр
+        facets = facets._replace(price_level=None if facets.price_level == value else value)
+    elif action == "karaoke":
+        facets = facets._replace(karaoke=not facets.karaoke)
+    elif action == "late":
+        facets = facets._replace(open_late=not facets.open_late)
+    else:
+        facets = Facets()
 
-    if date_obj < today:
-        await callback.answer("❌ Нельзя выбрать прошедшую дату", show_alert=True)
+    await state.update_data(facets=facets._asdict())
+    await callback.answer()
+    await callback.message.edit_text(facets_text(facets), reply_markup=facets_keyboard(facets))
+
+
+@router.callback_query(BookingStates.choosing_facets, FacetCB.filter(F.action == "done"))
+async def facets_done(callback: types.CallbackQuery, state: FSMContext):
+    facets = await _get_facets(state)
+    if not get_facet_index().count(facets):
+        await callback.answer(
+            "Под эти параметры ничего не нашлось — снимите часть фильтров 🙂",
+            show_alert=True,
+        )
         return
 
-    date_human = date_obj.strftime("%d.%m.%Y")
-    await state.update_data(date=date_iso)
+    await callback.answer()
+    await state.update_data(facets_done=True)
+    await _show_step_from(callback, state)
+
+
+# ====== КАЛЕНДАРЬ ======
+
+async def _show_month(callback: types.CallbackQuery, state: FSMContext, value: int, delta: int) -> None:
+    year, month = divmod(value, 12)
+    today = date.today()
+    year, month = _clamp_month(*_change_month(year, month + 1, delta), today)
 
     await callback.answer()
+    data = await state.get_data()
     await callback.message.edit_text(
-        f"Дата: <b>{date_human}</b> ✅\n\nТеперь выбери время:",
-        reply_markup=time_keyboard(),
+        f"{booking_summary(data)}Выберите дату:",
+        reply_markup=_calendar(data, year, month),
     )
 
-    await state.set_state(BookingStates.choosing_time)
 
+@router.callback_query(BookingStates.choosing_date, CalendarCB.filter(F.action == "prev"))
+async def calendar_prev(
+    callback: types.CallbackQuery, callback_data: CalendarCB, state: FSMContext
+):
+    await _show_month(callback, state, callback_data.value, -1)
 
-# ====== ВРЕМЯ / ЛЮДИ / КОММЕНТ ======
 
-@router.callback_query(BookingStates.choosing_time, F.data.startswith("time:"))
-async def time_chosen(callback: types.CallbackQuery, state: FSMContext):
-    time_str = callback.data.split(":", 1)[1]
-    await state.update_data(time=time_str)
+@router.callback_query(BookingStates.choosing_date, CalendarCB.filter(F.action == "next"))
+async def calendar_next(
+    callback: types.CallbackQuery, callback_data: CalendarCB, state: FSMContext
+):
+    await _show_month(callback, state, callback_data.value, +1)
 
+
+@router.callback_query(
+    BookingStates.choosing_date,
+    CalendarCB.filter(F.action == "ignore"),
+    flags={"throttling_cost": 0.1},
+)
+async def calendar_ignore(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
-    await callback.message.edit_text(
-        f"Время: <b>{time_str}</b> ✅\n\nСколько человек будет?",
-        reply_markup=people_keyboard(),
-    )
 
-    await state.set_state(BookingStates.choosing_people)
 
+@router.callback_query(BookingStates.choosing_date, CalendarCB.filter(F.action == "day"))
+async def date_chosen(
+    callback: types.CallbackQuery, callback_data: CalendarCB, state: FSMContext
+):
+    date_obj = date.fromordinal(callback_data.value)
+    today = date.today()
 
-@router.callback_query(BookingStates.choosing_people, F.data.startswith("people:"))
-async def people_chosen(callback: types.CallbackQuery, state: FSMContext):
-    people = int(callback.data.split(":", 1)[1])
-    await state.update_data(people=people)
+    # клавиатура могла остаться со вчерашнего дня
+    if date_obj < today:
+        await callback.answer("❌ Нельзя выбрать прошедшую дату", show_alert=True)
+        return
+    if date_obj > today + timedelta(days=BOOKING_HORIZON_DAYS):
+        await callback.answer("❌ Так далеко вперёд бронировать нельзя", show_alert=True)
+        return
 
     await callback.answer()
-    await callback.message.edit_text(
-        f"Количество человек: <b>{people if people < 6 else '6+'}</b> ✅\n\n"
-        "Напиши, пожалуйста, комментарий к брони "
-        "(повод, бюджет, предпочтения). Если без комментариев — напиши «нет».",
-    )
-
-    await state.set_state(BookingStates.typing_comment)
+    data = await state.update_data(date=date_obj.isoformat())
+    # время из deep-link могло не подойти к этой дате — тогда спросим заново
+    if data.get("time") and _slot_for(data, date_obj, data["time"]) is None:
+        del data["time"]
+        await state.set_data(data)
+    # по deep-link / при повторе брони время и люди могут быть уже известны
+    await _show_step_from(callback, state)
 
 
-@router.message(BookingStates.typing_comment)
-async def comment_received(message: types.Message, state: FSMContext):
-    comment = (message.text or "").strip()
-    if comment.lower() in ("нет", "no", "не", "без комментариев"):
-        comment = ""
+# ====== ВРЕМЯ / ЛЮДИ / КОММЕНТ ======
 
+@router.callback_query(BookingStates.choosing_time, TimeCB.filter())
+async def time_chosen(
+    callback: types.CallbackQuery, callback_data: TimeCB, state: FSMContext
+):
     data = await state.get_data()
-    mode = data.get("mode")
-    category = data.get("category")
-    district = data.get("district")
+    day = date.fromisoformat(data["date"])
+    # клавиатура могла устареть (сменили дату, время прошло)
+    if callback_data.minutes not in _day_slots(data, day):
+        await callback.answer("Это время уже недоступно, выберите другое 🙂")
+        await _show_step_from(callback, state)
+        return
 
-    # сохраняем комментарий
-    await state.update_data(comment=comment)
+    # отвечаем на нажатие до запросов в базу; занято — скажем в самом сообщении
+    await callback.answer()
+    loads = await get_slot_loads(data["date"])
+    if _full_slots(data, loads, day, (callback_data.minutes,)):
+        await _show_step_from(
+            callback, state, notice="😔 На это время мест уже нет — выберите другое."
+        )
+        return
 
-    # подбираем заведения
-    venues: list[dict] = []
+    await state.update_data(time=callback_data.text)
+    await _show_step_from(callback, state)
 
-    if mode == "category" and category:
-        if category == "all":
-            venues = get_all_venues()
-        else:
-            # фильтруем по подкатегории (КЕЙС-ИНСЕНСИТИВНО)
-            all_venues = get_all_venues()
-            for v in all_venues:
-                cats_raw = v.get("category", "")
-                # разбиваем по запятой: "Ресто-бар, караоке, боулинг"
-                cats = [c.strip() for c in cats_raw.split(",") if c.strip()]
-                # сравниваем без учёта регистра
-                if any(category.lower() == c.lower() for c in cats):
-                    venues.append(v)
 
-    elif mode == "district" and district:
-        venues = get_venues_by_district(district)
+@router.callback_query(BookingStates.choosing_people, PeopleCB.filter())
+async def people_chosen(
+    callback: types.CallbackQuery, callback_data: PeopleCB, state: FSMContext
+):
+    await callback.answer()
+    data = await state.get_data()
+    n = callback_data.n
+    capacity = _venue_capacity(data)
+    if capacity is not None and n > capacity:
+        await _show_step_from(callback, state, notice=_too_many_people(capacity))
+        return
 
-    if not venues:
-        await message.answer(
-            "Пока нет заведений по выбранным параметрам 😔\n"
-            "Мы всё равно свяжемся с вами при появлении подходящих вариантов.",
-            reply_markup=main_menu_kb,
-        )
-        await state.clear()
+    loads = await get_slot_loads(data["date"])
+    notice = ""
+    if capacity is not None:
+        # заведение уже выбрано (deep-link, повтор) — сразу скажем, если столько не поместится
+        left = capacity - loads.get(data["time"], {}).get(data["venue_id"], 0)
+        if n > left:
+            notice = (
+                f"😔 На это время осталось мест: {max(left, 0)}. "
+                "Выберите меньше или вернитесь к выбору времени."
+            )
+    else:
+        # заведение выберут потом — проверим, что хоть одно подходящее вместит компанию
+        day = date.fromisoformat(data["date"])
+        minutes = _slot_for(data, day, data["time"])
+        if minutes is not None:
+            venues = {v["id"] for v in find_venues(*_booking_filter(data), day.weekday(), minutes)}
+            if venues and venues <= _full_venues({}, data["time"], n):
+                notice = "😔 Столько гостей не вмещает ни одно подходящее заведение — выберите меньше."
+            elif venues and venues <= _full_venues(loads, data["time"], n):
+                notice = (
+                    "😔 На это время ни в одном подходящем заведении нет столько мест. "
+                    "Выберите меньше или вернитесь к выбору времени."
+                )
+    if notice:
+        await _show_step_from(callback, state, notice=notice)
         return
 
-    # текст со списком
-    venues_text_parts = []
-    for i, v in enumerate(venues, start=1):
-        part = (
-            f"{i}️⃣ <b>{v['name']}</b>\n"
-            f"Категория: {v['category']}\n"
-            f"Район: {v['district']}\n"
-            f"📍 {v['address']}\n"
-            f"📞 {v['phone']}"
-        )
-        if v.get("instagram"):
-            part += f"\n🔗 {v['instagram']}"
-        venues_text_parts.append(part)
+    await state.update_data(people=n)
+    await _show_step_from(callback, state)
 
-    venues_text = "\n\n".join(venues_text_parts)
 
-    await message.answer(
-        "Варианты заведений:\n\n"
-        f"{venues_text}\n\n"
-        "Теперь выберите, для какого заведения оформить бронь 👇",
-        reply_markup=venues_keyboard(venues),
-    )
+@router.callback_query(BookingStates.typing_comment, WizardCB.filter(F.action == "no_comment"))
+async def comment_skipped(callback: types.CallbackQuery, state: FSMContext):
+    await callback.answer()
+    await state.update_data(comment="")
+    await _show_step_from(callback, state)
+
+
+@router.message(BookingStates.typing_comment)
+async def comment_received(message: types.Message, state: FSMContext):
+    comment = (message.text or "").strip()
+    if comment.lower() in ("нет", "no", "не", "без комментариев"):
+        comment = ""
 
-    await state.set_state(BookingStates.choosing_venue)
+    await state.update_data(comment=comment)
+    # следующий шаг — в том же сообщении мастера, а не новым сообщением
+    data = await state.get_data()
+    await show_step(
+        message.bot,
+        message.chat.id,
+        message.from_user,
+        state,
+        message_id=data.get("wizard_id"),
+    )
 
 
 # ====== ВЫБОР КОНКРЕТНОГО ЗАВЕДЕНИЯ ======
 
-@router.callback_query(BookingStates.choosing_venue, F.data.startswith("venue:"))
-async def venue_chosen(callback: types.CallbackQuery, state: FSMContext):
-    venue_id = int(callback.data.split(":", 1)[1])
-    venue = get_venue_by_id(venue_id)
-    if not venue:
-        await callback.answer("Не удалось найти заведение", show_alert=True)
-        return
-
-    data = await state.get_data()
+async def _save_booking(
+    user: types.User, bot, data: dict, venue: dict
+) -> tuple[str, InlineKeyboardMarkup]:
+    """
+    Сохраняем бронь из данных FSM (+ задача уведомить админов с кнопками
+    подтвердить / отклонить), возвращаем текст подтверждения и кнопку отмены.
+    """
     mode = data.get("mode")
     category = data.get("category")
     district = data.get("district")
@@ -522,63 +1225,182 @@ async def venue_chosen(callback: types.CallbackQuery, state: FSMContext):
     # строка про фильтр
     if mode == "category" and category:
         if category == "all":
-            filter_line = "• Тип заведения: <b>Любой</b>\n"
+            filter_line = "Тип заведения: Любой\n"
             booking_category = "Все заведения"
         else:
-            filter_line = f"• Тип заведения: <b>{category}</b>\n"
+            filter_line = f"Тип заведения: {category}\n"
             booking_category = category
     elif mode == "district" and district:
-        filter_line = f"• Район: <b>{district}</b>\n"
+        filter_line = f"Район: {district}\n"
         booking_category = f"Район: {district}"
+    elif mode == "facets":
+        facets_line = describe_facets(Facets(**data.get("facets", {})))
+        filter_line = f"Подбор: {facets_line}\n"
+        booking_category = f"Подбор: {facets_line}"
     else:
         filter_line = ""
         booking_category = venue["category"]
 
+    # уведомление админам — задачей в очереди (jobs.py), в одной транзакции с бронью
+    jobs = []
+    if get_settings().admin_chat_ids:
+        phone = data.get("phone") or await get_user_phone(user.id)
+        admin_text = (
+            "🔔 Новая заявка на бронь\n\n"
+            f"Пользователь: @{user.username or 'без юзернейма'} "
+            f"({user.id})\n"
+            f"Имя: {escape(user.full_name)}\n"
+            f"Телефон: {phone or 'не указан'}\n\n"
+            f"{filter_line}"
+            f"Заведение: {venue['name']}\n"
+            f"Дата: {date_human}\n"
+            f"Время: {time_str}\n"
+            f"Людей: {people if people < 6 else '6+'}\n"
+            f"Комментарий: {escape(comment) or 'без комментариев'}\n"
+        )
+        jobs.append(admin_notify_job({"text": admin_text, "actions": True}))
+
     # сохраняем бронь в БД
-    await create_booking(
-        tg_id=callback.from_user.id,
-        venue_id=venue_id,
+    booking_id = await create_booking(
+        tg_id=user.id,
+        venue_id=venue["id"],
         category=booking_category,
         date=date_iso,
         time=time_str,
         people_count=people,
         comment=comment,
+        jobs=jobs,
+        capacity=get_facet_index().capacities.get(venue["id"]),
     )
+    if jobs:
+        job_worker.wake(bot)
 
-    confirm_text = (
+    text = (
         "✅ Ваша заявка на бронь принята!\n\n"
-        f"{filter_line}"
-        f"• Заведение: <b>{venue['name']}</b>\n"
-        f"• Дата: <b>{date_human}</b>\n"
-        f"• Время: <b>{time_str}</b>\n"
-        f"• Количество человек: <b>{people if people < 6 else '6+'}</b>\n"
-        f"• Комментарий: <b>{comment or 'без комментариев'}</b>\n\n"
-        "Мы свяжемся с заведением и сообщим вам о подтверждении.\n"
+        + "\n".join(booking_lines(data, venue))
+        + "\n\nМы свяжемся с заведением и сообщим вам о подтверждении.\n"
     )
+    return text, booking_cancel_kb(booking_id)
+
 
+@router.callback_query(BookingStates.choosing_venue, VenueCB.filter())
+async def venue_chosen(
+    callback: types.CallbackQuery, callback_data: VenueCB, state: FSMContext
+):
+    if not get_venue_by_id(callback_data.id):
+        await callback.answer("Не удалось найти заведение", show_alert=True)
+        return
+
+    # отвечаем на нажатие сразу, запись в БД — уже после
     await callback.answer()
-    await callback.message.edit_text(confirm_text)
-    await callback.message.answer("Можете вернуться в меню 👇", reply_markup=main_menu_kb)
+    await state.update_data(venue_id=callback_data.id)
+    await _show_step_from(callback, state)
+
+
+# ====== ОТМЕНА БРОНИ ======
+# кнопка под подтверждением заявки и под ответом «бронь подтверждена» (jobs.booking_status)
+
+@router.callback_query(BookingStatusCB.filter(F.action == "cancel"))
+async def booking_cancelled(callback: types.CallbackQuery, callback_data: BookingStatusCB):
+    user = callback.from_user
+    jobs = []
+    if get_settings().admin_chat_ids:
+        jobs.append(
+            admin_notify_job(
+                {
+                    "text": (
+                        f"🚫 Пользователь @{user.username or 'без юзернейма'} ({user.id}) "
+                        f"отменил бронь №{callback_data.id}"
+                    )
+                }
+            )
+        )
+    # отвечаем на нажатие сразу, итог — в самом сообщении
+    await callback.answer()
+    # только свою бронь и только пока она в силе; места освобождаются сразу
+    booking = await set_booking_status(
+        callback_data.id,
+        BOOKING_CANCELLED,
+        expected=(BOOKING_PENDING, BOOKING_CONFIRMED),
+        tg_id=user.id,
+        jobs=jobs,
+    )
+    if booking is None:
+        result = "Эта бронь уже отменена или отклонена."
+    else:
+        result = "🚫 <b>Бронь отменена.</b>"
+        if jobs:
+            job_worker.wake(callback.bot)
+    await callback.message.edit_text(
+        f"{callback.message.html_text}\n\n{result}", reply_markup=None
+    )
+
+
+# ====== «🔁 ПОВТОРИТЬ» — ПРОШЛЫЕ БРОНИ В ОДИН ТАП ======
+
+@router.message(F.text == "🔁 Повторить", flags={"throttling_cost": 2})
+async def repeat_start(message: types.Message, state: FSMContext):
     await state.clear()
 
-    # уведомление админу
-    settings = get_settings()
-    if settings.admin_id:
-        phone = await get_user_phone(callback.from_user.id)
-        admin_text = (
-            "🔔 Новая заявка на бронь\n\n"
-            f"Пользователь: @{callback.from_user.username or 'без юзернейма'} "
-            f"({callback.from_user.id})\n"
-            f"Имя: {callback.from_user.full_name}\n"
-            f"Телефон: {phone or 'не указан'}\n\n"
-            f"{filter_line.replace('• ', '')}"
-            f"Заведение: {venue['name']}\n"
-            f"Дата: {date_human}\n"
-            f"Время: {time_str}\n"
-            f"Людей: {people if people < 6 else '6+'}\n"
-            f"Комментарий: {comment or 'без комментариев'}\n"
+    bookings = await get_recent_bookings(message.from_user.id)
+    buttons = []
+    repeat: dict[str, dict] = {}
+    for b in bookings:
+        venue = get_venue_by_id(b["venue_id"])
+        if not venue:
+            continue
+        people = b["people_count"]
+        buttons.append(
+            [
+                InlineKeyboardButton(
+                    text=f"{venue['name']} · {people if people < 6 else '6+'} чел.",
+                    callback_data=RepeatCB(id=b["id"]).pack(),
+                )
+            ]
         )
-        await callback.message.bot.send_message(settings.admin_id, admin_text)
+        repeat[str(b["id"])] = b
+
+    if not buttons:
+        await message.answer(
+            "У вас пока нет броней, которые можно повторить 🙂\n"
+            "Нажмите «🔔 Забронировать», чтобы выбрать заведение.",
+            reply_markup=main_menu_kb,
+        )
+        return
+
+    # брони держим в FSM, чтобы по нажатию не ходить в базу ещё раз
+    await state.update_data(repeat=repeat)
+    await state.set_state(BookingStates.choosing_repeat)
+    await message.answer(
+        "Какую бронь повторить? Спросим только новую дату и время 👇",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons),
+    )
+
+
+@router.callback_query(BookingStates.choosing_repeat, RepeatCB.filter())
+async def repeat_chosen(
+    callback: types.CallbackQuery, callback_data: RepeatCB, state: FSMContext
+):
+    data = await state.get_data()
+    booking = data.get("repeat", {}).get(str(callback_data.id))
+    venue = get_venue_by_id(booking["venue_id"]) if booking else None
+    if not venue:
+        await callback.answer("Эту бронь уже нельзя повторить", show_alert=True)
+        return
+
+    await callback.answer()
+    phone = await get_user_phone(callback.from_user.id)
+    await state.set_data(
+        {
+            "mode": "venue",
+            "venue_id": venue["id"],
+            "people": booking["people_count"],
+            "comment": booking["comment"] or "",
+            "phone": phone,
+        }
+    )
+    # спросим только дату и время
+    await _show_step_from(callback, state)
 
 
 # ====== «ВСЕ ЗАВЕДЕНИЯ» (кнопка из главного меню) ======
@@ -186,7 +186,7 @@ async def for_businesses(message: types.Message):
         reply_markup=main_menu_kb,
     )
 
-@router.message(AIHelperStates.waiting_question)
+@router.message(AIHelperStates.waiting_question, flags={"throttling_cost": 2})
 async def ai_helper_answer(message: types.Message, state: FSMContext):
     text = (message.text or "").strip()
 
@@ -0,0 +1,62 @@
+# handlers/inline.py
+from aiogram import Router, types
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+)
+
+from deeplinks import BookingLink, booking_url
+from venues import catalog_cached, search_venues
+
+router = Router()
+
+# сколько секунд Telegram может отдавать закэшированный ответ на тот же запрос
+INLINE_CACHE_TIME = 300
+
+
+def _venue_card(v: dict) -> str:
+    card = (
+        f"<b>{v['name']}</b>\n"
+        f"Категория: {v['category']}\n"
+        f"Район: {v['district']}\n"
+        f"📍 {v['address']}\n"
+        f"📞 {v['phone']}"
+    )
+    if v.get("instagram"):
+        card += f"\n🔗 {v['instagram']}"
+    return card
+
+
+@catalog_cached(maxsize=1024)
+def inline_results(query: str, bot_username: str) -> list[InlineQueryResultArticle]:
+    """Карточки заведений с кнопкой брони по deep-link (общие для всех пользователей)."""
+    results = []
+    for v in search_venues(query):
+        url = booking_url(bot_username, BookingLink(venue_id=v["id"]))
+        results.append(
+            InlineQueryResultArticle(
+                id=str(v["id"]),
+                title=v["name"],
+                description=f"{v['category']} · {v['district']}",
+                input_message_content=InputTextMessageContent(message_text=_venue_card(v)),
+                reply_markup=InlineKeyboardMarkup(
+                    inline_keyboard=[[InlineKeyboardButton(text="🔔 Забронировать", url=url)]]
+                ),
+            )
+        )
+    return results
+
+
+# @бот pasta — поиск заведения и карточка, которой можно поделиться в любом чате;
+# запрос летит на каждую набранную букву — поэтому дешевле обычного хендлера
+@router.inline_query(flags={"throttling_cost": 0.5})
+async def inline_venues(inline_query: types.InlineQuery):
+    me = await inline_query.bot.me()
+    query = " ".join(inline_query.query.split()).lower()
+    await inline_query.answer(
+        inline_results(query, me.username),
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=False,
+    )
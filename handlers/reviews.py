@@ -1,9 +1,12 @@
 # handlers/reviews.py
+from functools import cache
+
 from aiogram import Router, F, types
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 
+from callbacks import ReviewVenueCB, RatingCB
 from keyboards import main_menu_kb
 from db import (
     get_user_venue_ids,
@@ -28,23 +31,25 @@ def _venues_for_review_keyboard(venue_ids: list[int]) -> InlineKeyboardMarkup:
         if not v:
             continue
         buttons.append(
-            [InlineKeyboardButton(text=v["name"], callback_data=f"rev_venue:{vid}")]
+            [
+                InlineKeyboardButton(
+                    text=v["name"], callback_data=ReviewVenueCB(id=vid).pack()
+                )
+            ]
         )
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@cache
 def _rating_keyboard() -> InlineKeyboardMarkup:
     row = [
-        InlineKeyboardButton(text="⭐️1", callback_data="rev_rate:1"),
-        InlineKeyboardButton(text="⭐️2", callback_data="rev_rate:2"),
-        InlineKeyboardButton(text="⭐️3", callback_data="rev_rate:3"),
-        InlineKeyboardButton(text="⭐️4", callback_data="rev_rate:4"),
-        InlineKeyboardButton(text="⭐️5", callback_data="rev_rate:5"),
+        InlineKeyboardButton(text=f"⭐️{n}", callback_data=RatingCB(rating=n).pack())
+        for n in range(1, 6)
     ]
     return InlineKeyboardMarkup(inline_keyboard=[row])
 
 
-@router.message(F.text == "✍️ Оставить отзыв")
+@router.message(F.text == "✍️ Оставить отзыв", flags={"throttling_cost": 3})
 async def review_start(message: types.Message, state: FSMContext):
     venue_ids = await get_user_venue_ids(message.from_user.id)
     if not venue_ids:
@@ -63,9 +68,11 @@ async def review_start(message: types.Message, state: FSMContext):
     )
 
 
-@router.callback_query(ReviewStates.choosing_venue, F.data.startswith("rev_venue:"))
-async def review_venue_chosen(callback: types.CallbackQuery, state: FSMContext):
-    venue_id = int(callback.data.split(":", 1)[1])
+@router.callback_query(ReviewStates.choosing_venue, ReviewVenueCB.filter())
+async def review_venue_chosen(
+    callback: types.CallbackQuery, callback_data: ReviewVenueCB, state: FSMContext
+):
+    venue_id = callback_data.id
     venue = get_venue_by_id(venue_id)
     if not venue:
         await callback.answer("Заведение не найдено", show_alert=True)
@@ -91,9 +98,11 @@ async def review_venue_chosen(callback: types.CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(ReviewStates.choosing_rating, F.data.startswith("rev_rate:"))
-async def review_rating_chosen(callback: types.CallbackQuery, state: FSMContext):
-    rating = int(callback.data.split(":", 1)[1])
+@router.callback_query(ReviewStates.choosing_rating, RatingCB.filter())
+async def review_rating_chosen(
+    callback: types.CallbackQuery, callback_data: RatingCB, state: FSMContext
+):
+    rating = callback_data.rating
     await state.update_data(rating=rating)
 
     await callback.answer()
@@ -1,15 +1,18 @@
 # handlers/start.py
 from aiogram import Router, types
-from aiogram.filters import CommandStart, Command
+from aiogram.filters import CommandStart, Command, CommandObject
+from aiogram.fsm.context import FSMContext
 
 from keyboards import main_menu_kb
 from db import upsert_user
+from deeplinks import parse_booking_link
+from handlers.booking import start_booking_from_link
 
 router = Router()
 
 
 @router.message(CommandStart())
-async def cmd_start(message: types.Message):
+async def cmd_start(message: types.Message, command: CommandObject, state: FSMContext):
     user = message.from_user
 
     await upsert_user(
@@ -19,6 +22,12 @@ async def cmd_start(message: types.Message):
         phone=None,
     )
 
+    # t.me/<бот>?start=v12_d20261020_t1900_p4 — сразу к брони (см. deeplinks.py)
+    link = parse_booking_link(command.args) if command.args else None
+    if link:
+        await start_booking_from_link(message, state, link)
+        return
+
     text = (
         f"Привет, {user.first_name or 'гость'}! 👋\n\n"
         "Я — RezMe, твой персональный гид по бронированию заведений в один клик! 🤖\n"
@@ -0,0 +1,282 @@
+# jobs.py
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+from datetime import date
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+import db
+import metrics
+from config import get_settings
+from keyboards import booking_actions_kb, booking_cancel_kb
+from notifications import FAILED, digest, notifier
+from venues import get_venue_by_id
+
+logger = logging.getLogger(__name__)
+
+# kind -> async handler(bot, payloads); одна пачка задач одного вида за раз,
+# исключение = вся пачка уйдёт на повтор, PartialFailure — только невыполненные задачи
+JobHandler = Callable[[Bot, list[dict]], Awaitable[None]]
+_HANDLERS: dict[str, JobHandler] = {}
+
+
+class PartialFailure(Exception):
+    """
+    Пачка выполнена не целиком: failed — {индекс в payloads: payload для повтора}
+    (в payload можно отметить уже сделанное), остальные задачи считаются выполненными.
+    """
+
+    def __init__(self, failed: dict[int, dict], reason: str):
+        super().__init__(reason)
+        self.failed = failed
+
+
+def job_handler(kind: str):
+    def decorator(func: JobHandler) -> JobHandler:
+        _HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+class JobWorker:
+    """
+    Воркер очереди задач из таблицы jobs (db.py).
+
+    Задачи кладутся в базу в одной транзакции с данными (create_booking(jobs=...)),
+    поэтому не теряются при падении процесса или ошибках Telegram.
+    Воркер забирает готовые задачи пачкой, прячет их на `visibility` секунд,
+    выполняет и удаляет; при ошибке — повтор через `retry_base * 2**(attempts-1)`
+    (не больше `retry_max`), после `max_attempts` попыток задача становится dead.
+    `wake()` будит воркер сразу, иначе он опрашивает базу раз в `poll_interval`.
+    """
+
+    def __init__(
+        self,
+        batch: int = 50,
+        visibility: float = 120.0,
+        poll_interval: float = 1.0,
+        max_attempts: int = 8,
+        retry_base: float = 5.0,
+        retry_max: float = 3600.0,
+    ):
+        self.batch = batch
+        self.visibility = visibility
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._bot: Bot | None = None
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._closing: asyncio.Event | None = None
+
+    def wake(self, bot: Bot) -> None:
+        """Есть новые задачи (воркер стартует при первом вызове)."""
+        self._bot = bot
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._closing = asyncio.Event()
+            self._task = loop.create_task(self._run(), name="rezme-jobs")
+        self._wakeup.set()
+
+    async def close(self) -> None:
+        """Доделать готовые задачи и остановиться (остальные подождут в базе)."""
+        if self._task is None:
+            return
+        self._closing.set()
+        await self._task
+        self._task = None
+
+    async def _sleep(self) -> None:
+        wakeup = asyncio.create_task(self._wakeup.wait())
+        closing = asyncio.create_task(self._closing.wait())
+        await asyncio.wait(
+            {wakeup, closing}, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED
+        )
+        wakeup.cancel()
+        closing.cancel()
+        self._wakeup.clear()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                jobs = await db.claim_jobs(self.batch, self.visibility)
+            except Exception:
+                logger.exception("Не удалось забрать задачи из очереди")
+                jobs = []
+
+            if not jobs:
+                if self._closing.is_set():
+                    return
+                await self._sleep()
+                continue
+
+            by_kind: dict[str, list[dict]] = defaultdict(list)
+            for job in jobs:
+                by_kind[job["kind"]].append(job)
+            await asyncio.gather(*(self._process(kind, items) for kind, items in by_kind.items()))
+
+    async def _process(self, kind: str, jobs: list[dict]) -> None:
+        ids = [job["id"] for job in jobs]
+        handler = _HANDLERS.get(kind)
+        done = ids
+        failed: list[dict] = []
+        error = ""
+        payloads: dict[int, dict] | None = None
+        try:
+            if handler is None:
+                raise LookupError(f"нет обработчика для задач «{kind}»")
+            await handler(self._bot, [job["payload"] for job in jobs])
+        except PartialFailure as e:
+            payloads = {jobs[i]["id"]: payload for i, payload in e.failed.items()}
+            done = [job_id for job_id in ids if job_id not in payloads]
+            failed = [job for job in jobs if job["id"] in payloads]
+            error = str(e)
+        except Exception as e:
+            done = []
+            failed = jobs
+            error = f"{type(e).__name__}: {e}"
+
+        # база может быть занята (database is locked): задачи не теряются —
+        # после visibility их заберёт следующий claim_jobs, а воркер продолжит работу
+        if done:
+            try:
+                await db.complete_jobs(done)
+                metrics.jobs.inc(len(done), kind=kind, result="done")
+            except Exception:
+                logger.exception("Не удалось завершить задачи %s (%s)", kind, done)
+        if failed:
+            try:
+                await self._retry(kind, failed, error, payloads)
+            except Exception:
+                logger.exception("Не удалось перепланировать задачи %s (%s)", kind, ids)
+
+    async def _retry(
+        self,
+        kind: str,
+        jobs: list[dict],
+        error: str,
+        payloads: dict[int, dict] | None = None,
+    ) -> None:
+        ids = [job["id"] for job in jobs]
+        logger.warning("Задачи %s (%s) упали: %s", kind, ids, error)
+        metrics.jobs.inc(len(jobs), kind=kind, result="failed")
+
+        # повторяем по худшей задаче в пачке
+        attempts = max(job["attempts"] for job in jobs)
+        if attempts >= self.max_attempts:
+            await db.fail_jobs(ids, error, retry_in=None, payloads=payloads)
+            metrics.jobs.inc(len(jobs), kind=kind, result="dead")
+        else:
+            retry_in = min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+            await db.fail_jobs(ids, error, retry_in=retry_in, payloads=payloads)
+
+
+# ---------- обработчики ----------
+
+# больше кнопок Telegram под одним сообщением не покажет — остальные заявки в «🕓 Заявки»
+ACTION_ROWS_LIMIT = 40
+
+
+def admin_notify_job(payload: dict) -> tuple[str, dict, float]:
+    """Задача admin_notify для jobs=... в db.py; в поток заявок — отложенная до общей сводки."""
+    return "admin_notify", payload, notifier.digest_delay()
+
+
+@job_handler("admin_notify")
+async def admin_notify(bot: Bot, payloads: list[dict]) -> None:
+    """
+    Новые брони админам; накопившиеся за раз — одной сводкой.
+    Заявкам с "actions" — кнопки подтвердить / отклонить.
+    "chats" — кому ещё не дошло (при повторе остальным не дублируем).
+    """
+    # задачи с одинаковым списком получателей — одним сообщением
+    groups: dict[tuple[int, ...], list[int]] = defaultdict(list)
+    for i, p in enumerate(payloads):
+        chat_ids = tuple(p.get("chats") or get_settings().admin_chat_ids)
+        if chat_ids:
+            groups[chat_ids].append(i)
+
+    failed: dict[int, dict] = {}
+    for chat_ids, indexes in groups.items():
+        texts = []
+        actions = []
+        for i in indexes:
+            p = payloads[i]
+            if p.get("actions"):
+                actions.append(p["booking_id"])
+                texts.append(f"{p['text'].rstrip()}\nЗаявка №{p['booking_id']}")
+            else:
+                texts.append(p["text"])
+
+        # ретраи — на стороне очереди, а не внутри отправки
+        results = await notifier.deliver(
+            bot,
+            digest(texts),
+            kind="digest" if len(indexes) > 1 else "single",
+            max_retries=0,
+            reply_markup=booking_actions_kb(actions[:ACTION_ROWS_LIMIT]) if actions else None,
+            chat_ids=list(chat_ids),
+        )
+        # отклонённые Telegram чаты (бот заблокирован) не повторяем
+        retry = [chat_id for chat_id, result in results.items() if result == FAILED]
+        if retry:
+            for i in indexes:
+                failed[i] = {**payloads[i], "chats": retry}
+
+    if failed:
+        raise PartialFailure(failed, f"уведомление не дошло до админов: {len(failed)}")
+
+
+def booking_status_text(booking: dict, status: str) -> str:
+    venue = get_venue_by_id(booking["venue_id"]) if booking["venue_id"] else None
+    venue_name = venue["name"] if venue else "заведение"
+    when = f"{date.fromisoformat(booking['date']).strftime('%d.%m.%Y')} в {booking['time']}"
+    if status == db.BOOKING_CONFIRMED:
+        people = booking["people_count"]
+        return (
+            "✅ Ваша бронь подтверждена!\n\n"
+            f"• Заведение: <b>{venue_name}</b>\n"
+            f"• Дата и время: <b>{when}</b>\n"
+            f"• Количество человек: <b>{people if people < 6 else '6+'}</b>\n\n"
+            "Ждём вас! Если планы поменяются — отмените бронь кнопкой ниже."
+        )
+    return (
+        f"😔 К сожалению, {venue_name} не сможет принять вас {when}.\n"
+        "Попробуйте другое время или заведение через «🔔 Забронировать»."
+    )
+
+
+@job_handler("booking_status")
+async def booking_status(bot: Bot, payloads: list[dict]) -> None:
+    """Пользователю — ответ админа по его заявке (подтверждена / отклонена)."""
+    failed: dict[int, dict] = {}
+    for i, p in enumerate(payloads):
+        try:
+            booking = await db.get_booking(p["booking_id"])
+            if booking is None:
+                continue
+            status = p["status"]
+            markup = booking_cancel_kb(booking["id"]) if status == db.BOOKING_CONFIRMED else None
+            await bot.send_message(
+                booking["tg_id"], booking_status_text(booking, status), reply_markup=markup
+            )
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # бот заблокирован / чат не найден — повтор не поможет
+            logger.warning("Ответ по брони %s не доставлен: %s", p["booking_id"], e)
+        except Exception as e:
+            # сеть / 5xx / 429 — повторим только этот ответ, уже отправленные не дублируем
+            logger.warning("Ответ по брони %s не ушёл: %s", p["booking_id"], e)
+            failed[i] = p
+
+    if failed:
+        raise PartialFailure(failed, f"ответы по броням не ушли: {len(failed)}")
+
+
+worker = JobWorker()
@@ -1,9 +1,24 @@
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import (
+    ReplyKeyboardMarkup,
+    KeyboardButton,
+    InlineKeyboardMarkup,
+    InlineKeyboardButton,
+)
+
+from callbacks import BookingStatusCB
+
+# статусы брони (db.BOOKING_STATUSES) для админов и пользователя
+BOOKING_STATUS_TEXT = {
+    "pending": "🕓 ждёт ответа",
+    "confirmed": "✅ подтверждена",
+    "declined": "❌ отклонена",
+    "cancelled": "🚫 отменена пользователем",
+}
 
 
 main_menu_kb = ReplyKeyboardMarkup(
     keyboard=[
-        [KeyboardButton(text="🔔 Забронировать")],
+        [KeyboardButton(text="🔔 Забронировать"), KeyboardButton(text="🔁 Повторить")],
         [KeyboardButton(text="📍 Все заведения")],
         [KeyboardButton(text="✍️ Оставить отзыв")],
         [KeyboardButton(text="Для бизнесов (Если вы хотите добавить свое заведение в нашу базу)")],
@@ -26,3 +41,32 @@ phone_request_kb = ReplyKeyboardMarkup(
     one_time_keyboard=True,
     input_field_placeholder="Нажмите кнопку, чтобы отправить номер",
 )
+
+
+def booking_actions_kb(booking_ids: list[int], queue: bool = False) -> InlineKeyboardMarkup:
+    """Подтвердить / отклонить — по строке на заявку (одна заявка — без номеров на кнопках)."""
+    rows = []
+    for booking_id in booking_ids:
+        suffix = f" №{booking_id}" if queue or len(booking_ids) > 1 else ""
+        confirm = BookingStatusCB(id=booking_id, action="confirm", q=int(queue))
+        decline = BookingStatusCB(id=booking_id, action="decline", q=int(queue))
+        rows.append(
+            [
+                InlineKeyboardButton(text=f"✅ Подтвердить{suffix}", callback_data=confirm.pack()),
+                InlineKeyboardButton(text=f"❌ Отклонить{suffix}", callback_data=decline.pack()),
+            ]
+        )
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def booking_cancel_kb(booking_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="🚫 Отменить бронь",
+                    callback_data=BookingStatusCB(id=booking_id, action="cancel").pack(),
+                )
+            ]
+        ]
+    )
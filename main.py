@@ -4,40 +4,118 @@ import asyncio
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import get_settings
+import metrics
+from profiler import profiler
+from watchdog import LoopWatchdog
+from config import Settings, get_settings
 from db import init_db
 from handlers.start import router as start_router
 from handlers.booking import router as booking_router
 from handlers.reviews import router as reviews_router
 from handlers.admin import router as admin_router
-from handlers.info import router as info_router 
+from handlers.info import router as info_router
+from handlers.inline import router as inline_router
+from middlewares.throttling import ThrottlingMiddleware
+from middlewares.metrics import MetricsMiddleware, ApiMetricsMiddleware
+from middlewares.retry import RetryAfterMiddleware
+from middlewares.recorder import UpdateRecorder
+from middlewares.activity import ActivityTracker
+from jobs import worker as job_worker
 
-async def main():
-    settings = get_settings()
 
-    if not settings.bot_token:
-        raise RuntimeError("BOT_TOKEN не задан в .env")
+def create_bot(settings: Settings, **kwargs) -> Bot:
+    if settings.api_base_url and "session" not in kwargs:
+        kwargs["session"] = AiohttpSession(
+            api=TelegramAPIServer.from_base(settings.api_base_url)
+        )
 
     bot = Bot(
         token=settings.bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+        **kwargs,
     )
+    # retry снаружи, чтобы метрики видели каждую попытку отдельно
+    bot.session.middleware(RetryAfterMiddleware(max_retries=settings.api_max_retries))
+    bot.session.middleware(ApiMetricsMiddleware())
+    return bot
+
 
+def create_dispatcher(settings: Settings) -> Dispatcher:
+    """Диспетчер со всеми middleware и роутерами (используется и в bench/)."""
     # добавили хранилище для FSM
     dp = Dispatcher(storage=MemoryStorage())
 
+    # антиспам (inner, чтобы видеть флаги хендлеров)
+    throttling = ThrottlingMiddleware(
+        rate=settings.throttle_rate,
+        burst=settings.throttle_burst,
+        ban_after=settings.throttle_ban_after,
+        ban_seconds=settings.throttle_ban_seconds,
+        ban_window=settings.throttle_ban_window,
+    )
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+    dp.inline_query.middleware(throttling)
+
+    # last seen / счётчик апдейтов, пишется в users пачками
+    activity = ActivityTracker(flush_interval=settings.activity_flush_interval)
+    dp.update.outer_middleware(activity)
+    dp.shutdown.register(activity.close)
+
+    # метрики хендлеров (после антиспама — отброшенные апдейты не считаем)
+    dp.message.middleware(MetricsMiddleware())
+    dp.callback_query.middleware(MetricsMiddleware())
+    dp.inline_query.middleware(MetricsMiddleware())
+
     # роутеры
     dp.include_router(start_router)
     dp.include_router(booking_router)
     dp.include_router(reviews_router)
     dp.include_router(admin_router)
     dp.include_router(info_router)
+    dp.include_router(inline_router)
+
+    # профайлеру нужны хендлеры, чтобы группировать по ним стеки
+    profiler.register_dispatcher(dp)
+    return dp
+
+
+async def main():
+    settings = get_settings()
+
+    if not settings.bot_token:
+        raise RuntimeError("BOT_TOKEN не задан в .env")
+
+    bot = create_bot(settings)
+    dp = create_dispatcher(settings)
 
     # инициализируем базу
     await init_db()
 
+    # очередь фоновых задач: сразу добираем то, что осталось с прошлого запуска
+    job_worker.wake(bot)
+    dp.shutdown.register(job_worker.close)
+
+    if settings.metrics_port:
+        await metrics.start_http_server(settings.metrics_host, settings.metrics_port)
+
+    if settings.record_updates_path:
+        recorder = UpdateRecorder(
+            settings.record_updates_path,
+            salt=settings.record_salt,
+            keep_ids={settings.admin_id} if settings.admin_id else None,
+        )
+        dp.update.outer_middleware(recorder)
+        dp.shutdown.register(recorder.close)
+        recorder.start()
+
+    if settings.loop_block_threshold:
+        LoopWatchdog(profiler, threshold=settings.loop_block_threshold).start()
+
     print("🤖 Bot started...")
     await dp.start_polling(bot)
 
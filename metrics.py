@@ -0,0 +1,188 @@
+# metrics.py
+import functools
+import time
+from typing import Any, Awaitable, Callable
+
+from aiohttp import web
+
+# границы бакетов гистограмм (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRY: list["_Metric"] = []
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        _REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, value: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = buckets
+        # key -> [счётчики по бакетам..., +Inf, сумма]
+        self._values: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        row = self._values.get(key)
+        if row is None:
+            row = self._values[key] = [0] * (len(self.buckets) + 2)
+
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                row[i] += 1
+                break
+        else:
+            row[len(self.buckets)] += 1
+        row[-1] += value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, row in self._values.items():
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), row):
+                total += count
+                le = f'le="{bound}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {total}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {row[-1]:g}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+# ---------- метрики бота ----------
+
+handler_seconds = Histogram(
+    "rezme_handler_seconds", "Время работы хендлера", ("router", "handler")
+)
+handler_errors = Counter(
+    "rezme_handler_errors_total", "Исключения в хендлерах", ("router", "handler", "error")
+)
+fsm_transitions = Counter(
+    "rezme_fsm_transitions_total", "Переходы между состояниями FSM", ("from_state", "to_state")
+)
+api_seconds = Histogram(
+    "rezme_api_request_seconds", "Время запросов к Telegram Bot API", ("method",)
+)
+api_errors = Counter(
+    "rezme_api_errors_total", "Ошибки запросов к Telegram Bot API", ("method", "error")
+)
+api_retries = Counter(
+    "rezme_api_retries_total", "Повторы запросов после 429", ("method",)
+)
+db_seconds = Histogram(
+    "rezme_db_query_seconds", "Время запросов к SQLite", ("query",)
+)
+notifications = Counter(
+    "rezme_admin_notifications_total", "Уведомления админам (single / digest / failed / rejected)", ("result",)
+)
+jobs = Counter(
+    "rezme_jobs_total", "Фоновые задачи из очереди (done / failed / dead)", ("kind", "result")
+)
+loop_lag_seconds = Histogram(
+    "rezme_loop_lag_seconds", "Задержка event loop относительно таймера"
+)
+loop_blocks = Counter(
+    "rezme_loop_blocks_total", "Блокировки event loop дольше порога", ("handler", "update_type")
+)
+loop_block_seconds = Histogram(
+    "rezme_loop_block_seconds", "Длительность блокировок event loop", ("handler",)
+)
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus."""
+    lines: list[str] = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def timed(histogram: Histogram, **labels: Any):
+    """Декоратор для async-функций: пишет время выполнения в гистограмму."""
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, **labels)
+
+        return wrapper
+
+    return decorator
+
+
+def db_timed(func: Callable[..., Awaitable[Any]]):
+    """Замер запросов в db.py, метка = имя функции."""
+    return timed(db_seconds, query=func.__name__)(func)
+
+
+# ---------- HTTP /metrics ----------
+
+async def _metrics_view(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_http_server(host: str, port: int) -> web.AppRunner:
+    """Поднимаем локальный HTTP-эндпоинт /metrics (для Prometheus / curl)."""
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_view)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,94 @@
+# middlewares/activity.py
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from db import save_activity
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityTracker(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: считает, когда пользователь был активен
+    и сколько апдейтов прислал. В памяти — только последняя отметка и счётчик
+    на пользователя; в users это уходит одной пачкой UPDATE раз в `flush_interval`
+    секунд (или когда набралось `flush_every` пользователей).
+    При падении теряется не больше одного интервала.
+    """
+
+    def __init__(self, flush_interval: float = 60.0, flush_every: int = 5000):
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        # tg_id -> [последний апдейт (unix), сколько апдейтов с прошлого сброса]
+        self._pending: dict[int, list] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        # внеочередной сброс (набралось flush_every) — не больше одного за раз
+        self._flush_task: asyncio.Task | None = None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is not None and not user.is_bot:
+            self.touch(user.id)
+        return await handler(event, data)
+
+    def touch(self, tg_id: int) -> None:
+        entry = self._pending.get(tg_id)
+        if entry is None:
+            self._pending[tg_id] = [time.time(), 1]
+            if len(self._pending) >= self.flush_every and (
+                self._flush_task is None or self._flush_task.done()
+            ):
+                self._flush_task = asyncio.create_task(self.flush())
+        else:
+            entry[0] = time.time()
+            entry[1] += 1
+
+        if self._task is None:
+            self.start()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            rows = [
+                (time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(seen)), count, tg_id)
+                for tg_id, (seen, count) in pending.items()
+            ]
+            try:
+                await save_activity(rows)
+            except Exception:
+                logger.exception("Не удалось сохранить активность %s пользователей", len(rows))
+                # вернём в очередь до следующего сброса, не затирая то, что пришло за это время
+                for tg_id, (seen, count) in pending.items():
+                    entry = self._pending.get(tg_id)
+                    if entry is None:
+                        self._pending[tg_id] = [seen, count]
+                    else:
+                        entry[0] = max(entry[0], seen)
+                        entry[1] += count
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
@@ -0,0 +1,73 @@
+# middlewares/metrics.py
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+
+import metrics
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Inner-middleware: время и ошибки по каждому хендлеру,
+    плюс счётчик переходов FSM (состояние до и после хендлера).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_obj = data.get("handler")
+        callback = getattr(handler_obj, "callback", None)
+        labels = {
+            "router": getattr(callback, "__module__", "unknown"),
+            "handler": getattr(callback, "__name__", "unknown"),
+        }
+        state_before = data.get("raw_state")
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            metrics.handler_errors.inc(error=type(e).__name__, **labels)
+            raise
+        finally:
+            metrics.handler_seconds.observe(time.perf_counter() - started, **labels)
+
+            state = data.get("state")
+            if state is not None:
+                state_after = await state.get_state()
+                if state_after != state_before:
+                    metrics.fsm_transitions.inc(
+                        from_state=state_before or "-",
+                        to_state=state_after or "-",
+                    )
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время и ошибки исходящих запросов к Bot API."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            metrics.api_errors.inc(method=name, error=type(e).__name__)
+            raise
+        finally:
+            metrics.api_seconds.observe(time.perf_counter() - started, method=name)
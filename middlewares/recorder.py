@@ -0,0 +1,136 @@
+# middlewares/recorder.py
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+# объекты, в которых "id" — это id пользователя/чата
+_PERSON_KEYS = {"from", "chat", "user", "sender_chat", "forward_from", "via_bot"}
+_NAME_KEYS = {"first_name", "last_name", "title"}
+
+
+class Anonymizer:
+    """
+    Подменяем id пользователей, телефоны, юзернеймы и имена.
+    Один и тот же id всегда превращается в один и тот же псевдо-id
+    (HMAC с солью), поэтому сценарии FSM при реплее не ломаются.
+    """
+
+    def __init__(self, salt: str, keep_ids: set[int] | None = None):
+        self.salt = salt.encode("utf-8")
+        self.keep_ids = keep_ids or set()
+
+    def user_id(self, value: int) -> int:
+        if value in self.keep_ids:
+            return value
+        digest = hmac.new(self.salt, str(value).encode(), hashlib.sha256).digest()
+        return 10**9 + int.from_bytes(digest[:6], "big") % (9 * 10**9)
+
+    def phone(self, value: str) -> str:
+        digest = hmac.new(self.salt, value.encode(), hashlib.sha256).hexdigest()
+        return "+7000" + str(int(digest[:12], 16))[:7].zfill(7)
+
+    def __call__(self, obj: Any, parent_key: str = "") -> Any:
+        if isinstance(obj, list):
+            return [self(x, parent_key) for x in obj]
+        if not isinstance(obj, dict):
+            return obj
+
+        result: dict = {}
+        for key, value in obj.items():
+            if key == "id" and parent_key in _PERSON_KEYS and isinstance(value, int):
+                value = self.user_id(value) if value > 0 else value
+            elif key == "user_id" and isinstance(value, int):
+                value = self.user_id(value)
+            elif key == "phone_number" and isinstance(value, str):
+                value = self.phone(value)
+            elif key == "username" and isinstance(value, str):
+                value = f"u{hmac.new(self.salt, value.encode(), hashlib.sha256).hexdigest()[:10]}"
+            elif key in _NAME_KEYS and isinstance(value, str):
+                value = "Гость"
+            else:
+                value = self(value, key)
+            result[key] = value
+        return result
+
+
+class UpdateRecorder(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: пишет входящие апдейты (анонимизированные)
+    в gzip JSONL. Строка: {"t": unix-время, "update": {...}}.
+    Запись идёт пачками в отдельном потоке, чтобы не блокировать event loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        salt: str | None = None,
+        keep_ids: set[int] | None = None,
+        flush_every: int = 200,
+        flush_interval: float = 5.0,
+    ):
+        self.path = time.strftime(path)
+        self.anonymize = Anonymizer(salt or secrets.token_hex(16), keep_ids)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._buffer: list[str] = []
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update):
+            payload = self.anonymize(event.model_dump(mode="json", exclude_none=True, by_alias=True))
+            self._buffer.append(
+                json.dumps({"t": round(time.time(), 3), "update": payload}, ensure_ascii=False)
+            )
+            if len(self._buffer) >= self.flush_every:
+                asyncio.create_task(self.flush())
+        return await handler(event, data)
+
+    def _write(self, lines: list[str]) -> None:
+        # каждая пачка — отдельный gzip-member, так файл остаётся читаемым даже после падения
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+            await asyncio.to_thread(self._write, lines)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        await self.flush()
+
+
+def read_recording(path: str):
+    """Итератор по записям (dict с ключами "t" и "update")."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
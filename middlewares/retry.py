@@ -0,0 +1,45 @@
+# middlewares/retry.py
+import asyncio
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetUpdates, Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+import metrics
+
+
+class RetryAfterMiddleware(BaseRequestMiddleware):
+    """
+    Повторяем запрос после 429 (Flood control), если Telegram попросил
+    подождать не слишком долго. getUpdates не трогаем — у polling свой backoff.
+    """
+
+    def __init__(self, max_retries: int = 2, max_delay: float = 30.0):
+        self.max_retries = max_retries
+        self.max_delay = max_delay
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        attempt = 0
+        while True:
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if (
+                    isinstance(method, GetUpdates)
+                    or attempt >= self.max_retries
+                    or e.retry_after > self.max_delay
+                ):
+                    raise
+                attempt += 1
+                metrics.api_retries.inc(method=type(method).__name__)
+                await asyncio.sleep(e.retry_after)
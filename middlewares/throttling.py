@@ -0,0 +1,102 @@
+# middlewares/throttling.py
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject
+
+from cache import LRUCache
+
+# стоимость хендлера по умолчанию (если нет флага throttling_cost)
+DEFAULT_COST = 1.0
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Token bucket на каждого пользователя.
+
+    В ведро капает `rate` токенов в секунду (не больше `burst`),
+    каждый вызов хендлера стоит `flags={"throttling_cost": ...}` токенов.
+    Если токенов не хватает — апдейт отбрасывается. Кто упёрся в лимит
+    `ban_after` раз за `ban_window` секунд — получает временный бан (если ban_seconds > 0).
+
+    Регистрировать как inner-middleware (dp.message / dp.callback_query / dp.inline_query),
+    чтобы были доступны флаги конкретного хендлера.
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: float = 5.0,
+        ban_after: int = 20,
+        ban_seconds: float = 0,
+        ban_window: float = 60.0,
+        maxsize: int = 100_000,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.ban_after = ban_after
+        self.ban_seconds = ban_seconds
+
+        # user_id -> [tokens, last_ts]; TTL продлевается при каждом обращении,
+        # так что выпадает только ведро, которое простояло дольше, чем нужно на наполнение
+        # (такое ведро и так было бы полным)
+        self._buckets = LRUCache(maxsize=maxsize, ttl=max(burst / rate, 1.0) * 2)
+        # user_id -> [превышений]; окно считается от первого превышения и не продлевается
+        self._violations = LRUCache(maxsize=maxsize, ttl=ban_window)
+        self._banned = LRUCache(maxsize=maxsize, ttl=ban_seconds or None)
+
+    def _consume(self, user_id: int, cost: float) -> bool:
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = [self.burst, now]
+        else:
+            tokens = bucket[0] + (now - bucket[1]) * self.rate
+            bucket[0] = min(tokens, self.burst)
+            bucket[1] = now
+        # заново кладём при каждом обращении — TTL отсчитывается от последнего запроса
+        self._buckets.set(user_id, bucket)
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return True
+
+        if self.ban_seconds:
+            violations = self._violations.get(user_id)
+            if violations is None:
+                violations = [0]
+                self._violations.set(user_id, violations)
+            violations[0] += 1
+            if violations[0] >= self.ban_after:
+                self._banned.set(user_id, True)
+                self._buckets.pop(user_id)
+                self._violations.pop(user_id)
+        return False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        if self._banned.get(user.id):
+            return await _reject(event, "⛔ Слишком много запросов. Попробуйте позже.")
+
+        cost = get_flag(data, "throttling_cost", default=DEFAULT_COST)
+        if not self._consume(user.id, cost):
+            return await _reject(event, "⏳ Не так быстро, подождите пару секунд.")
+
+        return await handler(event, data)
+
+
+async def _reject(event: TelegramObject, text: str) -> None:
+    # на коллбек обязательно отвечаем (иначе «часики» в клиенте),
+    # на сообщения и inline-запросы — молчим, чтобы не тратить запросы к API
+    if isinstance(event, CallbackQuery):
+        await event.answer(text)
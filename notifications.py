@@ -0,0 +1,178 @@
+# notifications.py
+import asyncio
+import logging
+import time
+from collections import deque
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+import metrics
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# лимит длины сообщения в Telegram
+MESSAGE_LIMIT = 4096
+
+
+def split_text(text: str, limit: int = MESSAGE_LIMIT, sep: str = "\n\n") -> list[str]:
+    """Режем длинный текст на сообщения по границам блоков."""
+    chunks: list[str] = []
+    current = ""
+    for block in text.split(sep):
+        while len(block) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(block[:limit])
+            block = block[limit:]
+        candidate = f"{current}{sep}{block}" if current else block
+        if len(candidate) > limit:
+            chunks.append(current)
+            current = block
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def digest(batch: list[str]) -> str:
+    """Несколько уведомлений одним сообщением."""
+    if len(batch) == 1:
+        return batch[0]
+    header = f"📬 Сводка уведомлений: {len(batch)}"
+    return "\n\n".join([header, *(f"— — —\n{text}" for text in batch)])
+
+
+# итог отправки одному админу: дошло / временная ошибка (стоит повторить) /
+# отклонено Telegram (бот заблокирован, чат не найден — повтор не поможет)
+SENT = "sent"
+FAILED = "failed"
+REJECTED = "rejected"
+
+
+class AdminNotifier:
+    """
+    Доставка уведомлений админам (Settings.admin_chat_ids).
+
+    Очередь и повторы — в jobs.py (задачи admin_notify), здесь отправка
+    и темп: пока уведомлений мало, они уходят сразу; если за `window` секунд
+    их набралось уже `burst`, следующие откладываются до общей сводки
+    раз в `digest_interval` (см. digest_delay). Ошибки сети и 5xx
+    повторяются с экспоненциальной паузой, остальные ошибки (бот заблокирован,
+    чат не найден) — в лог.
+    """
+
+    def __init__(
+        self,
+        burst: int = 5,
+        window: float = 10.0,
+        digest_interval: float = 30.0,
+        max_retries: int = 5,
+    ):
+        self.burst = burst
+        self.window = window
+        self.digest_interval = digest_interval
+        self.max_retries = max_retries
+        self._recent: deque[float] = deque()
+        self._digest_at = 0.0
+
+    def digest_delay(self) -> float:
+        """
+        Учесть новое уведомление и вернуть, на сколько секунд отложить его задачу:
+        0 — отправить сразу; в поток заявок — до ближайшей сводки (одна на всех,
+        кто попал в её окно, — воркер заберёт их одной пачкой).
+        """
+        now = time.monotonic()
+        while self._recent and self._recent[0] < now - self.window:
+            self._recent.popleft()
+        self._recent.append(now)
+        if len(self._recent) <= self.burst:
+            return 0.0
+        if self._digest_at <= now:
+            self._digest_at = now + self.digest_interval
+        return self._digest_at - now
+
+    async def deliver(
+        self,
+        bot: Bot,
+        text: str,
+        kind: str = "single",
+        max_retries: int | None = None,
+        reply_markup: InlineKeyboardMarkup | None = None,
+        chat_ids: list[int] | None = None,
+    ) -> dict[int, str]:
+        """
+        Отправить админам (по умолчанию всем) прямо сейчас; кнопки — под последней частью.
+        Возвращаем итог по каждому чату: SENT / FAILED / REJECTED.
+        """
+        if chat_ids is None:
+            chat_ids = get_settings().admin_chat_ids
+        chunks = split_text(text)
+        retries = self.max_retries if max_retries is None else max_retries
+        # админам — параллельно, одному админу — по порядку
+        results = await asyncio.gather(
+            *(
+                self._send_chunks(bot, chat_id, chunks, retries, reply_markup)
+                for chat_id in chat_ids
+            )
+        )
+        metrics.notifications.inc(results.count(SENT), result=kind)
+        return dict(zip(chat_ids, results))
+
+    async def _send_chunks(
+        self,
+        bot: Bot,
+        chat_id: int,
+        chunks: list[str],
+        retries: int,
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ) -> str:
+        for i, chunk in enumerate(chunks, start=1):
+            markup = reply_markup if i == len(chunks) else None
+            result = await self._send(bot, chat_id, chunk, retries, markup)
+            if result != SENT:
+                return result
+        return SENT
+
+    async def _send(
+        self,
+        bot: Bot,
+        chat_id: int,
+        text: str,
+        retries: int,
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ) -> str:
+        delay = 1.0
+        for attempt in range(retries + 1):
+            try:
+                await bot.send_message(chat_id, text, reply_markup=reply_markup)
+                return SENT
+            except TelegramRetryAfter as e:
+                wait = e.retry_after
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logger.warning("Уведомление админу %s не ушло: %s", chat_id, e)
+                wait = delay
+                delay = min(delay * 2, 60.0)
+            except TelegramAPIError as e:
+                # бот заблокирован / чат не найден — повтор не поможет
+                logger.error("Уведомление админу %s отклонено: %s", chat_id, e)
+                metrics.notifications.inc(result=REJECTED)
+                return REJECTED
+
+            if attempt < retries:
+                await asyncio.sleep(wait)
+
+        metrics.notifications.inc(result=FAILED)
+        return FAILED
+
+
+notifier = AdminNotifier()
@@ -0,0 +1,129 @@
+# profiler.py
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+
+# сэмплы, в которых цикл событий просто ждёт сокетов, в профиль не пишем
+_IDLE_FUNCS = {"select", "poll", "epoll", "_run_once"}
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профайлер для живого бота.
+
+    Пока выключен — ничего не делает (нет ни потока, ни middleware).
+    На время окна `run()` запускается фоновый поток, который раз в `interval`
+    секунд снимает стек потока с event loop и группирует его по хендлеру,
+    в котором сейчас идёт работа. Результат — collapsed stacks
+    (формат flamegraph.pl / speedscope / inferno).
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._handler_codes: dict[CodeType, str] = {}
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.duration = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None
+
+    def register_dispatcher(self, dispatcher) -> None:
+        """Запоминаем code-объекты всех хендлеров, чтобы атрибутировать им стеки."""
+        for router in dispatcher.chain_tail:
+            for observer in router.observers.values():
+                for handler in observer.handlers:
+                    code = getattr(handler.callback, "__code__", None)
+                    if code is not None:
+                        name = f"{handler.callback.__module__}.{handler.callback.__name__}"
+                        self._handler_codes[code] = name
+
+    def handler_for_frame(self, frame: FrameType | None) -> tuple[str, FrameType | None]:
+        """Ищем в стеке фрейм хендлера: (имя хендлера, его фрейм)."""
+        while frame is not None:
+            name = self._handler_codes.get(frame.f_code)
+            if name:
+                return name, frame
+            frame = frame.f_back
+        return "<no handler>", None
+
+    def _sample(self, thread_id: int) -> None:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            return
+
+        if frame.f_code.co_name in _IDLE_FUNCS:
+            self.idle_samples += 1
+            return
+
+        handler, _ = self.handler_for_frame(frame)
+        stack: list[str] = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.append(handler)
+        stack.reverse()
+
+        self._stacks[";".join(stack)] += 1
+        self.samples += 1
+
+    def _loop(self, thread_id: int) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample(thread_id)
+
+    def start(self) -> None:
+        if self.active:
+            raise RuntimeError("Профайлер уже запущен")
+
+        self._stacks.clear()
+        self.samples = 0
+        self.idle_samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop,
+            args=(threading.get_ident(),),
+            name="rezme-profiler",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Останавливаем поток и возвращаем collapsed stacks."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        lines = [f"{stack} {count}" for stack, count in self._stacks.most_common()]
+        return "\n".join(lines) + "\n"
+
+    def top_handlers(self, limit: int = 10) -> list[tuple[str, int]]:
+        per_handler: Counter[str] = Counter()
+        for stack, count in self._stacks.items():
+            per_handler[stack.split(";", 1)[0]] += count
+        return per_handler.most_common(limit)
+
+    async def run(self, duration: float) -> str:
+        """Профилируем окно в `duration` секунд (вызывать из потока event loop)."""
+        self.start()
+        started = time.monotonic()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            result = self.stop()
+        self.duration = time.monotonic() - started
+        return result
+
+
+profiler = SamplingProfiler()
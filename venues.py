@@ -1,7 +1,17 @@
 # venues.py
+import functools
 import json
+import logging
 import os
-from typing import List, Dict, Optional
+import re
+import zlib
+from typing import Callable, Iterator, List, Dict, NamedTuple, Optional, Tuple
+
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
 
 VENUES_FILE = "venues.json"
 
@@ -101,9 +111,61 @@ DEFAULT_VENUES: List[Dict] = [
 
 
 
+# версия каталога: растёт при каждой записи venues.json (add_venue / delete_venue),
+# по ней сбрасываются все кэши, построенные из каталога
+_catalog_version = 0
+
+
+def get_catalog_version() -> int:
+    return _catalog_version
+
+
+def catalog_cached(func: Optional[Callable] = None, *, maxsize: Optional[int] = None):
+    """
+    Мемоизация по аргументам до следующего изменения каталога.
+
+    Без maxsize — обычный словарь (для функций без аргументов / с парой значений),
+    с maxsize — LRU, чтобы кэш по пользовательским фильтрам не рос бесконечно.
+    """
+    if func is None:
+        return functools.partial(catalog_cached, maxsize=maxsize)
+
+    cache = {} if maxsize is None else LRUCache(maxsize=maxsize)
+    cached_version = None
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        nonlocal cached_version
+        if cached_version != _catalog_version:
+            cache.clear()
+            cached_version = _catalog_version
+        value = cache.get(args, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = func(*args)
+        # каталог мог создаться с нуля прямо во время вызова
+        if cached_version != _catalog_version:
+            cache.clear()
+            cached_version = _catalog_version
+        if maxsize is None:
+            cache[args] = value
+        else:
+            cache.set(args, value)
+        return value
+
+    return wrapper
+
+
 def _save_venues(venues: List[Dict]) -> None:
+    global _catalog_version
     with open(VENUES_FILE, "w", encoding="utf-8") as f:
         json.dump(venues, f, ensure_ascii=False, indent=2)
+    _catalog_version += 1
+
+
+def _capacity(value) -> Optional[int]:
+    return value if isinstance(value, int) and not isinstance(value, bool) and value > 0 else None
 
 
 def _load_venues() -> List[Dict]:
@@ -126,6 +188,13 @@ def _load_venues() -> List[Dict]:
                 "address": v.get("address", "—"),
                 "phone": v.get("phone", "—"),
                 "instagram": v.get("instagram", ""),
+                # необязательные поля для фильтров: 1..4 (₸..₸₸₸₸) и «работает допоздна»
+                "price_level": v.get("price_level"),
+                "open_late": bool(v.get("open_late", False)),
+                # часы работы (см. parse_hours), None — DEFAULT_HOURS
+                "hours": v.get("hours"),
+                # сколько человек заведение принимает на один слот, None — без ограничения
+                "capacity": _capacity(v.get("capacity")),
             }
         )
     return venues
@@ -140,22 +209,411 @@ def get_venues_by_category(category: str) -> List[Dict]:
     return [v for v in venues if v.get("category") == category]
 
 
+def get_venues_by_subcategory(category: str) -> List[Dict]:
+    """
+    Заведения, у которых среди категорий через запятую есть нужная
+    ("Ресто-бар, караоке, боулинг" подходит под "Караоке"), без учёта регистра.
+    """
+    category = category.lower()
+    result: List[Dict] = []
+    for v in _load_venues():
+        cats_raw = v.get("category", "")
+        cats = [c.strip() for c in cats_raw.split(",") if c.strip()]
+        if any(category == c.lower() for c in cats):
+            result.append(v)
+    return result
+
+
 def get_venues_by_district(district: str) -> List[Dict]:
     venues = _load_venues()
     return [v for v in venues if v.get("district") == district]
 
 
+# ---------- часы работы и слоты для брони ----------
+# "hours" в venues.json — строка на все дни ("12:00-02:00") или словарь по дням
+# {"mon": "12:00-23:00", ..., "sun": null}: дня нет / null — выходной,
+# закрытие не позже открытия — значит, после полуночи.
+# Слот — минуты от полуночи дня брони (ночью после полуночи — больше 1440),
+# с шагом SLOT_MINUTES; последний слот — за SLOT_MINUTES до закрытия.
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+# у кого часы не указаны — бронь на 16:00–22:00, как было до часов работы
+DEFAULT_HOURS = "16:00-23:00"
+SLOT_MINUTES = 60
+DAY_MINUTES = 24 * 60
+ALL_WEEKDAYS = (1 << len(WEEKDAYS)) - 1
+
+Schedule = Tuple[Optional[Tuple[int, int]], ...]
+
+_HOURS_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$")
+
+
+def parse_hours(hours) -> Schedule:
+    """(открытие, закрытие) в минутах на каждый день недели, None — выходной; ValueError — кривой формат."""
+    if isinstance(hours, str):
+        hours = dict.fromkeys(WEEKDAYS, hours)
+    elif not isinstance(hours, dict):
+        raise ValueError(f"часы работы: {hours!r}")
+
+    schedule = []
+    for day in WEEKDAYS:
+        value = hours.get(day)
+        if not value:
+            schedule.append(None)
+            continue
+        match = _HOURS_RE.match(value)
+        if not match:
+            raise ValueError(f"часы работы ({day}): {value!r}")
+        open_h, open_m, close_h, close_m = map(int, match.groups())
+        if max(open_h, close_h) > 24 or max(open_m, close_m) >= 60:
+            raise ValueError(f"часы работы ({day}): {value!r}")
+        opens, closes = open_h * 60 + open_m, close_h * 60 + close_m
+        if closes <= opens:
+            closes += DAY_MINUTES
+        schedule.append((opens, closes))
+    return tuple(schedule)
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_hours_cached(key) -> Schedule:
+    return parse_hours(dict(key) if isinstance(key, tuple) else key)
+
+
+def venue_schedule(venue: Dict) -> Schedule:
+    """Часы работы заведения по дням недели (кривые или пустые — DEFAULT_HOURS)."""
+    hours = venue.get("hours") or DEFAULT_HOURS
+    # у большинства заведений одинаковые часы — разбираем каждый вариант один раз
+    key = tuple(sorted(hours.items())) if isinstance(hours, dict) else hours
+    try:
+        return _parse_hours_cached(key)
+    except (ValueError, TypeError):
+        logger.warning("Заведение id=%s: непонятные часы работы %r", venue.get("id"), hours)
+        return _parse_hours_cached(DEFAULT_HOURS)
+
+
+def day_slots(opens: int, closes: int) -> Tuple[int, ...]:
+    first = -(-opens // SLOT_MINUTES) * SLOT_MINUTES
+    return tuple(range(first, closes - SLOT_MINUTES + 1, SLOT_MINUTES))
+
+
+def slot_text(minutes: int) -> str:
+    """"19:00"; ночные слоты (после полуночи) — тоже по часам на циферблате."""
+    minutes %= DAY_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+# ---------- битовые индексы для фильтров ----------
+# заведение = бит с номером его позиции в каталоге, значение фильтра = int-маска:
+# пересечение фильтров — &, объединение — |, число результатов — bit_count()
+
+PRICE_LEVELS = (1, 2, 3, 4)
+
+
+class Facets(NamedTuple):
+    """Выбранные фильтры (None / False — не важно)."""
+    category: Optional[str] = None
+    district: Optional[str] = None
+    price_level: Optional[int] = None
+    karaoke: bool = False
+    open_late: bool = False
+
+
+def _bitset(ordinals: List[int], size: int) -> int:
+    # собираем маску через байты: `mask |= 1 << i` на 100k заведений — квадратично
+    buf = bytearray((size + 7) // 8)
+    for i in ordinals:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _ordinals(mask: int) -> Iterator[int]:
+    bits = bin(mask)[:1:-1]
+    i = bits.find("1")
+    while i != -1:
+        yield i
+        i = bits.find("1", i + 1)
+
+
+class FacetIndex:
+    """
+    Маски по категориям, районам, уровню цен, караоке и «допоздна»,
+    плюс по слотам: slots[день недели][минуты] — кто открыт в этот слот.
+    """
+
+    def __init__(self, venues: List[Dict]):
+        self.venues = venues
+        self.all = (1 << len(venues)) - 1
+        self.positions = {v["id"]: i for i, v in enumerate(venues)}
+        # venue_id -> мест на слот (только у кого лимит задан)
+        self.capacities = {v["id"]: v["capacity"] for v in venues if v.get("capacity")}
+        # people -> (id, маска) заведений, куда столько людей не поместится вообще
+        self._undersized: Dict[int, Tuple[frozenset, int]] = {}
+
+        categories: Dict[str, List[int]] = {}
+        districts: Dict[str, List[int]] = {}
+        prices: Dict[int, List[int]] = {}
+        karaoke: List[int] = []
+        open_late: List[int] = []
+        # одинаковые расписания раскладываем по слотам один раз
+        by_schedule: Dict[Schedule, List[int]] = {}
+
+        for i, v in enumerate(venues):
+            cats = {c.strip().lower() for c in v.get("category", "").split(",") if c.strip()}
+            for c in cats:
+                categories.setdefault(c, []).append(i)
+            if any("караоке" in c for c in cats):
+                karaoke.append(i)
+            if v.get("district"):
+                districts.setdefault(v["district"], []).append(i)
+            if v.get("price_level") in PRICE_LEVELS:
+                prices.setdefault(v["price_level"], []).append(i)
+            if v.get("open_late"):
+                open_late.append(i)
+            by_schedule.setdefault(venue_schedule(v), []).append(i)
+
+        size = len(venues)
+        # большие группы с одним расписанием — готовой маской (|), мелкие — номерами
+        slot_masks: List[Dict[int, int]] = [{} for _ in WEEKDAYS]
+        slot_ordinals: List[Dict[int, List[int]]] = [{} for _ in WEEKDAYS]
+        for schedule, ordinals in by_schedule.items():
+            # работает после полуночи — тоже «допоздна»
+            if any(hours and hours[1] > DAY_MINUTES for hours in schedule):
+                open_late.extend(ordinals)
+            group = _bitset(ordinals, size) if len(ordinals) >= 64 else None
+            for weekday, hours in enumerate(schedule):
+                if not hours:
+                    continue
+                for minutes in day_slots(*hours):
+                    if group is None:
+                        slot_ordinals[weekday].setdefault(minutes, []).extend(ordinals)
+                    else:
+                        slot_masks[weekday][minutes] = slot_masks[weekday].get(minutes, 0) | group
+
+        # категории — без учёта регистра
+        self.categories = {k: _bitset(o, size) for k, o in categories.items()}
+        self.districts = {k: _bitset(o, size) for k, o in districts.items()}
+        self.prices = {k: _bitset(o, size) for k, o in prices.items()}
+        self.karaoke = _bitset(karaoke, size)
+        self.open_late = _bitset(open_late, size)
+        self.slots = [
+            {
+                m: masks.get(m, 0) | _bitset(ordinals.get(m, ()), size)
+                for m in sorted(masks.keys() | ordinals.keys())
+            }
+            for masks, ordinals in zip(slot_masks, slot_ordinals)
+        ]
+
+    def mask(self, facets: Facets, skip: str = "") -> int:
+        """Маска заведений под все фильтры, кроме `skip` (для подсчёта вариантов)."""
+        mask = self.all
+        if facets.category and skip != "category":
+            mask &= self.categories.get(facets.category.lower(), 0)
+        if facets.district and skip != "district":
+            mask &= self.districts.get(facets.district, 0)
+        if facets.price_level and skip != "price_level":
+            mask &= self.prices.get(facets.price_level, 0)
+        if facets.karaoke and skip != "karaoke":
+            mask &= self.karaoke
+        if facets.open_late and skip != "open_late":
+            mask &= self.open_late
+        return mask
+
+    def count(self, facets: Facets) -> int:
+        return self.mask(facets).bit_count()
+
+    def counts(self, facets: Facets, field: str, values) -> Dict:
+        """Сколько будет результатов, если поменять `field` на каждое из `values`."""
+        base = self.mask(facets, skip=field)
+        if field == "category":
+            masks = self.categories
+            return {v: (base & masks.get(v.lower(), 0)).bit_count() for v in values}
+        masks = {"district": self.districts, "price_level": self.prices}[field]
+        return {v: (base & masks.get(v, 0)).bit_count() for v in values}
+
+    def toggle_count(self, facets: Facets, field: str) -> int:
+        """Результаты при включённом флаге `field` (karaoke / open_late)."""
+        return (self.mask(facets, skip=field) & getattr(self, field)).bit_count()
+
+    def select(self, facets: Facets) -> List[Dict]:
+        return self.select_mask(self.mask(facets))
+
+    def select_mask(self, mask: int) -> List[Dict]:
+        return [self.venues[i] for i in _ordinals(mask)]
+
+    def venue_mask(self, venue_id: int) -> int:
+        i = self.positions.get(venue_id)
+        return 0 if i is None else 1 << i
+
+    def undersized(self, people: int) -> Tuple[frozenset, int]:
+        """id и маска заведений, где мест на слот меньше people (не зависит от броней — кэшируем)."""
+        found = self._undersized.get(people)
+        if found is None:
+            ids = frozenset(i for i, capacity in self.capacities.items() if capacity < people)
+            mask = _bitset([self.positions[i] for i in ids], len(self.venues))
+            found = self._undersized[people] = (ids, mask)
+        return found
+
+    def slot_mask(self, weekday: int, minutes: int) -> int:
+        return self.slots[weekday].get(minutes, 0)
+
+    def open_slots(self, mask: int, weekday: int) -> Tuple[int, ...]:
+        """Слоты дня недели, в которые открыто хоть одно заведение из mask."""
+        return tuple(m for m, slot in self.slots[weekday].items() if slot & mask)
+
+    def open_weekdays(self, mask: int) -> int:
+        """Битовая маска дней недели (бит 0 — понедельник), когда открыт хоть кто-то из mask."""
+        days = 0
+        for weekday, day in enumerate(self.slots):
+            if any(slot & mask for slot in day.values()):
+                days |= 1 << weekday
+        return days
+
+
+@catalog_cached
+def get_facet_index() -> FacetIndex:
+    return FacetIndex(_load_venues())
+
+
+def filter_mask(mode: str, value) -> int:
+    """
+    Маска заведений под фильтр бронирования: mode="category" (value="all" —
+    все заведения), mode="district", mode="facets" (value — Facets)
+    или mode="venue" (value — id заведения).
+    """
+    index = get_facet_index()
+    if mode == "category":
+        return index.mask(Facets() if value == "all" else Facets(category=value))
+    if mode == "district":
+        return index.mask(Facets(district=value))
+    if mode == "facets":
+        return index.mask(value)
+    if mode == "venue":
+        return index.venue_mask(value)
+    return 0
+
+
+@catalog_cached(maxsize=1024)
+def find_venues(
+    mode: str, value, weekday: Optional[int] = None, minutes: Optional[int] = None
+) -> Tuple[Dict, ...]:
+    """
+    Заведения под фильтр бронирования (см. filter_mask), в порядке каталога;
+    с weekday / minutes — только открытые в этот слот.
+    Результат общий для всех пользователей — не изменять.
+    """
+    index = get_facet_index()
+    mask = filter_mask(mode, value)
+    if weekday is not None and minutes is not None:
+        mask &= index.slot_mask(weekday, minutes)
+    return tuple(index.select_mask(mask))
+
+
+@catalog_cached(maxsize=4096)
+def get_slots(mode: str, value, weekday: int) -> Tuple[int, ...]:
+    """Слоты брони на день недели, в которые открыто хоть одно заведение под фильтр."""
+    return get_facet_index().open_slots(filter_mask(mode, value), weekday)
+
+
+@catalog_cached(maxsize=1024)
+def get_open_weekdays(mode: str, value) -> int:
+    """Дни недели (битовая маска, бит 0 — понедельник), когда под фильтр хоть кто-то работает."""
+    return get_facet_index().open_weekdays(filter_mask(mode, value))
+
+
+@catalog_cached
 def get_districts() -> List[str]:
     venues = _load_venues()
     return sorted({v.get("district") for v in venues if v.get("district")})
 
 
+@catalog_cached
+def get_categories() -> List[str]:
+    """
+    Категории из каталога без дублей типа 'Караоке' и 'караоке'
+    (сравниваем без регистра, отображаем в том виде, как встретилось первым),
+    по алфавиту без учёта регистра.
+    """
+    # key = нижний регистр, value = "красивое" название
+    cat_map: Dict[str, str] = {}
+
+    for v in _load_venues():
+        for c in v.get("category", "").split(","):
+            c_clean = c.strip()
+            if c_clean and c_clean.lower() not in cat_map:
+                cat_map[c_clean.lower()] = c_clean
+
+    return sorted(cat_map.values(), key=str.lower)
+
+
+# ---------- реестр коротких id для callback_data ----------
+# id = позиция в get_categories() / get_districts() начиная с 1,
+# версия = crc32 от списка: совпадает у всех процессов и после рестарта,
+# меняется только если поменялся сам список
+
+def _registry_version(names: List[str]) -> int:
+    return zlib.crc32("\n".join(names).encode("utf-8")) & 0xFFFF
+
+
+@catalog_cached
+def get_categories_version() -> int:
+    return _registry_version(get_categories())
+
+
+@catalog_cached
+def get_districts_version() -> int:
+    return _registry_version(get_districts())
+
+
+def category_by_id(version: int, category_id: int) -> Optional[str]:
+    """None, если кнопка устарела (каталог поменялся) или id неизвестен."""
+    categories = get_categories()
+    if version != get_categories_version() or not 1 <= category_id <= len(categories):
+        return None
+    return categories[category_id - 1]
+
+
+def district_by_id(version: int, district_id: int) -> Optional[str]:
+    districts = get_districts()
+    if version != get_districts_version() or not 1 <= district_id <= len(districts):
+        return None
+    return districts[district_id - 1]
+
+
+@catalog_cached
+def _search_rows() -> List[Tuple[str, str, Dict]]:
+    # (название, вся строка для поиска) в нижнем регистре
+    return [
+        (
+            v["name"].lower(),
+            f"{v['name']} {v['category']} {v['district']} {v['address']}".lower(),
+            v,
+        )
+        for v in _load_venues()
+    ]
+
+
+@catalog_cached(maxsize=1024)
+def search_venues(query: str, limit: int = 50) -> Tuple[Dict, ...]:
+    """
+    Поиск для inline-режима: все слова запроса должны встретиться в названии,
+    категории, районе или адресе. Сначала — те, у кого название начинается с запроса.
+    """
+    words = query.lower().split()
+    prefix: List[Dict] = []
+    other: List[Dict] = []
+    for name, haystack, v in _search_rows():
+        if all(w in haystack for w in words):
+            (prefix if words and name.startswith(words[0]) else other).append(v)
+            if len(prefix) >= limit:
+                break
+    return tuple((prefix + other)[:limit])
+
+
 def get_venue_by_id(venue_id: int) -> Optional[Dict]:
-    venues = _load_venues()
-    for v in venues:
-        if v.get("id") == venue_id:
-            return v
-    return None
+    """Заведение по id (из индекса, без чтения venues.json). Результат общий — не изменять."""
+    index = get_facet_index()
+    i = index.positions.get(venue_id)
+    return None if i is None else index.venues[i]
 
 
 def add_venue(
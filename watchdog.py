@@ -0,0 +1,97 @@
+# watchdog.py
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+import metrics
+from profiler import SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+
+def _update_type(handler_frame) -> str:
+    """Тип апдейта по первому аргументу хендлера: CallbackQuery -> callback_query."""
+    if handler_frame is None:
+        return "-"
+    code = handler_frame.f_code
+    if not code.co_argcount:
+        return "-"
+    event = handler_frame.f_locals.get(code.co_varnames[0])
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", type(event).__name__).lower()
+
+
+class LoopWatchdog:
+    """
+    Следим за тем, чтобы event loop не блокировался синхронным кодом.
+
+    Корутина-«пульс» раз в `interval` секунд отмечается и пишет задержку
+    цикла (lag) в метрики. Отдельный поток проверяет пульс: если его нет
+    дольше `threshold`, снимаем стек потока цикла, находим хендлер
+    и тип апдейта и, когда цикл отвис, пишем в лог и метрики, сколько он стоял.
+    """
+
+    def __init__(self, profiler: SamplingProfiler, threshold: float = 0.25, interval: float = 0.05):
+        self.profiler = profiler
+        self.threshold = threshold
+        self.interval = interval
+        self._beat = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._task: asyncio.Task | None = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._beat = now = time.monotonic()
+            metrics.loop_lag_seconds.observe(max(now - started - self.interval, 0.0))
+
+    def _watch(self, thread_id: int) -> None:
+        blocked: tuple[str, str, str, float] | None = None
+
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat
+
+            if stalled > self.threshold and blocked is None:
+                frame = sys._current_frames().get(thread_id)
+                if frame is None:
+                    continue
+                code = frame.f_code
+                where = f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                handler, handler_frame = self.profiler.handler_for_frame(frame)
+                blocked = (handler, _update_type(handler_frame), where, beat)
+
+            elif blocked is not None and beat != blocked[3]:
+                handler, update_type, where, last_beat = blocked
+                duration = beat - last_beat - self.interval
+                metrics.loop_blocks.inc(handler=handler, update_type=update_type)
+                metrics.loop_block_seconds.observe(duration, handler=handler)
+                logger.warning(
+                    "Event loop заблокирован на %.3f с: handler=%s update=%s в %s",
+                    duration, handler, update_type, where,
+                )
+                blocked = None
+
+    def start(self) -> None:
+        """Запускать из потока event loop."""
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(
+            target=self._watch,
+            args=(threading.get_ident(),),
+            name="rezme-loop-watchdog",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+        if self._thread is not None:
+            self._thread.join()